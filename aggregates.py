@@ -0,0 +1,96 @@
+"""
+Agregações SQL usadas pelo dashboard.
+
+Cada função executa um número fixo de consultas GROUP BY/LIMIT e devolve
+apenas tipos simples (dict, list, tuple), nunca objetos ORM.
+"""
+from sqlalchemy import func, and_
+from models import Project, Task, User
+
+OVERDUE_TOP_LIMIT = 15
+SEM_RESPONSAVEL = "Sem responsável"
+RESP_STATUS_COLUMNS = ("Ativo", "Concluído", "Planejamento", "Cancelado")
+
+
+def overdue_task_filter(now):
+    """SQL condition for an open task whose deadline has passed."""
+    return and_(Task.prazo.isnot(None), Task.prazo < now, Task.status != "Concluído")
+
+
+def task_status_counts(db):
+    rows = db.query(Task.status, func.count(Task.id)).group_by(Task.status).all()
+    return {status: n for status, n in rows}
+
+
+def projects_by_responsavel(db):
+    """Return {responsável: {status: n}} for every project."""
+    resp_nome = func.coalesce(User.nome, SEM_RESPONSAVEL)
+    rows = (
+        db.query(resp_nome, Project.status, func.count(Project.id))
+        .outerjoin(User, User.id == Project.responsavel_id)
+        .group_by(resp_nome, Project.status)
+        .all()
+    )
+    resp_map = {}
+    for nome, status, n in rows:
+        resp_map.setdefault(nome, {})[status] = n
+    return resp_map
+
+
+def overdue_projects(db, now, limit=OVERDUE_TOP_LIMIT):
+    """Count non-finished projects with overdue tasks and return the worst ones.
+
+    Returns ``(total, top)`` where ``top`` holds
+    ``(project_id, nome, responsavel, n_tarefas_vencidas, max_dias_atraso)``
+    ordered by the oldest overdue deadline.
+    """
+    overdue = and_(Project.status != "Concluído", overdue_task_filter(now))
+
+    total = (
+        db.query(func.count(func.distinct(Task.projeto_id)))
+        .join(Project, Project.id == Task.projeto_id)
+        .filter(overdue)
+        .scalar()
+    ) or 0
+
+    oldest_prazo = func.min(Task.prazo)
+    rows = (
+        db.query(Project.id, Project.nome, User.nome, func.count(Task.id), oldest_prazo)
+        .join(Task, Task.projeto_id == Project.id)
+        .outerjoin(User, User.id == Project.responsavel_id)
+        .filter(overdue)
+        .group_by(Project.id, Project.nome, User.nome)
+        .order_by(oldest_prazo, Project.id)
+        .limit(limit)
+        .all()
+    )
+    top = [(pid, nome, resp or "—", n, (now - prazo).days) for pid, nome, resp, n, prazo in rows]
+    return total, top
+
+
+def dashboard_stats(db, now):
+    """Everything the dashboard renders, in four queries."""
+    resp_map = projects_by_responsavel(db)
+
+    project_status = {}
+    for por_status in resp_map.values():
+        for status, n in por_status.items():
+            project_status[status] = project_status.get(status, 0) + n
+
+    by_resp = []
+    for nome, por_status in resp_map.items():
+        row = {"Responsável": nome, **{s: 0 for s in RESP_STATUS_COLUMNS}}
+        row.update(por_status)
+        row["Total"] = sum(por_status.values())
+        by_resp.append(row)
+
+    overdue_total, overdue_top = overdue_projects(db, now)
+
+    return {
+        "projects_total": sum(project_status.values()),
+        "project_status": project_status,
+        "task_status": task_status_counts(db),
+        "overdue_total": overdue_total,
+        "overdue_top": overdue_top,
+        "by_responsavel": by_resp,
+    }
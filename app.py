@@ -1,9 +1,16 @@
 import streamlit as st
-import sys, os
+import sys, os, time, logging
+from datetime import datetime
 sys.path.insert(0, os.path.dirname(__file__))
 
-from database import init_db
-from auth import login_page, logout, require_auth
+from database import init_db, statement_budget, SQL_STATEMENT_BUDGET
+from auth import login_page, logout, require_auth, require_role
+import metrics
+import profiling
+import read_models
+import telemetry
+
+log = logging.getLogger("projectflow")
 
 st.set_page_config(
     page_title="Petrobras / Senai EaD",
@@ -150,12 +157,35 @@ h1,h2,h3,h4,h5,p,span,div,label { color: #c8d6f0; }
 </style>
 """, unsafe_allow_html=True)
 
-init_db()
+
+@st.cache_resource
+def bootstrap():
+    """Schema, migrations, seed and read-model warm-up, once per server process."""
+    t0 = time.perf_counter()
+    init_db()
+    read_models.user_options()
+    read_models.project_options()
+    read_models.dashboard(datetime.now().replace(second=0, microsecond=0))
+    boot = {"startup_s": time.perf_counter() - t0, "iniciado_em": datetime.now()}
+    log.info("bootstrap concluído em %.3fs", boot["startup_s"])
+    telemetry.log_startup(boot)
+    return boot
+
+
+BOOT = bootstrap()
+metrics.start_server()
 
 if not require_auth():
     login_page()
     st.stop()
 
+# Menu label -> route name used by the telemetry
+ROUTES = {
+    "📊  Dashboard": "dashboard",
+    "📋  Projetos": "projetos",
+    "🗂️  Kanban": "kanban",
+}
+
 # ── Sidebar ────────────────────────────────────────────────────────────────────
 with st.sidebar:
     st.markdown("""
@@ -184,11 +214,7 @@ with st.sidebar:
 
     st.markdown('<div class="sb-nav-label">Menu</div>', unsafe_allow_html=True)
 
-    page = st.radio("nav", [
-        "📊  Dashboard",
-        "📋  Projetos",
-        "🗂️  Kanban",
-    ], label_visibility="collapsed")
+    page = st.radio("nav", list(ROUTES), label_visibility="collapsed")
 
     st.markdown("---")
     st.markdown('<div class="sb-nav-label">Conta</div>', unsafe_allow_html=True)
@@ -203,9 +229,16 @@ with st.sidebar:
     """, unsafe_allow_html=True)
 
 # ── Routing ───────────────────────────────────────────────────────────────────
-if "📊" in page:
-    from pages import dashboard; dashboard.show()
-elif "📋" in page:
-    from pages import projetos; projetos.show()
-elif "🗂️" in page:
-    from pages import kanban; kanban.show()
+with telemetry.rerun(ROUTES[page]) as trace, profiling.profile(trace), \
+        statement_budget(SQL_STATEMENT_BUDGET, page.strip()):
+    if "📊" in page:
+        from pages import dashboard; dashboard.show()
+    elif "📋" in page:
+        from pages import projetos; projetos.show()
+    elif "🗂️" in page:
+        from pages import kanban; kanban.show()
+
+if require_role("admin"):
+    with st.sidebar:
+        telemetry.debug_panel(trace, BOOT)
+        profiling.panel()
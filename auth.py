@@ -1,6 +1,200 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
+import metrics
 from database import get_db, verify_password
 from models import User
+from provisioning import hash_password, needs_rehash
+from writer import write
+import commands
+
+LOGIN_WORKERS = int(os.environ.get("LOGIN_WORKERS", "2"))
+LOGIN_MAX_PENDING = int(os.environ.get("LOGIN_MAX_PENDING", "16"))
+LOGIN_WINDOW_S = int(os.environ.get("LOGIN_WINDOW_S", "300"))
+LOGIN_MAX_FAILURES_EMAIL = int(os.environ.get("LOGIN_MAX_FAILURES_EMAIL", "5"))
+LOGIN_MAX_FAILURES_IP = int(os.environ.get("LOGIN_MAX_FAILURES_IP", "20"))
+
+# Without SESSION_SECRET the key is per process, so a restart signs everyone out
+SESSION_SECRET = os.environ.get("SESSION_SECRET", "").encode() or secrets.token_bytes(32)
+SESSION_TTL_H = float(os.environ.get("SESSION_TTL_H", "12"))
+SESSION_PARAM = "s"
+
+log = logging.getLogger("projectflow.auth")
+
+
+class LoginThrottled(Exception):
+    """Too many recent failures, or too many logins in flight; retry after ``retry_after`` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class FailureWindow:
+    """Failed attempts per key over a sliding window of ``window`` seconds."""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._failures = {}  # key -> deque of monotonic timestamps
+        self._lock = threading.Lock()
+
+    def retry_after(self, key, now):
+        """Seconds until ``key`` may try again (0 when it is not blocked)."""
+        with self._lock:
+            q = self._failures.get(key)
+            if not q:
+                return 0
+            while q and q[0] <= now - self.window:
+                q.popleft()
+            if not q:
+                del self._failures[key]
+                return 0
+            return q[0] + self.window - now if len(q) >= self.limit else 0
+
+    def fail(self, key, now):
+        with self._lock:
+            self._failures.setdefault(key, deque()).append(now)
+
+    def clear(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+
+
+class LoginVerifier:
+    """Runs password checks in a small worker pool, throttled per e-mail and per IP."""
+
+    def __init__(self):
+        self.pool = ThreadPoolExecutor(max_workers=LOGIN_WORKERS, thread_name_prefix="login")
+        self.slots = threading.BoundedSemaphore(LOGIN_MAX_PENDING)
+        self.by_email = FailureWindow(LOGIN_MAX_FAILURES_EMAIL, LOGIN_WINDOW_S)
+        self.by_ip = FailureWindow(LOGIN_MAX_FAILURES_IP, LOGIN_WINDOW_S)
+
+    def check(self, email, ip):
+        """Raise LoginThrottled if this e-mail or IP has failed too often."""
+        now = time.monotonic()
+        wait = max(self.by_email.retry_after(email, now), self.by_ip.retry_after(ip, now) if ip else 0)
+        if wait:
+            raise LoginThrottled(wait)
+
+    def verify(self, password, hashed):
+        """Return ``(ok, new_hash)``; ``new_hash`` is set when the stored hash should be upgraded."""
+        if not self.slots.acquire(blocking=False):
+            raise LoginThrottled(1)
+        try:
+            return self.pool.submit(_verify_and_upgrade, password, hashed).result()
+        finally:
+            self.slots.release()
+
+    def record(self, email, ip, ok):
+        now = time.monotonic()
+        if ok:
+            self.by_email.clear(email)
+            return
+        self.by_email.fail(email, now)
+        if ip:
+            self.by_ip.fail(ip, now)
+
+
+def _verify_and_upgrade(password, hashed):
+    if not verify_password(password, hashed):
+        return False, None
+    return True, hash_password(password) if needs_rehash(hashed) else None
+
+
+@st.cache_resource
+def login_verifier():
+    return LoginVerifier()
+
+
+# ── Session tokens ────────────────────────────────────────────────────────────
+# "<user_id>.<expires>.<nonce>.<hmac>" in the URL, so a reload or reconnect
+# resumes the session without the login form.
+
+class RevokedTokens:
+    """Nonces of signed-out tokens, kept until the token would have expired anyway."""
+
+    def __init__(self):
+        self._expires = {}  # nonce -> expiry (unix time)
+        self._lock = threading.Lock()
+
+    def revoke(self, nonce, expires):
+        now = time.time()
+        with self._lock:
+            self._expires[nonce] = expires
+            for n in [n for n, exp in self._expires.items() if exp < now]:
+                del self._expires[n]
+
+    def __contains__(self, nonce):
+        with self._lock:
+            return nonce in self._expires
+
+
+@st.cache_resource
+def revoked_tokens():
+    return RevokedTokens()
+
+
+def _sign(payload):
+    digest = hmac.new(SESSION_SECRET, payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode()
+
+
+def issue_session_token(user_id, now=None):
+    expires = int((now or time.time()) + SESSION_TTL_H * 3600)
+    payload = f"{user_id}.{expires}.{secrets.token_urlsafe(9)}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def _parse_token(token):
+    """Return ``(user_id, expires, nonce)`` for a well-signed token, else None."""
+    try:
+        user_id, expires, nonce, sig = token.split(".")
+        # Bytes: compare_digest rejects str with non-ASCII characters
+        if not hmac.compare_digest(sig.encode(), _sign(f"{user_id}.{expires}.{nonce}").encode()):
+            return None
+        return int(user_id), int(expires), nonce
+    except ValueError:
+        return None
+
+
+def read_session_token(token, now=None):
+    """User id of a valid, unexpired and unrevoked token, else None."""
+    parsed = _parse_token(token or "")
+    if parsed is None:
+        return None
+    user_id, expires, nonce = parsed
+    if expires < (now or time.time()) or nonce in revoked_tokens():
+        return None
+    return user_id
+
+
+def revoke_session_token(token):
+    parsed = _parse_token(token or "")
+    if parsed is not None:
+        revoked_tokens().revoke(parsed[2], parsed[1])
+
+
+def _start_session(user, token):
+    st.session_state.update({
+        "authenticated": True,
+        "user_id": user.id,
+        "user_nome": user.nome,
+        "user_email": user.email,
+        "user_role": user.role,
+        "user_color": user.avatar_color,
+        "session_token": token,
+    })
+    st.query_params[SESSION_PARAM] = token
 
 
 def login_page():
@@ -48,19 +242,17 @@ def login_page():
                 if not email or not senha:
                     st.error("Preencha e-mail e senha.")
                 else:
-                    user = authenticate(email, senha)
-                    if user:
-                        st.session_state.update({
-                            "authenticated": True,
-                            "user_id": user.id,
-                            "user_nome": user.nome,
-                            "user_email": user.email,
-                            "user_role": user.role,
-                            "user_color": user.avatar_color,
-                        })
-                        st.rerun()
+                    try:
+                        user = authenticate(email, senha, st.context.ip_address)
+                    except LoginThrottled as e:
+                        user = None
+                        st.warning(f"Muitas tentativas de login. Tente novamente em {max(1, round(e.retry_after))} s.")
                     else:
-                        st.error("E-mail ou senha incorretos.")
+                        if user:
+                            _start_session(user, issue_session_token(user.id))
+                            st.rerun()
+                        else:
+                            st.error("E-mail ou senha incorretos.")
 
         st.markdown("""
         <div class="demo-box">
@@ -72,25 +264,66 @@ def login_page():
         """, unsafe_allow_html=True)
 
 
-def authenticate(email, password):
+def authenticate(email, password, ip=None):
+    """Return the user for these credentials, or None.
+
+    Raises LoginThrottled when the e-mail or IP is over its failure budget
+    (no password check is made then). Legacy or low-cost hashes are
+    upgraded to the configured bcrypt cost on success.
+    """
+    verifier = login_verifier()
+    key = email.strip().lower()
+    verifier.check(key, ip)
+    # Closed before the bcrypt check: a queued login must not hold a pooled
+    # connection; the detached user keeps the columns it was loaded with
     db = get_db()
     try:
         user = db.query(User).filter(User.email == email).first()
-        if user and verify_password(password, user.senha_hash):
-            return user
-        return None
     finally:
         db.close()
 
+    ok, new_hash = False, None
+    if user:
+        start = time.perf_counter()
+        ok, new_hash = verifier.verify(password, user.senha_hash)
+        metrics.LOGIN_VERIFY_SECONDS.observe(time.perf_counter() - start, "ok" if ok else "falha")
+    verifier.record(key, ip, ok)
+    if not ok:
+        return None
+    if new_hash:
+        try:
+            write(commands.set_password_hash, user.id, new_hash)
+        except Exception:
+            # The old hash still works; the upgrade is tried again at the next login
+            log.warning("não foi possível atualizar o hash da senha do usuário %s", user.id, exc_info=True)
+    return user
+
 
 def logout():
+    revoke_session_token(st.session_state.get("session_token"))
+    st.query_params.pop(SESSION_PARAM, None)
     for k in list(st.session_state.keys()):
         del st.session_state[k]
     st.rerun()
 
 
 def require_auth():
-    return st.session_state.get("authenticated", False)
+    """True when the session is signed in, resuming it from the URL token if needed."""
+    if st.session_state.get("authenticated", False):
+        return True
+    token = st.query_params.get(SESSION_PARAM)
+    user_id = read_session_token(token)
+    if user_id is None:
+        return False
+    db = get_db()
+    try:
+        user = db.get(User, user_id)
+    finally:
+        db.close()
+    if user is None:
+        return False
+    _start_session(user, token)
+    return True
 
 
 def require_role(*roles):
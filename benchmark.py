@@ -0,0 +1,237 @@
+"""
+Benchmark das páginas sobre um banco (por exemplo, um gerado por ``synthetic.py``).
+
+Cada cenário roda o ``show()`` de uma página pelo ``AppTest`` do Streamlit,
+logado como admin: uma execução fria (caches de processo limpos),
+``BENCH_RUNS`` execuções quentes na mesma sessão e mais uma fria sob
+``tracemalloc`` para o pico de memória. Registra, para cada execução, o tempo
+do ``show()``, o tempo de parede total (que inclui o processamento da
+árvore de elementos pelo ``AppTest``) e o número de comandos SQL, e grava
+tudo num JSON que pode ser comparado com o de outra versão.
+
+Uso:
+    python benchmark.py banco.db [resultado.json] [cenário ...]
+    python benchmark.py --compare antes.json depois.json
+
+Cenários: dashboard, projetos, projeto_detalhe, kanban, tarefas (padrão: todos).
+A comparação termina com código 1 se algum tempo ou pico de memória piorou
+mais que ``BENCH_TOLERANCE`` (padrão 10%) ou se alguma página passou a
+fazer mais comandos SQL.
+"""
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_RUNS = int(os.environ.get("BENCH_RUNS", "5"))
+BENCH_TIMEOUT_S = float(os.environ.get("BENCH_TIMEOUT_S", "600"))
+BENCH_TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", "0.10"))
+
+LOGIN = {"authenticated": True, "user_id": 1, "user_nome": "Admin Sistema",
+         "user_role": "admin", "user_color": "#6366f1"}
+
+
+def _page_script(page, state):
+    # Runs as the AppTest script: it can only use its own imports and arguments
+    import importlib
+    import time
+    import streamlit as st
+    for key, value in state.items():
+        st.session_state.setdefault(key, value)
+    start = time.perf_counter()
+    importlib.import_module(f"pages.{page}").show()
+    st.session_state["_bench_show_s"] = time.perf_counter() - start
+
+
+def _scenarios(db):
+    from sqlalchemy import text
+    biggest = db.execute(text("SELECT id FROM projects ORDER BY n_tasks DESC, id LIMIT 1")).scalar()
+    return {
+        "dashboard": ("dashboard", {}),
+        "projetos": ("projetos", {}),
+        "projeto_detalhe": ("projetos", {"proj_detail_id": biggest}),
+        "kanban": ("kanban", {}),
+        "tarefas": ("tarefas", {}),
+    }
+
+
+class _StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def _clear_caches():
+    import streamlit as st
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def _new_app(page, state):
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_function(_page_script, args=(page, {**LOGIN, **state}), default_timeout=BENCH_TIMEOUT_S)
+
+
+def _measure(at, counter):
+    gc.collect()
+    counter.count = 0
+    start = time.perf_counter()
+    at.run()
+    wall = time.perf_counter() - start
+    show = at.session_state["_bench_show_s"] if "_bench_show_s" in at.session_state else None
+    at.session_state["_bench_show_s"] = None
+    return {"show_s": show and round(show, 4), "wall_s": round(wall, 4), "sql": counter.count,
+            "errors": [str(e.value) for e in at.exception]}
+
+
+def _scenario(page, state, counter):
+    _clear_caches()
+    at = _new_app(page, state)
+    cold = _measure(at, counter)
+    warm = [_measure(at, counter) for _ in range(BENCH_RUNS)]
+    shows = [w["show_s"] or 0.0 for w in warm]
+
+    _clear_caches()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        _new_app(page, state).run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "cold": {"show_s": cold["show_s"], "wall_s": cold["wall_s"], "sql": cold["sql"]},
+        "warm": {"show_s_median": round(statistics.median(shows), 4), "show_s_min": min(shows),
+                 "show_s_max": max(shows), "wall_s_median": round(statistics.median(w["wall_s"] for w in warm), 4),
+                 "sql": max(w["sql"] for w in warm)},
+        "peak_mem_mb": round(peak / 2**20, 2),
+        "errors": sorted({e for run in [cold, *warm] for e in run["errors"]}),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(path, names=None):
+    """Benchmark the scenarios in ``names`` (all by default) on the database at ``path``."""
+    # database.py binds its engine to DATABASE_URL on import
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(path)}"
+    import sqlalchemy
+    import streamlit
+    from sqlalchemy import event, text
+    import database
+
+    database.ensure_schema()
+    db = database.SessionLocal()
+    try:
+        rows = {t: db.execute(text(f"SELECT COUNT(*) FROM {t}")).scalar() for t in ("users", "projects", "tasks")}
+        scenarios = _scenarios(db)
+    finally:
+        db.close()
+    unknown = set(names or ()) - set(scenarios)
+    if unknown:
+        raise ValueError(f"cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    counter = _StatementCounter()
+    event.listen(database.engine, "before_cursor_execute", counter)
+    results = {}
+    try:
+        for name, (page, state) in scenarios.items():
+            if not names or name in names:
+                results[name] = _scenario(page, state, counter)
+    finally:
+        event.remove(database.engine, "before_cursor_execute", counter)
+
+    return {
+        "meta": {
+            "database": os.path.abspath(path), "rows": rows, "runs": BENCH_RUNS,
+            "git": _git_revision(), "python": platform.python_version(),
+            "streamlit": streamlit.__version__, "sqlalchemy": sqlalchemy.__version__,
+            "criado_em": datetime.now().isoformat(timespec="seconds"),
+        },
+        "scenarios": results,
+    }
+
+
+# ── Comparison ────────────────────────────────────────────────────────────────
+
+METRICS = [
+    ("cold.show_s", "fria (s)"),
+    ("warm.show_s_median", "quente (s)"),
+    ("warm.sql", "SQL"),
+    ("peak_mem_mb", "pico (MB)"),
+]
+
+
+def _get(result, path):
+    for key in path.split("."):
+        result = result[key]
+    return result
+
+
+def compare(before, after, tolerance=BENCH_TOLERANCE):
+    """``[(scenario, label, old, new, regressed)]`` for the scenarios present in both results."""
+    rows = []
+    for name, new in after["scenarios"].items():
+        old = before["scenarios"].get(name)
+        if old is None:
+            continue
+        for path, label in METRICS:
+            a, b = _get(old, path) or 0, _get(new, path) or 0
+            # SQL counts are exact: any increase is a regression
+            regressed = b > a if path == "warm.sql" else b > a * (1 + tolerance)
+            rows.append((name, label, a, b, regressed))
+    return rows
+
+
+def _print_results(result):
+    meta = result["meta"]
+    print(f"📊 {meta['database']}: {meta['rows']['projects']} projetos, {meta['rows']['tasks']} tarefas "
+          f"({meta['runs']} execuções quentes)")
+    print(f"{'cenário':<18}{'fria (s)':>10}{'quente (s)':>12}{'AppTest (s)':>13}"
+          f"{'SQL fria':>10}{'SQL quente':>12}{'pico (MB)':>11}")
+    for name, r in result["scenarios"].items():
+        print(f"{name:<18}{r['cold']['show_s'] or 0:>10.3f}{r['warm']['show_s_median']:>12.3f}"
+              f"{r['warm']['wall_s_median']:>13.3f}"
+              f"{r['cold']['sql']:>10}{r['warm']['sql']:>12}{r['peak_mem_mb']:>11.1f}"
+              + (f"  ❌ {r['errors'][0][:80]}" if r["errors"] else ""))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        sys.exit(__doc__)
+    if args[0] == "--compare":
+        with open(args[1]) as f:
+            antes = json.load(f)
+        with open(args[2]) as f:
+            depois = json.load(f)
+        rows = compare(antes, depois)
+        for name, label, a, b, regressed in rows:
+            change = f"{(b - a) / a:+.0%}" if a else "—"
+            print(f"{'❌' if regressed else '✅'} {name:<18}{label:<12}{a:>10}{b:>10}  {change}")
+        sys.exit(1 if any(r[4] for r in rows) else 0)
+
+    banco = args[0]
+    if not os.path.exists(banco):
+        sys.exit(f"❌ Banco não encontrado: {banco}")
+    saida = args[1] if len(args) > 1 else os.path.splitext(banco)[0] + ".json"
+    resultado = run_benchmark(banco, args[2:] or None)
+    with open(saida, "w") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    _print_results(resultado)
+    print(f"✅ Resultado gravado em {saida}")
@@ -0,0 +1,110 @@
+"""
+Comandos de escrita das páginas.
+
+Cada comando recebe como primeiro argumento a sessão da thread de escrita
+(``writer.py``), grava sem fazer commit e devolve só valores simples (ids,
+booleanos): o commit é feito pelo escritor, junto com os demais comandos do
+lote, e os objetos ORM não sobrevivem a ele.
+
+Os comandos de edição aceitam ``version``, a versão da linha que a página
+mostrou ao usuário: se outra pessoa gravou antes, levantam ``Conflict`` em
+vez de sobrescrever a alteração dela.
+"""
+from datetime import datetime
+from sqlalchemy.orm.exc import StaleDataError
+from counters import refresh_progress
+from models import Project, Task, User
+
+
+class Conflict(Exception):
+    """The row was changed or deleted by someone else after the page read it."""
+
+    def __init__(self, model, row_id):
+        super().__init__(f"{model.__tablename__} {row_id} was changed concurrently")
+        self.model = model
+        self.row_id = row_id
+
+
+def _versioned(db, model, row_id, version):
+    """The row to edit; ``Conflict`` if it is gone or no longer at ``version``."""
+    row = db.get(model, row_id)
+    if row is None or (version is not None and row.version != version):
+        raise Conflict(model, row_id)
+    return row
+
+
+def _flush(db, model, row_id):
+    # version_id_col adds "AND version = <read>" to the UPDATE; no row matched means a lost race
+    try:
+        db.flush()
+    except StaleDataError:
+        raise Conflict(model, row_id) from None
+
+
+def create_project(db, **fields):
+    proj = Project(**fields)
+    db.add(proj)
+    db.flush()
+    return proj.id
+
+
+def update_project(db, project_id, version=None, **fields):
+    """Apply ``fields`` to the project if it is still at ``version``."""
+    proj = _versioned(db, Project, project_id, version)
+    for name, value in fields.items():
+        setattr(proj, name, value)
+    proj.atualizado_em = datetime.now()
+    _flush(db, Project, project_id)
+
+
+def delete_project(db, project_id):
+    proj = db.get(Project, project_id)
+    if proj is None:
+        return False
+    db.delete(proj)
+    return True
+
+
+def create_task(db, **fields):
+    task = Task(**fields)
+    db.add(task)
+    db.flush()
+    if task.projeto_id:
+        refresh_progress(db, task.projeto_id)
+    return task.id
+
+
+def update_task(db, task_id, version=None, **fields):
+    """Apply ``fields`` to the task if it is still at ``version``, and refresh
+    the progress of the projects involved."""
+    task = _versioned(db, Task, task_id, version)
+    old_project = task.projeto_id
+    for name, value in fields.items():
+        setattr(task, name, value)
+    task.atualizado_em = datetime.now()
+    _flush(db, Task, task_id)
+    # Update project progress (counters are kept by triggers)
+    for project_id in {old_project, task.projeto_id} - {None}:
+        refresh_progress(db, project_id)
+
+
+def set_task_status(db, task_id, status, version=None):
+    update_task(db, task_id, version=version, status=status)
+
+
+def delete_task(db, task_id):
+    task = db.get(Task, task_id)
+    if task is None:
+        return False
+    project_id = task.projeto_id
+    db.delete(task)
+    db.flush()
+    if project_id:
+        refresh_progress(db, project_id)
+    return True
+
+
+def set_password_hash(db, user_id, senha_hash):
+    user = db.get(User, user_id)
+    if user is not None:
+        user.senha_hash = senha_hash
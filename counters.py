@@ -0,0 +1,167 @@
+"""
+Contadores de tarefas por projeto (n_tasks, n_done, n_in_progress e
+earliest_open_prazo), mantidos por triggers SQLite a cada INSERT, UPDATE e
+DELETE em ``tasks``.
+
+Em outros bancos não há triggers: eventos do ORM recontam os projetos
+afetados a cada tarefa gravada pela sessão. Escritas que não passam pelo
+ORM exigem ``python counters.py`` depois.
+
+Para recalcular todos os contadores de uma vez:
+    python counters.py
+"""
+from sqlalchemy import event, func, inspect, or_, select, text, update, case
+from models import Project, Task
+
+COUNTER_COLUMNS = {
+    "n_tasks": "INTEGER NOT NULL DEFAULT 0",
+    "n_done": "INTEGER NOT NULL DEFAULT 0",
+    "n_in_progress": "INTEGER NOT NULL DEFAULT 0",
+    "earliest_open_prazo": "DATETIME",
+}
+
+# Recalcula o menor prazo em aberto de projects.id (usado pelos triggers e pelo reparo)
+_EARLIEST_OPEN = """(
+    SELECT MIN(prazo) FROM tasks
+    WHERE projeto_id = projects.id AND status IS NOT 'Concluído'
+)"""
+
+TRIGGERS = {
+    "tasks_counters_ai": """
+    CREATE TRIGGER IF NOT EXISTS tasks_counters_ai AFTER INSERT ON tasks
+    BEGIN
+        UPDATE projects SET
+            n_tasks = n_tasks + 1,
+            n_done = n_done + (NEW.status IS 'Concluído'),
+            n_in_progress = n_in_progress + (NEW.status IS 'Em Andamento'),
+            earliest_open_prazo = CASE
+                WHEN NEW.status IS NOT 'Concluído' AND NEW.prazo IS NOT NULL
+                     AND (earliest_open_prazo IS NULL OR NEW.prazo < earliest_open_prazo)
+                THEN NEW.prazo ELSE earliest_open_prazo END
+        WHERE id = NEW.projeto_id;
+    END
+    """,
+    "tasks_counters_ad": f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_counters_ad AFTER DELETE ON tasks
+    BEGIN
+        UPDATE projects SET
+            n_tasks = n_tasks - 1,
+            n_done = n_done - (OLD.status IS 'Concluído'),
+            n_in_progress = n_in_progress - (OLD.status IS 'Em Andamento')
+        WHERE id = OLD.projeto_id;
+        UPDATE projects SET earliest_open_prazo = {_EARLIEST_OPEN}
+        WHERE id = OLD.projeto_id AND OLD.status IS NOT 'Concluído'
+              AND OLD.prazo <= earliest_open_prazo;
+    END
+    """,
+    "tasks_counters_au": f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_counters_au AFTER UPDATE OF projeto_id, status, prazo ON tasks
+    BEGIN
+        UPDATE projects SET
+            n_tasks = n_tasks - 1,
+            n_done = n_done - (OLD.status IS 'Concluído'),
+            n_in_progress = n_in_progress - (OLD.status IS 'Em Andamento')
+        WHERE id = OLD.projeto_id;
+        UPDATE projects SET
+            n_tasks = n_tasks + 1,
+            n_done = n_done + (NEW.status IS 'Concluído'),
+            n_in_progress = n_in_progress + (NEW.status IS 'Em Andamento')
+        WHERE id = NEW.projeto_id;
+        UPDATE projects SET earliest_open_prazo = {_EARLIEST_OPEN}
+        WHERE id = OLD.projeto_id AND OLD.status IS NOT 'Concluído'
+              AND OLD.prazo <= earliest_open_prazo;
+        UPDATE projects SET earliest_open_prazo = NEW.prazo
+        WHERE id = NEW.projeto_id AND NEW.status IS NOT 'Concluído' AND NEW.prazo IS NOT NULL
+              AND (earliest_open_prazo IS NULL OR NEW.prazo < earliest_open_prazo);
+    END
+    """,
+}
+
+REPAIR_SQL = f"""
+UPDATE projects SET
+    n_tasks = (SELECT COUNT(*) FROM tasks WHERE projeto_id = projects.id),
+    n_done = (SELECT COUNT(*) FROM tasks WHERE projeto_id = projects.id AND status = 'Concluído'),
+    n_in_progress = (SELECT COUNT(*) FROM tasks WHERE projeto_id = projects.id AND status = 'Em Andamento'),
+    earliest_open_prazo = {_EARLIEST_OPEN}
+"""
+
+
+def recount(conn, project_ids):
+    """Recount the counters of ``project_ids`` with portable SQL."""
+    tasks = Task.__table__
+    of_project = tasks.c.projeto_id == Project.id
+
+    def count(*where):
+        return select(func.count()).where(of_project, *where).scalar_subquery()
+
+    conn.execute(
+        update(Project.__table__)
+        .where(Project.id.in_(project_ids))
+        .values(
+            n_tasks=count(),
+            n_done=count(tasks.c.status == "Concluído"),
+            n_in_progress=count(tasks.c.status == "Em Andamento"),
+            earliest_open_prazo=select(func.min(tasks.c.prazo))
+            .where(of_project, or_(tasks.c.status.is_(None), tasks.c.status != "Concluído"))
+            .scalar_subquery(),
+        )
+    )
+
+
+@event.listens_for(Task, "after_insert")
+@event.listens_for(Task, "after_update")
+@event.listens_for(Task, "after_delete")
+def _recount_without_triggers(mapper, conn, task):
+    # On SQLite the triggers already did it
+    if conn.dialect.name == "sqlite":
+        return
+    ids = {task.projeto_id, *inspect(task).attrs.projeto_id.history.deleted} - {None}
+    if ids:
+        recount(conn, ids)
+
+
+def install_task_counters(conn):
+    """Add the counter columns and triggers if missing, repairing counts when installed."""
+    if conn.dialect.name != "sqlite":
+        return
+    existing_cols = {c["name"] for c in inspect(conn).get_columns("projects")}
+    existing_trg = {r[0] for r in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'"))}
+
+    changed = False
+    for col, ddl in COUNTER_COLUMNS.items():
+        if col not in existing_cols:
+            conn.execute(text(f"ALTER TABLE projects ADD COLUMN {col} {ddl}"))
+            changed = True
+    for name, ddl in TRIGGERS.items():
+        if name not in existing_trg:
+            conn.execute(text(ddl))
+            changed = True
+    if changed:
+        conn.execute(text(REPAIR_SQL))
+
+
+def repair_task_counters(conn):
+    """Recount every project's counters from the tasks table."""
+    if conn.dialect.name != "sqlite":
+        recount(conn, select(Project.id).scalar_subquery())
+        return
+    conn.execute(text(REPAIR_SQL))
+
+
+def refresh_progress(db, project_id):
+    """Set ``progresso`` from the counters; call after flushing the task change."""
+    db.execute(
+        update(Project)
+        .where(Project.id == project_id)
+        .values(progresso=case((Project.n_tasks > 0, Project.n_done * 100.0 / Project.n_tasks), else_=0.0))
+        .execution_options(synchronize_session=False)
+    )
+
+
+if __name__ == "__main__":
+    from database import engine
+    with engine.begin() as conn:
+        install_task_counters(conn)
+        repair_task_counters(conn)
+        n = conn.execute(text("SELECT COUNT(*) FROM projects")).scalar()
+    print(f"✅ Contadores recalculados para {n} projetos")
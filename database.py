@@ -1,15 +1,206 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from models import Base, User, Project, Task
+from migrations import run_migrations
+from provisioning import hash_password, hash_passwords
 import bcrypt
 from datetime import datetime, timedelta
 import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 
-DATABASE_URL = "sqlite:///./project_manager.db"
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./project_manager.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Pool (server databases and file-based SQLite)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+
+# SQLite connection profile, applied on every new connection
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "10000"))
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_MB", "256")) * 1024 * 1024,
+    "cache_size": -int(os.environ.get("SQLITE_CACHE_MB", "64")) * 1024,  # negative = KiB
+    "temp_store": "MEMORY",
+}
+
+# Test mode: when set, each page run may issue at most this many SQL statements.
+SQL_STATEMENT_BUDGET = int(os.environ.get("SQL_STATEMENT_BUDGET", "0")) or None
+
+
+class StatementBudgetExceeded(RuntimeError):
+    pass
+
+
+class _StatementBudget:
+    def __init__(self, limit, label):
+        self.limit = limit
+        self.label = label
+        self.count = 0
+
+
+_statement_budget = ContextVar("statement_budget", default=None)
+
+
+def _check_statement_budget(conn, cursor, statement, parameters, context, executemany):
+    budget = _statement_budget.get()
+    if budget is None:
+        return
+    budget.count += 1
+    if budget.count > budget.limit:
+        raise StatementBudgetExceeded(
+            f"{budget.label}: more than {budget.limit} SQL statements; last was: {statement[:200]}"
+        )
+
+
+@contextmanager
+def statement_budget(limit, label="page"):
+    """Fail with StatementBudgetExceeded once the block issues more than ``limit`` statements.
+
+    A ``None`` limit disables the check.
+    """
+    if limit is None:
+        yield
+        return
+    token = _statement_budget.set(_StatementBudget(limit, label))
+    try:
+        yield
+    finally:
+        _statement_budget.reset(token)
+
+
+# Per-rerun statement timings (see telemetry.py): the sink gets (statement, parameters, seconds)
+_sql_sink = ContextVar("sql_sink", default=None)
+
+
+def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    if _sql_sink.get() is not None and context is not None:
+        context._trace_start = time.perf_counter()
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    sink = _sql_sink.get()
+    start = getattr(context, "_trace_start", None)
+    if sink is not None and start is not None:
+        sink(statement, parameters, time.perf_counter() - start)
+
+
+@contextmanager
+def sql_trace(sink):
+    """Call ``sink(statement, parameters, seconds)`` for every statement the block runs on this thread."""
+    token = _sql_sink.set(sink)
+    try:
+        yield
+    finally:
+        _sql_sink.reset(token)
+
+
+def _enable_foreign_keys(dbapi_conn, connection_record):
+    # Off by default in SQLite; deleting a project relies on ON DELETE CASCADE
+    dbapi_conn.execute("PRAGMA foreign_keys=ON")
+
+
+def _apply_sqlite_pragmas(dbapi_conn, connection_record):
+    cur = dbapi_conn.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cur.execute(f"PRAGMA {name}={value}")
+    cur.close()
+
+
+def make_engine(url=DATABASE_URL):
+    """Build an engine for ``url`` with the pool and SQLite profile from the environment."""
+    if url.startswith("sqlite"):
+        in_memory = url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+        kwargs = {"connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+        if not in_memory:
+            kwargs.update(poolclass=QueuePool, pool_size=DB_POOL_SIZE,
+                          max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+        eng = create_engine(url, **kwargs)
+        event.listen(eng, "connect", _enable_foreign_keys)
+        if not in_memory:
+            event.listen(eng, "connect", _apply_sqlite_pragmas)
+    else:
+        eng = create_engine(
+            url, poolclass=QueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=True,
+        )
+    event.listen(eng, "before_cursor_execute", _check_statement_budget)
+    event.listen(eng, "before_cursor_execute", _start_statement_timer)
+    event.listen(eng, "after_cursor_execute", _record_statement)
+    return eng
+
+
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Global data revision: bumped by every SessionLocal commit that wrote something.
+# Cached read models (read_models.py) are keyed on it, together with SQLite's
+# data_version, which also moves when another process (the importer, another
+# app server) commits to the same file.
+_revision_lock = threading.Lock()
+_data_revision = 0
+_version_conn = None
+
+
+def _database_version():
+    """PRAGMA data_version on a connection kept for it alone; None when not a SQLite file.
+
+    The value changes whenever any other connection commits, so the reading
+    connection must never write.
+    """
+    global _version_conn
+    url = engine.url
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:") or "mode=memory" in str(url):
+        return None
+    with _revision_lock:
+        try:
+            if _version_conn is None:
+                _version_conn = engine.raw_connection()
+                _version_conn.detach()  # out of the pool: the page sessions keep every slot
+            cur = _version_conn.cursor()
+            try:
+                return cur.execute("PRAGMA data_version").fetchone()[0]
+            finally:
+                cur.close()
+        except Exception:
+            if _version_conn is not None:
+                _version_conn.close()
+            _version_conn = None
+            return None
+
+
+def data_revision():
+    return _data_revision, _database_version()
+
+
+def bump_data_revision():
+    global _data_revision
+    with _revision_lock:
+        _data_revision += 1
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _mark_session_wrote(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _bump_revision_on_commit(session):
+    if session.info.pop("wrote", False):
+        bump_data_revision()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_rolled_back_writes(session):
+    session.info.pop("wrote", None)
+
 
 def get_db():
     db = SessionLocal()
@@ -20,22 +211,24 @@ def get_db():
         raise
 
 
-def init_db():
-    """Initialize database and create tables."""
+def ensure_schema():
+    """Create missing tables and apply pending migrations, without seeding."""
     Base.metadata.create_all(bind=engine)
-    seed_data()
+    run_migrations(engine)
 
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+def init_db():
+    """Initialize database and create tables."""
+    ensure_schema()
+    seed_data()
 
 
 def verify_password(password: str, hashed: str) -> bool:
-    # Support sha256 fallback hashes (when bcrypt not available at seed time)
+    # Legacy sha256 hashes from older imports; auth.authenticate rehashes them on login
     if hashed.startswith("sha256$"):
-        import hashlib
+        import hashlib, hmac
         _, salt, h = hashed.split("$")
-        return hashlib.sha256((salt + password).encode()).hexdigest() == h
+        return hmac.compare_digest(hashlib.sha256((salt + password).encode()).hexdigest(), h)
     try:
         return bcrypt.checkpw(password.encode(), hashed.encode())
     except Exception:
@@ -50,15 +243,16 @@ def seed_data():
             return  # Already seeded (either demo or Petrobras import)
 
         # Create default users
+        demo = [
+            ("Admin Sistema", "admin@demo.com", "admin123", "admin", "#6366f1"),
+            ("Maria Gestora", "gestor@demo.com", "gestor123", "gestor", "#10b981"),
+            ("João Colaborador", "colab@demo.com", "colab123", "colaborador", "#f59e0b"),
+            ("Ana Silva", "ana@demo.com", "ana123", "colaborador", "#ef4444"),
+        ]
+        hashes = hash_passwords(senha for _, _, senha, _, _ in demo)
         users = [
-            User(nome="Admin Sistema", email="admin@demo.com",
-                 senha_hash=hash_password("admin123"), role="admin", avatar_color="#6366f1"),
-            User(nome="Maria Gestora", email="gestor@demo.com",
-                 senha_hash=hash_password("gestor123"), role="gestor", avatar_color="#10b981"),
-            User(nome="João Colaborador", email="colab@demo.com",
-                 senha_hash=hash_password("colab123"), role="colaborador", avatar_color="#f59e0b"),
-            User(nome="Ana Silva", email="ana@demo.com",
-                 senha_hash=hash_password("ana123"), role="colaborador", avatar_color="#ef4444"),
+            User(nome=nome, email=email, senha_hash=h, role=role, avatar_color=cor)
+            for (nome, email, _, role, cor), h in zip(demo, hashes)
         ]
         db.add_all(users)
         db.commit()
@@ -0,0 +1,155 @@
+"""
+Métricas do processo no formato do Prometheus / OpenMetrics.
+
+Com ``METRICS_PORT`` definido, ``start_server()`` sobe um servidor HTTP da
+biblioteca padrão numa thread à parte, e ``GET /metrics`` devolve:
+
+- ``projectflow_rerun_seconds{page}``: duração de cada execução da página
+  roteada em ``app.py`` (ver ``telemetry.rerun``);
+- ``projectflow_rerun_sql_statements{page}``: comandos SQL por execução;
+- ``projectflow_login_verify_seconds{result}``: verificação de senha em
+  ``auth.authenticate``;
+- ``projectflow_write_commit_seconds``: de ``writer.write`` até o commit
+  do lote;
+- ``projectflow_cache_hits_total`` / ``projectflow_cache_misses_total``
+  ``{cache}``: caches de read models e de cards.
+
+Cada réplica expõe só os próprios números, em sua porta; a soma da frota
+fica com o Prometheus. O formato OpenMetrics é usado quando o coletor o
+pede no cabeçalho ``Accept``.
+"""
+import bisect
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0") or 0)
+METRICS_ADDR = os.environ.get("METRICS_ADDR", "0.0.0.0")
+
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+log = logging.getLogger("projectflow.metrics")
+
+
+class Histogram:
+    """Cumulative histogram with fixed ``buckets`` (upper bounds), one series per label values."""
+
+    def __init__(self, name, help, buckets, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = labelnames
+        self._series = {}  # label values -> [count per bucket..., +Inf bucket, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def expose(self, openmetrics):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labelvalues, values in sorted(series.items()):
+            labels = list(zip(self.labelnames, labelvalues))
+            total = 0
+            for bound, n in zip([*self.buckets, float("inf")], values):
+                total += n
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_labels(labels + [('le', le)])} {total}")
+            lines.append(f"{self.name}_count{_labels(labels)} {total}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {values[-1]!r}")
+        return lines
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+RERUN_SECONDS = Histogram(
+    "projectflow_rerun_seconds", "Duration of one run of the routed page.",
+    (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30), ("page",))
+RERUN_SQL_STATEMENTS = Histogram(
+    "projectflow_rerun_sql_statements", "SQL statements issued by one run of the routed page.",
+    (0, 1, 2, 5, 10, 20, 50, 100, 200, 500), ("page",))
+LOGIN_VERIFY_SECONDS = Histogram(
+    "projectflow_login_verify_seconds", "Password verification time at login.",
+    (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10), ("result",))
+WRITE_COMMIT_SECONDS = Histogram(
+    "projectflow_write_commit_seconds", "Time from queueing a write until its batch is committed.",
+    (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+
+HISTOGRAMS = [RERUN_SECONDS, RERUN_SQL_STATEMENTS, LOGIN_VERIFY_SECONDS, WRITE_COMMIT_SECONDS]
+
+_caches = {}  # name -> object with ``hits`` and ``misses``
+
+
+def watch_cache(name, cache):
+    """Export ``cache.hits`` and ``cache.misses`` with the label ``cache=name``; returns ``cache``."""
+    _caches[name] = cache
+    return cache
+
+
+def _cache_counters(openmetrics):
+    lines = []
+    for field in ("hits", "misses"):
+        name = f"projectflow_cache_{field}"
+        # OpenMetrics names the counter family without the _total suffix of its sample
+        family = name if openmetrics else f"{name}_total"
+        lines += [f"# HELP {family} Cache {field}.", f"# TYPE {family} counter"]
+        lines += [f"{name}_total{_labels([('cache', cache_name)])} {getattr(cache, field)}"
+                  for cache_name, cache in sorted(_caches.items())]
+    return lines
+
+
+def exposition(openmetrics=False):
+    """Every metric in the Prometheus text format, or OpenMetrics when ``openmetrics`` is true."""
+    lines = [line for h in HISTOGRAMS for line in h.expose(openmetrics)] + _cache_counters(openmetrics)
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+        body = exposition(openmetrics).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_TYPE if openmetrics else PROMETHEUS_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug("%s " + format, self.address_string(), *args)
+
+
+@st.cache_resource
+def start_server(port=METRICS_PORT, addr=METRICS_ADDR):
+    """Serve /metrics on ``port`` from a daemon thread, once per process; None when disabled."""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((addr, port), _Handler)
+    except OSError as e:
+        log.warning("métricas desativadas: porta %s indisponível (%s)", port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    log.info("métricas em http://%s:%s/metrics", addr, port)
+    return server
@@ -0,0 +1,248 @@
+"""
+Migrações de esquema versionadas, aplicadas por ``init_db()``.
+
+Cada migração roda uma única vez, na sua própria transação, e fica
+registrada em ``schema_migrations``. Depois de aplicar alguma, roda ANALYZE
+para o planejador do SQLite conhecer os índices novos.
+
+Para conferir o plano das consultas das páginas:
+    python migrations.py --explain
+"""
+import re
+import sys
+from datetime import datetime
+from sqlalchemy import event, inspect, text
+from models import Base
+from counters import install_task_counters
+from search import install_search
+
+
+def _hot_path_indexes(conn):
+    # Indexes on columns a later migration adds are created by that migration
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+        for index in table.indexes:
+            if all(c.name in existing for c in index.columns):
+                index.create(conn, checkfirst=True)
+
+
+PLANNER_COLUMNS = {
+    "projects": {"planner_key": "VARCHAR(200)", "import_hash": "VARCHAR(32)"},
+    "tasks": {"planner_key": "VARCHAR(220)"},
+}
+
+
+def _add_columns(conn, columns):
+    # Databases created after the model change already have them
+    for table, cols in columns.items():
+        existing = {c["name"] for c in inspect(conn).get_columns(table)}
+        for col, ddl in cols.items():
+            if col not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {col} {ddl}"))
+
+
+def _planner_import_keys(conn):
+    _add_columns(conn, PLANNER_COLUMNS)
+    _hot_path_indexes(conn)
+
+
+ROW_VERSION_COLUMNS = {
+    "projects": {"version": "INTEGER NOT NULL DEFAULT 1"},
+    "tasks": {"version": "INTEGER NOT NULL DEFAULT 1"},
+}
+
+
+def _row_versions(conn):
+    _add_columns(conn, ROW_VERSION_COLUMNS)
+
+
+_PROJECT_FK = re.compile(r",\s*FOREIGN KEY\s*\(\s*projeto_id\s*\)\s*REFERENCES\s+\"?projects\"?\s*\([^)]*\)", re.I)
+_CREATE_TASKS = re.compile(r"^\s*CREATE TABLE\s+\"?tasks\"?", re.I)
+
+
+def _cascade_project_deletes(conn):
+    """Rebuild ``tasks`` with ``ON DELETE CASCADE`` on ``projeto_id``.
+
+    SQLite can't alter a constraint, so this follows its table-rebuild
+    procedure: the stored CREATE TABLE gets the new foreign key, the rows are
+    copied, and the table's own indexes and triggers (counters, FTS sync) are
+    recreated from their stored SQL, under the same names.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    # Databases created from the current models already have it
+    if any(fk[3] == "projeto_id" and fk[6] == "CASCADE" for fk in conn.exec_driver_sql("PRAGMA foreign_key_list(tasks)")):
+        return
+    table_sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tasks'").scalar()
+    dependents = [sql for sql, in conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'tasks' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+    )]
+    new_sql = _CREATE_TASKS.sub("CREATE TABLE tasks_new", _PROJECT_FK.sub("", table_sql), count=1).rstrip()
+    new_sql = new_sql[:-1].rstrip() + ",\n\tFOREIGN KEY(projeto_id) REFERENCES projects (id) ON DELETE CASCADE\n)"
+
+    # Tasks of projects deleted while foreign keys were off would fail the copy
+    conn.exec_driver_sql("UPDATE tasks SET projeto_id = NULL WHERE projeto_id NOT IN (SELECT id FROM projects)")
+    conn.exec_driver_sql(new_sql)
+    conn.exec_driver_sql("INSERT INTO tasks_new SELECT * FROM tasks")
+    conn.exec_driver_sql("DROP TABLE tasks")
+    conn.exec_driver_sql("ALTER TABLE tasks_new RENAME TO tasks")
+    for sql in dependents:
+        conn.exec_driver_sql(sql)
+    violations = conn.exec_driver_sql("PRAGMA foreign_key_check(tasks)").fetchall()
+    if violations:
+        raise RuntimeError(f"tasks: {len(violations)} foreign key violations after the rebuild")
+
+
+MIGRATIONS = [
+    (1, "contadores de tarefas por projeto", install_task_counters),
+    (2, "índices das consultas das páginas", _hot_path_indexes),
+    (3, "índice de atraso da lista de projetos", _hot_path_indexes),
+    (4, "busca textual (FTS5)", install_search),
+    (5, "chaves de importação do Planner", _planner_import_keys),
+    (6, "versão das linhas (concorrência otimista)", _row_versions),
+    (7, "exclusão em cascata das tarefas do projeto", _cascade_project_deletes),
+    (8, "índices de status e prioridade das tarefas", _hot_path_indexes),
+]
+
+
+def run_migrations(engine):
+    """Apply pending migrations in order; return the versions applied."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, nome TEXT NOT NULL, aplicado_em DATETIME NOT NULL)"
+        ))
+
+    applied = []
+    for version, nome, migrate in MIGRATIONS:
+        with engine.begin() as conn:
+            done = conn.execute(
+                text("SELECT 1 FROM schema_migrations WHERE version = :v"), {"v": version}
+            ).first()
+            if done:
+                continue
+            migrate(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, nome, aplicado_em) VALUES (:v, :n, :t)"),
+                {"v": version, "n": nome, "t": datetime.utcnow()},
+            )
+        applied.append(version)
+
+    if applied:
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    return applied
+
+
+# ── EXPLAIN QUERY PLAN ───────────────────────────────────────────────────────
+
+def _run_page_queries(db, now, pid, uid):
+    """Execute the queries the pages issue, with representative filters."""
+    from aggregates import dashboard_stats
+    import queries
+
+    dashboard_stats(db, now)
+    queries.kanban_counts(db, projeto_id=pid)
+    queries.kanban_counts(db, responsavel_ids=[uid])
+    queries.kanban_column(db, "A Fazer", now, 20, projeto_id=pid)
+    queries.kanban_column(db, "Em Andamento", now, 20, responsavel_ids=[uid])
+    _, cursor = queries.kanban_column(db, "Concluído", now, 20)
+    queries.kanban_column(db, "Concluído", now, 20, cursor=cursor)
+    queries.project_page(db)
+    _, cursor = queries.project_page(db, status="Ativo")
+    queries.project_page(db, cursor=cursor, status="Ativo")
+    queries.project_page(db, responsavel_id=uid, atraso="Com atraso", now=now)
+    queries.count_projects(db, atraso="Em dia", now=now)
+    _, cursor = queries.project_page(db, search="gestao", limit=2)
+    queries.project_page(db, search="gestao", cursor=cursor, limit=2)
+    queries.count_projects(db, search="1368189")
+    queries.project_detail(db, pid)
+    queries.project_tasks(db, pid)
+    _, cursor = queries.task_page(db)
+    queries.task_page(db, cursor=cursor)
+    queries.task_page(db, projeto_id=pid, status="A Fazer")
+    queries.task_page(db, status="Em Andamento", prioridade="Alta")
+    queries.task_page(db, prioridade="Crítica")
+    queries.count_tasks(db, status="Em Andamento", prioridade="Alta")
+    queries.task_page(db, search="validacao", projeto_id=pid)
+
+
+_SCAN = re.compile(r"SCAN (\S+)(?: USING (COVERING )?INDEX)?")
+
+
+def query_plan(cursor, statement, parameters):
+    """``(plan_details, full_scan)`` of one statement from SQLite's EXPLAIN QUERY PLAN.
+
+    ``full_scan`` is true when some table is read whole (a ``SCAN``, that
+    is, with no constraint), even in the order of an index. See
+    ``_is_full_scan`` for the two scans that are allowed.
+    """
+    cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+    details = [row[3] for row in cursor.fetchall()]
+    return details, any(_is_full_scan(d, statement) for d in details)
+
+
+def _is_full_scan(detail, statement):
+    m = _SCAN.match(detail)
+    # FTS lookups, constant rows and materialized subqueries are not tables
+    if m is None or "VIRTUAL TABLE" in detail or m.group(1) == "CONSTANT" or m.group(1).startswith("("):
+        return False
+    sql = " ".join(statement.upper().split())
+    # Whole-table aggregates (dashboard, Kanban counters) read a covering index, not the table
+    if m.group(2) and " GROUP BY " in sql:
+        return False
+    # First page of a list: walks an index in ORDER BY order and stops at LIMIT
+    if "INDEX" in detail and " WHERE " not in sql and " LIMIT " in sql:
+        return False
+    return True
+
+
+def explain_page_queries(engine):
+    """Return ``[(statement, plan_details, full_scan)]`` for the page queries."""
+    from database import SessionLocal
+    from models import Project, User
+
+    captured = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    db = SessionLocal(bind=engine)
+    try:
+        pid = db.query(Project.id).order_by(Project.n_tasks.desc()).limit(1).scalar()
+        uid = db.query(User.id).limit(1).scalar()
+        event.listen(engine, "before_cursor_execute", _capture)
+        try:
+            _run_page_queries(db, datetime.now(), pid, uid)
+        finally:
+            event.remove(engine, "before_cursor_execute", _capture)
+    finally:
+        db.close()
+
+    report = []
+    seen = set()
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        for statement, parameters in captured:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            report.append((statement, *query_plan(cur, statement, parameters)))
+    finally:
+        raw.close()
+    return report
+
+
+if __name__ == "__main__":
+    from database import engine
+    run_migrations(engine)
+    if "--explain" in sys.argv:
+        n_scans = 0
+        for statement, details, full_scan in explain_page_queries(engine):
+            n_scans += full_scan
+            print(("❌ " if full_scan else "✅ ") + " ".join(statement.split())[:160])
+            for d in details:
+                print(f"      {d}")
+        sys.exit(1 if n_scans else 0)
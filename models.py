@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Enum, Index, text
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 import enum
@@ -47,6 +47,10 @@ class User(Base):
     projetos = relationship("Project", back_populates="responsavel_user", foreign_keys="Project.responsavel_id")
     tarefas = relationship("Task", back_populates="responsavel_user", foreign_keys="Task.responsavel_id")
 
+    __table_args__ = (
+        Index("ix_users_nome", "nome"),
+    )
+
 
 class Project(Base):
     __tablename__ = "projects"
@@ -62,8 +66,32 @@ class Project(Base):
     criado_em = Column(DateTime, default=datetime.utcnow)
     atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Contadores das tarefas, mantidos por triggers (ver counters.py)
+    n_tasks = Column(Integer, nullable=False, default=0, server_default="0")
+    n_done = Column(Integer, nullable=False, default=0, server_default="0")
+    n_in_progress = Column(Integer, nullable=False, default=0, server_default="0")
+    earliest_open_prazo = Column(DateTime)
+
+    # Chave estável e hash da linha de origem no Planner (ver seed_petrobras.py)
+    planner_key = Column(String(200))
+    import_hash = Column(String(32))
+
+    # Versão da linha: o ORM só grava um UPDATE se ela ainda for a lida (ver commands.py)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
     responsavel_user = relationship("User", back_populates="projetos", foreign_keys=[responsavel_id])
-    tarefas = relationship("Task", back_populates="projeto", cascade="all, delete-orphan")
+    # The database deletes the tasks (ON DELETE CASCADE); the ORM doesn't load them first
+    tarefas = relationship("Task", back_populates="projeto", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_projects_criado_em_id", "criado_em", "id"),
+        Index("ix_projects_status_criado_em", "status", "criado_em"),
+        Index("ix_projects_responsavel_status", "responsavel_id", "status"),
+        Index("ix_projects_nome", "nome"),
+        Index("ix_projects_earliest_open_prazo", "earliest_open_prazo"),
+        Index("ux_projects_planner_key", "planner_key", unique=True),
+    )
+    __mapper_args__ = {"version_id_col": version}
 
 
 class Task(Base):
@@ -72,13 +100,27 @@ class Task(Base):
     id = Column(Integer, primary_key=True, index=True)
     titulo = Column(String(200), nullable=False)
     descricao = Column(Text)
-    projeto_id = Column(Integer, ForeignKey("projects.id"))
+    projeto_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
     responsavel_id = Column(Integer, ForeignKey("users.id"))
     status = Column(String(30), default="A Fazer")
     prioridade = Column(String(20), default="Média")
     prazo = Column(DateTime)
     data_criacao = Column(DateTime, default=datetime.utcnow)
     atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    planner_key = Column(String(220))
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     projeto = relationship("Project", back_populates="tarefas")
     responsavel_user = relationship("User", back_populates="tarefas", foreign_keys=[responsavel_id])
+
+    __table_args__ = (
+        Index("ix_tasks_projeto_status", "projeto_id", "status"),
+        Index("ix_tasks_responsavel_status", "responsavel_id", "status"),
+        Index("ix_tasks_open_status_prazo", "status", "prazo",
+              sqlite_where=text("status != 'Concluído'")),
+        Index("ix_tasks_data_criacao", "data_criacao"),
+        Index("ix_tasks_status_prioridade", "status", "prioridade", "data_criacao"),
+        Index("ix_tasks_prioridade", "prioridade", "data_criacao"),
+        Index("ux_tasks_planner_key", "planner_key", unique=True),
+    )
+    __mapper_args__ = {"version_id_col": version}
@@ -1,185 +1,290 @@
 import streamlit as st
 from datetime import datetime
-from database import get_db
-from models import Task, Project
+from database import data_revision, get_db
+import commands
+import queries
+import read_models
+from render import TASK_FIELDS, card_cache, conflict_warning, esc, row_values, template
+from telemetry import note_filters, timed
+from writer import write
+
+KANBAN_PAGE = 20
+
+COLUMNS = [
+    {"status": "A Fazer", "key": "kb_todo", "title": "📝 A Fazer", "color": "#f59e0b", "bg": "#1f1a08",
+     "border": "#6a4a08", "label": "#6a4a08", "empty": "#2e4a20", "empty_msg": "Nenhuma tarefa pendente 🎉"},
+    {"status": "Em Andamento", "key": "kb_doing", "title": "⚙️ Em Andamento", "color": "#3b9eff", "bg": "#0d2137",
+     "border": "#1d5a8a", "label": "#1d4a8a", "empty": "#1e3a5a", "empty_msg": "Nenhuma tarefa em andamento"},
+    {"status": "Concluído", "key": "kb_done", "title": "✅ Concluído", "color": "#10b981", "bg": "#0d2118",
+     "border": "#1a6040", "label": "#1a4a30", "empty": "#1a3a25", "empty_msg": "Nenhuma tarefa concluída"},
+]
 
 
 def show():
     st.markdown("""
     <div style="margin-bottom:1.2rem;">
         <h1 style="font-size:1.8rem;font-weight:700;color:#e2f0ff;margin:0;letter-spacing:-0.5px;">🗂️ Kanban</h1>
-        <div style="font-size:0.82rem;color:#4a6a8a;margin-top:0.2rem;">Arraste tarefas entre colunas usando os botões de movimento</div>
+        <div style="font-size:0.82rem;color:#4a6a8a;margin-top:0.2rem;">Mova tarefas entre colunas pelo seletor abaixo de cada coluna</div>
     </div>
     """, unsafe_allow_html=True)
 
-    db = get_db()
-    try:
-        projects = db.query(Project).order_by(Project.nome).all()
-        proj_opts = ["Todos os Projetos"] + [p.nome[:60] + ("..." if len(p.nome) > 60 else "") for p in projects]
-        proj_map = {(p.nome[:60] + ("..." if len(p.nome) > 60 else "")): p.id for p in projects}
-
-        col_f1, col_f2 = st.columns([2, 2])
-        with col_f1:
-            sel_proj = st.selectbox("📁 Projeto", proj_opts, label_visibility="collapsed")
-        with col_f2:
-            sel_resp = st.text_input("🔍 Filtrar por responsável", placeholder="Nome do responsável...", label_visibility="collapsed")
-
-        query = db.query(Task)
-        if sel_proj != "Todos os Projetos":
-            pid = proj_map.get(sel_proj)
-            if pid:
-                query = query.filter(Task.projeto_id == pid)
-        if sel_resp:
-            from models import User
-            users = db.query(User).filter(User.nome.ilike(f"%{sel_resp}%")).all()
-            uids = [u.id for u in users]
-            if uids:
-                query = query.filter(Task.responsavel_id.in_(uids))
-
-        all_tasks = query.all()
-
-        a_fazer     = [t for t in all_tasks if t.status == "A Fazer"]
-        em_andamento = [t for t in all_tasks if t.status == "Em Andamento"]
-        concluido   = [t for t in all_tasks if t.status == "Concluído"]
-
-        # Stats
-        c1, c2, c3 = st.columns(3)
-        with c1:
-            st.markdown(f"""
-            <div style="background:#1f1a08;border:1.5px solid #6a4a0888;border-radius:12px;
-                padding:0.8rem 1.1rem;text-align:center;margin-bottom:1rem;">
-                <div style="font-size:1.6rem;font-weight:700;color:#f59e0b;">{len(a_fazer)}</div>
-                <div style="font-size:0.72rem;color:#6a4a08;font-weight:600;text-transform:uppercase;">A Fazer</div>
-            </div>
-            """, unsafe_allow_html=True)
-        with c2:
-            st.markdown(f"""
-            <div style="background:#0d2137;border:1.5px solid #1d5a8a88;border-radius:12px;
-                padding:0.8rem 1.1rem;text-align:center;margin-bottom:1rem;">
-                <div style="font-size:1.6rem;font-weight:700;color:#3b9eff;">{len(em_andamento)}</div>
-                <div style="font-size:0.72rem;color:#1d4a8a;font-weight:600;text-transform:uppercase;">Em Andamento</div>
-            </div>
-            """, unsafe_allow_html=True)
-        with c3:
+    projects = read_models.project_options()
+    proj_opts = ["Todos os Projetos"] + [nome[:60] + ("..." if len(nome) > 60 else "") for _, nome, _ in projects]
+    proj_map = {(nome[:60] + ("..." if len(nome) > 60 else "")): pid for pid, nome, _ in projects}
+
+    col_f1, col_f2 = st.columns([2, 2])
+    with col_f1:
+        sel_proj = st.selectbox("📁 Projeto", proj_opts, label_visibility="collapsed")
+    with col_f2:
+        sel_resp = st.text_input("🔍 Filtrar por responsável", placeholder="Nome do responsável...", label_visibility="collapsed")
+
+    pid = proj_map.get(sel_proj) if sel_proj != "Todos os Projetos" else None
+    uids = None
+    if sel_resp:
+        termo = sel_resp.lower()
+        uids = [uid for uid, nome in read_models.user_options() if termo in nome.lower()]
+
+    filtros = dict(projeto_id=pid, responsavel_ids=uids)
+    note_filters(projeto=sel_proj, responsavel=sel_resp)
+
+    conflict = st.session_state.pop("kb_conflict", None)
+    if conflict:
+        _conflict_warning(*conflict)
+
+    # Each column loads its first cards; "carregar mais" appends the next page after its cursor
+    assinatura = (sel_proj, sel_resp)
+    if st.session_state.get("kb_filtros") != assinatura:
+        st.session_state["kb_filtros"] = assinatura
+        st.session_state["kb_cols"] = {}
+
+    # The counters and each column are fragments: a move reruns only the
+    # counters and the two columns it touches, not the filters or the sidebar
+    _stats(filtros)
+    for col, c in zip(st.columns(3), COLUMNS):
+        with col:
+            _COLUMN_FRAGMENTS[c["status"]](c, filtros)
+
+
+@st.fragment(key="kb_stats")
+@timed("contadores")
+def _stats(filtros):
+    counts = _counts(filtros)
+    for col, c in zip(st.columns(3), COLUMNS):
+        with col:
             st.markdown(f"""
-            <div style="background:#0d2118;border:1.5px solid #1a604088;border-radius:12px;
+            <div style="background:{c['bg']};border:1.5px solid {c['border']}88;border-radius:12px;
                 padding:0.8rem 1.1rem;text-align:center;margin-bottom:1rem;">
-                <div style="font-size:1.6rem;font-weight:700;color:#10b981;">{len(concluido)}</div>
-                <div style="font-size:0.72rem;color:#1a4a30;font-weight:600;text-transform:uppercase;">Concluído</div>
+                <div style="font-size:1.6rem;font-weight:700;color:{c['color']};">{counts.get(c['status'], 0)}</div>
+                <div style="font-size:0.72rem;color:{c['label']};font-weight:600;text-transform:uppercase;">{c['status']}</div>
             </div>
             """, unsafe_allow_html=True)
 
-        col_a, col_b, col_c = st.columns(3)
 
-        _col_header(col_a, "📝 A Fazer", "#f59e0b", "#1f1a08", len(a_fazer))
-        _col_header(col_b, "⚙️ Em Andamento", "#3b9eff", "#0d2137", len(em_andamento))
-        _col_header(col_c, "✅ Concluído", "#10b981", "#0d2118", len(concluido))
+def _counts(filtros):
+    """Tasks per column from one COUNT ... GROUP BY status.
+
+    Kept in the session until the filters or the data change, so the
+    counters and the three column headers share a single query per run.
+    """
+    key = (st.session_state.get("kb_filtros"), data_revision())
+    cached = st.session_state.get("kb_counts")
+    if cached is None or cached[0] != key:
+        db = get_db()
+        try:
+            cached = st.session_state["kb_counts"] = (key, queries.kanban_counts(db, **filtros))
+        finally:
+            db.close()
+    return cached[1]
+
+
+@timed("coluna")
+def _column(c, filtros):
+    status = c["status"]
+    total = _counts(filtros).get(status, 0)
+    col = None
+    if total:
+        db = get_db()
+        try:
+            col = _loaded(db, status, filtros)
+        finally:
+            db.close()
+
+    header = _COL_HEADER.format(title=c["title"], color=c["color"], bg=c["bg"], count=total)
+    if not col or not col["cards"]:
+        st.markdown(header + _EMPTY.format(color=c["empty"], msg=c["empty_msg"]), unsafe_allow_html=True)
+        return
+    st.markdown(header + "".join(col["cards"]), unsafe_allow_html=True)
+    _move_control(status, col["moves"])
+    if col["cursor"] is not None:
+        restantes = total - len(col["moves"])
+        st.button(f"⬇ Carregar mais ({max(restantes, 1)} restantes)", key=f"kb_more_{status}",
+                  use_container_width=True, on_click=_load_more, args=(status, filtros))
 
-        now = datetime.now()
 
-        with col_a:
-            if not a_fazer:
-                st.markdown('<div style="text-align:center;color:#2e4a20;padding:1.5rem;font-size:0.85rem;">Nenhuma tarefa pendente 🎉</div>', unsafe_allow_html=True)
-            for t in a_fazer:
-                _kanban_card(t, db, now)
+def _loaded(db, status, filtros):
+    """The column's cards so far, kept in the session.
 
-        with col_b:
-            if not em_andamento:
-                st.markdown('<div style="text-align:center;color:#1e3a5a;padding:1.5rem;font-size:0.85rem;">Nenhuma tarefa em andamento</div>', unsafe_allow_html=True)
-            for t in em_andamento:
-                _kanban_card(t, db, now)
+    Reruns reuse them; when the data changed since (a move, anyone's write)
+    the column is read again from the top, as deep as it had been loaded.
+    """
+    cols = st.session_state["kb_cols"]
+    col = cols.get(status)
+    revision = data_revision()
+    if col is None or col["revision"] != revision:
+        depth = max(KANBAN_PAGE, len(col["moves"]) if col else 0)
+        col = cols[status] = {"now": datetime.now(), "revision": revision, "cards": [], "moves": [], "cursor": None}
+        _append(col, *queries.kanban_column(db, status, col["now"], depth, **filtros))
+    return col
 
-        with col_c:
-            if not concluido:
-                st.markdown('<div style="text-align:center;color:#1a3a25;padding:1.5rem;font-size:0.85rem;">Nenhuma tarefa concluída</div>', unsafe_allow_html=True)
-            for t in concluido:
-                _kanban_card(t, db, now)
 
+def _append(col, tasks, cursor):
+    cache = card_cache()
+    col["cards"] += [cache.card("kanban", t.id, _card_version(t), _card_html, t, col["now"]) for t in tasks]
+    col["moves"] += [(t.id, t.version, t.titulo) for t in tasks]
+    col["cursor"] = cursor
+
+
+def _load_more(status, filtros):
+    """Fetch only the next page after the column's cursor and append it."""
+    col = st.session_state["kb_cols"][status]
+    db = get_db()
+    try:
+        _append(col, *queries.kanban_column(db, status, col["now"], KANBAN_PAGE, cursor=col["cursor"], **filtros))
     finally:
         db.close()
 
 
-def _col_header(col, title, color, bg, count):
-    with col:
-        st.markdown(f"""
-        <div style="background:{bg};border:1px solid {color}33;border-top:3px solid {color};
-            border-radius:8px 8px 0 0;padding:0.6rem 1rem;margin-bottom:0.5rem;
-            display:flex;justify-content:space-between;align-items:center;">
-            <span style="font-weight:700;font-size:0.88rem;color:{color};">{title}</span>
-            <span style="background:{color}22;color:{color};border-radius:12px;
-                padding:0.1rem 0.55rem;font-size:0.72rem;font-weight:600;">{count}</span>
+_COLUMN_FRAGMENTS = {c["status"]: st.fragment(_column, key=c["key"]) for c in COLUMNS}
+_FRAGMENT_KEYS = {c["status"]: c["key"] for c in COLUMNS}
+
+
+_COL_HEADER = template("""
+<div style="background:{bg};border:1px solid {color}33;border-top:3px solid {color};
+    border-radius:8px 8px 0 0;padding:0.6rem 1rem;margin-bottom:0.5rem;
+    display:flex;justify-content:space-between;align-items:center;">
+    <span style="font-weight:700;font-size:0.88rem;color:{color};">{title}</span>
+    <span style="background:{color}22;color:{color};border-radius:12px;
+        padding:0.1rem 0.55rem;font-size:0.72rem;font-weight:600;">{count}</span>
+</div>
+""")
+_EMPTY = template("""
+<div style="text-align:center;color:{color};padding:1.5rem;font-size:0.85rem;">{msg}</div>
+""")
+
+
+def _move(task_id, version, old_status, new_status):
+    """Move a task and rerun the counters plus both columns."""
+    try:
+        write(commands.set_task_status, task_id, new_status, version=version)
+    except commands.Conflict:
+        # Changed or deleted by someone else since the board was drawn: redraw all of it
+        st.session_state["kb_conflict"] = (task_id, new_status)
+        st.rerun()
+    st.rerun(["kb_stats", _FRAGMENT_KEYS[old_status], _FRAGMENT_KEYS[new_status]])
+
+
+def _conflict_warning(task_id, new_status):
+    db = get_db()
+    try:
+        t = queries.task_detail(db, task_id)
+        current = row_values(t, TASK_FIELDS) if t else None
+    finally:
+        db.close()
+    conflict_warning(f"A tarefa #{task_id} não foi movida para {new_status}.", TASK_FIELDS, current,
+                     {"status": new_status})
+
+
+PRIO_COLORS = {"Crítica": "#ff4444", "Alta": "#ff8c42", "Média": "#fbbf24", "Baixa": "#60b8ff"}
+PRIO_BORDERS = {"Crítica": "#ff4444", "Alta": "#ff8c42", "Média": "#f59e0b", "Baixa": "#3b9eff"}
+STATUS_ORDER = ["A Fazer", "Em Andamento", "Concluído"]
+
+_CARD = template("""
+<div style="background:{card_bg};border:1px solid #1e2d45;border-left:3px solid {border_l};
+    border-radius:8px;padding:0.7rem 0.9rem;margin-bottom:0.4rem;">
+    {proj}
+    <div style="font-size:0.83rem;font-weight:600;color:#c8d6f0;line-height:1.3;margin-bottom:0.4rem;{titulo_style}">
+        {titulo}
+    </div>
+    <div style="display:flex;justify-content:space-between;align-items:center;">
+        <div style="display:flex;gap:0.4rem;align-items:center;flex-wrap:wrap;">
+            <span style="background:{prio_col}22;color:{prio_col};border-radius:4px;
+                padding:0.08rem 0.4rem;font-size:0.63rem;font-weight:600;">{prioridade}</span>
+            {late_badge}
         </div>
-        """, unsafe_allow_html=True)
+        <div style="font-size:0.65rem;color:#3a5a7a;">👤 {resp_nome}</div>
+    </div>
+    <div style="display:flex;justify-content:space-between;font-size:0.65rem;margin-top:0.3rem;">
+        <span style="color:{prazo_col};">📅 {prazo_str}</span>
+        <span style="color:#2e4a6a;">#{id}</span>
+    </div>
+</div>
+""")
+_CARD_PROJ = template("""
+<div style="font-size:0.65rem;color:#2e4a6a;margin-bottom:0.25rem;white-space:nowrap;
+    overflow:hidden;text-overflow:ellipsis;">📁 {nome}</div>
+""")
+_LATE_BADGE = template("""
+<span style="color:#ff4444;font-size:0.65rem;font-weight:700;">⚠ {dias}d</span>
+""")
+
 
+def _card_version(t):
+    return (t.atualizado_em, t.responsavel_user.nome if t.responsavel_user else None,
+            t.projeto.nome if t.projeto else None)
 
-def _kanban_card(t, db, now):
+
+def _card_html(t, now):
     is_done = t.status == "Concluído"
     is_late = t.prazo and t.prazo < now and not is_done
 
-    PRIO_COLORS = {"Crítica": "#ff4444", "Alta": "#ff8c42", "Média": "#fbbf24", "Baixa": "#60b8ff"}
-    prio_col = PRIO_COLORS.get(t.prioridade, "#fbbf24")
-
-    border_l = {"Crítica": "#ff4444", "Alta": "#ff8c42", "Média": "#f59e0b", "Baixa": "#3b9eff"}.get(t.prioridade, "#f59e0b")
+    border_l = PRIO_BORDERS.get(t.prioridade, "#f59e0b")
     if is_done:
         border_l = "#10b981"
     if is_late:
         border_l = "#ff4444"
 
-    prazo_str = t.prazo.strftime("%d/%m/%Y") if t.prazo else "—"
-    dias_atraso = (now - t.prazo).days if is_late else 0
-    resp_nome = t.responsavel_user.nome.split()[0] if t.responsavel_user else "—"
-    proj_nome = (t.projeto.nome[:35] + "..." if t.projeto and len(t.projeto.nome) > 35 else (t.projeto.nome if t.projeto else "")) if t.projeto else ""
-
-    titulo_style = "text-decoration:line-through;opacity:0.6;" if is_done else ""
-    late_badge = f'<span style="color:#ff4444;font-size:0.65rem;font-weight:700;">⚠ {dias_atraso}d</span>' if is_late else ""
-    card_bg = "#0d2118" if is_done else "#161b27"
-
-    st.markdown(f"""
-    <div style="background:{card_bg};border:1px solid #1e2d45;border-left:3px solid {border_l};
-        border-radius:8px;padding:0.7rem 0.9rem;margin-bottom:0.4rem;">
-        {f'<div style="font-size:0.65rem;color:#2e4a6a;margin-bottom:0.25rem;white-space:nowrap;overflow:hidden;text-overflow:ellipsis;">📁 {proj_nome}</div>' if proj_nome else ''}
-        <div style="font-size:0.83rem;font-weight:600;color:#c8d6f0;line-height:1.3;margin-bottom:0.4rem;{titulo_style}">
-            {t.titulo[:80] + ('...' if len(t.titulo) > 80 else '')}
-        </div>
-        <div style="display:flex;justify-content:space-between;align-items:center;">
-            <div style="display:flex;gap:0.4rem;align-items:center;flex-wrap:wrap;">
-                <span style="background:{prio_col}22;color:{prio_col};border-radius:4px;
-                    padding:0.08rem 0.4rem;font-size:0.63rem;font-weight:600;">{t.prioridade}</span>
-                {late_badge}
-            </div>
-            <div style="font-size:0.65rem;color:#3a5a7a;">👤 {resp_nome}</div>
-        </div>
-        <div style="font-size:0.65rem;color:{'#ff6b6b' if is_late else '#2e4a6a'};margin-top:0.3rem;">
-            📅 {prazo_str}
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+    proj_nome = t.projeto.nome if t.projeto else ""
+    if len(proj_nome) > 35:
+        proj_nome = proj_nome[:35] + "..."
+    prio_col = PRIO_COLORS.get(t.prioridade, "#fbbf24")
+
+    return _CARD.format(
+        id=t.id,
+        card_bg="#0d2118" if is_done else "#161b27",
+        border_l=border_l,
+        proj=_CARD_PROJ.format(nome=esc(proj_nome)) if proj_nome else "",
+        titulo_style="text-decoration:line-through;opacity:0.6;" if is_done else "",
+        titulo=esc(_short_title(t.titulo)),
+        prio_col=prio_col,
+        prioridade=esc(t.prioridade),
+        late_badge=_LATE_BADGE.format(dias=(now - t.prazo).days) if is_late else "",
+        resp_nome=esc(t.responsavel_user.nome.split()[0]) if t.responsavel_user else "—",
+        prazo_col="#ff6b6b" if is_late else "#2e4a6a",
+        prazo_str=t.prazo.strftime("%d/%m/%Y") if t.prazo else "—",
+    )
+
+
+def _short_title(titulo, size=80):
+    return titulo[:size] + ("..." if len(titulo) > size else "")
+
+
+def _move_control(status, cards):
+    """One selectbox per column listing every move of its ``(id, version, titulo)`` cards.
+
+    Each option carries the task version shown on the board, so moving a card
+    someone else has just changed is reported instead of applied.
+    """
+    idx = STATUS_ORDER.index(status)
+    targets = [(arrow, STATUS_ORDER[i]) for arrow, i in (("←", idx - 1), ("→", idx + 1))
+               if 0 <= i < len(STATUS_ORDER)]
+    labels = {(tid, version, new_status): f"{arrow} {new_status} · #{tid} {_short_title(titulo, 45)}"
+              for tid, version, titulo in cards for arrow, new_status in targets}
+    st.selectbox("Mover tarefa", list(labels), index=None, key=f"kb_move_{status}",
+                 format_func=labels.get, placeholder="Mover tarefa...", label_visibility="collapsed",
+                 on_change=_move_selected, args=(status,))
+
 
-    # Move buttons
-    opts = ["A Fazer", "Em Andamento", "Concluído"]
-    idx = opts.index(t.status) if t.status in opts else 0
-    btn_cols = []
-    if idx > 0:
-        btn_cols.append(("←", opts[idx - 1]))
-    if idx < 2:
-        btn_cols.append(("→", opts[idx + 1]))
-
-    if btn_cols:
-        b_cols = st.columns(len(btn_cols) + 1)
-        for i, (arrow, new_status) in enumerate(btn_cols):
-            label = f"{arrow} {new_status.split()[0]}"
-            with b_cols[i]:
-                if st.button(label, key=f"kb_{t.id}_{new_status}", use_container_width=True):
-                    t.status = new_status
-                    t.atualizado_em = datetime.now()
-                    # Update project progress
-                    if t.projeto:
-                        proj = t.projeto
-                        n_done = sum(1 for x in proj.tarefas if
-                                     (x.id == t.id and new_status == "Concluído") or
-                                     (x.id != t.id and x.status == "Concluído"))
-                        proj.progresso = (n_done / len(proj.tarefas) * 100) if proj.tarefas else 0
-                    db.commit()
-                    st.rerun()
-
-    st.markdown("<div style='height:0.1rem'></div>", unsafe_allow_html=True)
+def _move_selected(status):
+    task_id, version, new_status = st.session_state[f"kb_move_{status}"]
+    st.session_state[f"kb_move_{status}"] = None
+    _move(task_id, version, status, new_status)
@@ -1,8 +1,16 @@
 import streamlit as st
+import re
 from datetime import datetime
 from database import get_db
-from models import Project, Task, User
+from models import Task
+import commands
 from auth import require_role, get_current_user_id
+import queries
+import read_models
+from render import (PROJECT_FIELDS, TASK_FIELDS, card_cache, conflict_warning, esc,
+                    row_values, template)
+from telemetry import note_filters, timed
+from writer import write
 
 
 # ── Status configs ─────────────────────────────────────────────────────────────
@@ -27,6 +35,8 @@ PRIO_CFG = {
     "Baixa":    {"color": "#60b8ff", "bg": "#0d2137"},
 }
 
+PAGE_SIZES = [20, 50, 100]
+
 BUCKET_ICONS = {
     "PELD": "📘", "pré-medição": "📐", "Upload para o BDOC - Files e Scorm": "📤",
     "Validação - Desenvolvimento": "🔍", "Autoria digital": "✍️",
@@ -45,7 +55,7 @@ def show():
         selected_id = st.session_state.get("proj_detail_id")
 
         if selected_id:
-            proj = db.query(Project).filter(Project.id == selected_id).first()
+            proj = queries.project_detail(db, selected_id)
             if proj:
                 _show_project_detail(proj, db)
                 return
@@ -61,6 +71,7 @@ def show():
 # ══════════════════════════════════════════════════════════════════════════════
 #  PROJECT LIST
 # ══════════════════════════════════════════════════════════════════════════════
+@timed("lista")
 def _show_project_list(db):
     now = datetime.now()
 
@@ -95,191 +106,343 @@ def _show_project_list(db):
     with col_f2:
         status_f = st.selectbox("Status", ["Todos", "Ativo", "Planejamento", "Concluído", "Cancelado", "Pausado"], label_visibility="collapsed")
     with col_f3:
-        users = db.query(User).order_by(User.nome).all()
-        user_opts = ["Todos responsáveis"] + [u.nome for u in users]
+        users = read_models.user_options()
+        user_opts = ["Todos responsáveis"] + [nome for _, nome in users]
         resp_f = st.selectbox("Responsável", user_opts, label_visibility="collapsed")
     with col_f4:
         atraso_f = st.selectbox("Atraso", ["Todos", "Com atraso", "Em dia"], label_visibility="collapsed")
 
     # ── Query ────────────────────────────────────────────────────────────────
-    query = db.query(Project)
-    if search:
-        query = query.filter(Project.nome.ilike(f"%{search}%"))
-    if status_f != "Todos":
-        query = query.filter(Project.status == status_f)
+    resp_id = None
     if resp_f != "Todos responsáveis":
-        user = db.query(User).filter(User.nome == resp_f).first()
-        if user:
-            query = query.filter(Project.responsavel_id == user.id)
-
-    projects = query.order_by(Project.criado_em.desc()).all()
-
-    # Filter by atraso
-    if atraso_f == "Com atraso":
-        projects = [p for p in projects if _has_overdue_tasks(p, now)]
-    elif atraso_f == "Em dia":
-        projects = [p for p in projects if not _has_overdue_tasks(p, now)]
+        resp_id = next((uid for uid, nome in users if nome == resp_f), None)
+
+    filtros = dict(
+        search=search,
+        status=status_f if status_f != "Todos" else None,
+        responsavel_id=resp_id,
+        atraso=atraso_f if atraso_f != "Todos" else None,
+        now=now,
+    )
+    page_size = st.session_state.get("proj_page_size", PAGE_SIZES[0])
+
+    # Keyset pagination: stack of page-start cursors, reset whenever the filters change
+    assinatura = (search, status_f, resp_f, atraso_f, page_size)
+    if st.session_state.get("proj_list_filtros") != assinatura:
+        st.session_state["proj_list_filtros"] = assinatura
+        st.session_state["proj_list_cursors"] = [None]
+    cursors = st.session_state["proj_list_cursors"]
+    note_filters(busca=search, status=status_f, responsavel=resp_f, atraso=atraso_f,
+                 pagina=len(cursors), por_pagina=page_size)
+
+    total = queries.count_projects(db, **filtros)
+    n_pages = max(1, -(-total // page_size))
 
     # ── Count bar ────────────────────────────────────────────────────────────
     st.markdown(f"""
     <div style="font-size:0.78rem;color:#4a6a8a;margin:0.5rem 0 1rem;
         padding:0.5rem 0.8rem;background:#161b27;border-radius:8px;
         border:1px solid #1e2d45;display:inline-block;">
-        {len(projects)} projeto(s) encontrado(s)
+        {total} projeto(s) encontrado(s) &nbsp;·&nbsp; página {len(cursors)} de {n_pages}
     </div>
     """, unsafe_allow_html=True)
 
-    if not projects:
-        st.markdown("""
-        <div style="text-align:center;padding:3rem;color:#4a6a8a;">
-            <div style="font-size:2rem">📭</div>
-            <div style="margin-top:0.5rem">Nenhum projeto encontrado com esses filtros</div>
-        </div>
-        """, unsafe_allow_html=True)
-        return
+    # ── Project cards grid + pagination ───────────────────────────────────────
+    _project_cards(cursors[-1], page_size, filtros)
 
-    # ── Project cards grid ───────────────────────────────────────────────────
-    for proj in projects:
-        _project_card(proj, now, db)
 
+_HRC = re.compile(r'\s*\[HRC\d+\]')
 
-def _project_card(p, now, db):
+_PROJECT_CARD = template("""
+<div style="background:#161b27;border:1px solid {border};border-left:4px solid {color};
+    border-radius:12px;padding:1rem 1.2rem;margin-bottom:0.5rem;
+    position:relative;" id="proj_{id}">
+    <div style="display:flex;justify-content:space-between;align-items:flex-start;flex-wrap:wrap;gap:0.5rem;">
+        <div style="flex:1;min-width:200px;">
+            <div style="display:flex;align-items:center;gap:0.5rem;flex-wrap:wrap;">
+                <span style="color:{color};font-size:0.95rem;">{icon}</span>
+                <span style="font-size:0.95rem;font-weight:600;color:#e2f0ff;">{nome}</span>
+                {hrc}
+                {atraso}
+            </div>
+            <div style="font-size:0.73rem;color:#4a6a8a;margin-top:0.3rem;">
+                👤 {resp_nome}
+                &nbsp;·&nbsp;
+                📅 <span style="color:{prazo_col}">{prazo_str}</span>
+                &nbsp;·&nbsp;
+                📋 {n_done}/{n_tasks} tarefas
+                {andamento}
+            </div>
+        </div>
+        <div style="display:flex;align-items:center;gap:1rem;">
+            <div style="text-align:right;">
+                <div style="font-size:0.68rem;color:{color};font-weight:600;
+                    background:{bg};border:1px solid {border};
+                    border-radius:6px;padding:0.2rem 0.6rem;">{icon} {status}</div>
+            </div>
+            <div style="font-size:1.3rem;font-weight:700;color:{prog_color};min-width:42px;text-align:right;">
+                {pct}%
+            </div>
+        </div>
+    </div>
+    <div style="margin-top:0.75rem;background:#0f1117;border-radius:4px;height:5px;overflow:hidden;">
+        <div style="width:{pct}%;height:100%;background:{prog_color};
+            border-radius:4px;transition:width 0.3s;"></div>
+    </div>
+</div>
+""")
+_HRC_TAG = template("""
+<span style="font-size:0.68rem;color:#3a6a8a;background:#0d2137;padding:0.1rem 0.4rem;border-radius:4px;">{hrc}</span>
+""")
+_ATRASO_BADGE = template("""
+<span style="background:{bg};border:1px solid {color}55;color:{color};
+    border-radius:6px;padding:0.15rem 0.5rem;font-size:0.7rem;font-weight:700;
+    margin-left:0.4rem;">⚠ {dias}d atraso</span>
+""")
+_EM_ANDAMENTO = template("""
+&nbsp;·&nbsp; <span style="color:#3b9eff">{n} em andamento</span>
+""")
+
+
+def _project_version(p):
+    # Task counters are kept by triggers, which don't touch atualizado_em
+    return (p.atualizado_em, p.n_tasks, p.n_done, p.n_in_progress, p.earliest_open_prazo,
+            p.progresso, p.responsavel_user.nome if p.responsavel_user else None)
+
+
+def _project_card_html(p, now):
     cfg = STATUS_CFG.get(p.status, STATUS_CFG["Ativo"])
-    n_tasks = len(p.tarefas)
-    n_done = sum(1 for t in p.tarefas if t.status == "Concluído")
-    n_andamento = sum(1 for t in p.tarefas if t.status == "Em Andamento")
-    overdue = [t for t in p.tarefas if t.prazo and t.prazo < now and t.status != "Concluído"]
-    n_overdue = len(overdue)
-    max_atraso = max((now - t.prazo).days for t in overdue) if overdue else 0
+    n_tasks = p.n_tasks
+    n_done = p.n_done
+    has_overdue = _has_overdue_tasks(p, now)
+    max_atraso = (now - p.earliest_open_prazo).days if has_overdue else 0
 
     pct = p.progresso if p.progresso else (int(n_done / n_tasks * 100) if n_tasks > 0 else 0)
-    resp_nome = p.responsavel_user.nome if p.responsavel_user else "—"
-
-    # Extract HRC code
-    hrc = ""
-    import re
     m = re.search(r'\[HRC\d+\]', p.nome)
-    if m:
-        hrc = m.group(0)
-    nome_clean = re.sub(r'\s*\[HRC\d+\]', '', p.nome).strip()
-
-    # Prazo
-    prazo_str = p.data_fim.strftime("%d/%m/%Y") if p.data_fim else "—"
-    prazo_late = p.data_fim and p.data_fim < now and p.status not in ["Concluído", "Cancelado"]
 
-    # Atraso badge
-    atraso_html = ""
-    if n_overdue > 0:
+    atraso = ""
+    if has_overdue:
         if max_atraso > 30:
             ac, ab = "#ff4444", "#2d0808"
         elif max_atraso > 7:
             ac, ab = "#ff8c42", "#2a1508"
         else:
             ac, ab = "#fbbf24", "#1f1a08"
-        atraso_html = f"""
-        <span style="background:{ab};border:1px solid {ac}55;color:{ac};
-            border-radius:6px;padding:0.15rem 0.5rem;font-size:0.7rem;font-weight:700;
-            margin-left:0.4rem;">⚠ {max_atraso}d atraso</span>
-        """
-
-    # Progress bar color
-    prog_color = cfg["color"] if pct < 100 else "#10b981"
-
-    card_html = f"""
-    <div style="background:#161b27;border:1px solid {cfg['border']};border-left:4px solid {cfg['color']};
-        border-radius:12px;padding:1rem 1.2rem;margin-bottom:0.5rem;cursor:pointer;
-        transition:all 0.15s;position:relative;" id="proj_{p.id}">
-
-        <div style="display:flex;justify-content:space-between;align-items:flex-start;flex-wrap:wrap;gap:0.5rem;">
-            <div style="flex:1;min-width:200px;">
-                <div style="display:flex;align-items:center;gap:0.5rem;flex-wrap:wrap;">
-                    <span style="color:{cfg['color']};font-size:0.95rem;">{cfg['icon']}</span>
-                    <span style="font-size:0.95rem;font-weight:600;color:#e2f0ff;">{nome_clean}</span>
-                    {f'<span style="font-size:0.68rem;color:#3a6a8a;background:#0d2137;padding:0.1rem 0.4rem;border-radius:4px;">{hrc}</span>' if hrc else ''}
-                    {atraso_html}
-                </div>
-                <div style="font-size:0.73rem;color:#4a6a8a;margin-top:0.3rem;">
-                    👤 {resp_nome}
-                    &nbsp;·&nbsp;
-                    📅 <span style="color:{'#ff6b6b' if prazo_late else '#4a6a8a'}">{prazo_str}</span>
-                    &nbsp;·&nbsp;
-                    📋 {n_done}/{n_tasks} tarefas
-                    {f'&nbsp;·&nbsp; <span style="color:#3b9eff">{n_andamento} em andamento</span>' if n_andamento > 0 else ''}
-                </div>
-            </div>
+        atraso = _ATRASO_BADGE.format(color=ac, bg=ab, dias=max_atraso)
 
-            <div style="display:flex;align-items:center;gap:1rem;">
-                <div style="text-align:right;">
-                    <div style="font-size:0.68rem;color:{cfg['color']};font-weight:600;
-                        background:{cfg['bg']};border:1px solid {cfg['border']};
-                        border-radius:6px;padding:0.2rem 0.6rem;">{cfg['icon']} {p.status}</div>
-                </div>
-                <div style="font-size:1.3rem;font-weight:700;color:{prog_color};min-width:42px;text-align:right;">
-                    {int(pct)}%
-                </div>
-            </div>
-        </div>
+    prazo_late = p.data_fim and p.data_fim < now and p.status not in ["Concluído", "Cancelado"]
+    return _PROJECT_CARD.format(
+        id=p.id,
+        color=cfg["color"], bg=cfg["bg"], border=cfg["border"], icon=cfg["icon"],
+        nome=esc(_HRC.sub('', p.nome).strip()),
+        hrc=_HRC_TAG.format(hrc=m.group(0)) if m else "",
+        atraso=atraso,
+        resp_nome=esc(p.responsavel_user.nome) if p.responsavel_user else "—",
+        prazo_col="#ff6b6b" if prazo_late else "#4a6a8a",
+        prazo_str=p.data_fim.strftime("%d/%m/%Y") if p.data_fim else "—",
+        n_done=n_done, n_tasks=n_tasks,
+        andamento=_EM_ANDAMENTO.format(n=p.n_in_progress) if p.n_in_progress > 0 else "",
+        status=esc(p.status),
+        pct=int(pct),
+        prog_color=cfg["color"] if pct < 100 else "#10b981",
+    )
+
+
+@st.fragment
+@timed("cards")
+def _project_cards(cursor, page_size, filtros):
+    """Every card of the page in one HTML block, one action bar for the selected project and the pager.
+
+    The page is read here, in the fragment's own session, so reruns of the
+    fragment alone (picking, deleting) show the projects as they are now.
+    """
+    if st.session_state.get("proj_page_size", PAGE_SIZES[0]) != page_size:
+        # The page size is one of the list filters: the full run resets the cursors
+        st.rerun()
+    db = get_db()
+    try:
+        projects, next_cursor = queries.project_page(db, cursor=cursor, limit=page_size, **filtros)
+    finally:
+        db.close()
 
-        <div style="margin-top:0.75rem;background:#0f1117;border-radius:4px;height:5px;overflow:hidden;">
-            <div style="width:{int(pct)}%;height:100%;background:{prog_color};
-                border-radius:4px;transition:width 0.3s;"></div>
+    if not projects:
+        st.markdown("""
+        <div style="text-align:center;padding:3rem;color:#4a6a8a;">
+            <div style="font-size:2rem">📭</div>
+            <div style="margin-top:0.5rem">Nenhum projeto encontrado com esses filtros</div>
         </div>
-    </div>
-    """
-    st.markdown(card_html, unsafe_allow_html=True)
+        """, unsafe_allow_html=True)
+        return
 
-    col_open, col_edit, col_del = st.columns([6, 1, 1])
+    cache = card_cache()
+    now = filtros["now"]
+    cards = "".join(cache.card("project", p.id, _project_version(p), _project_card_html, p, now) for p in projects)
+    st.markdown(cards, unsafe_allow_html=True)
+
+    by_id = {p.id: p for p in projects}
+    col_sel, col_open, col_edit, col_del = st.columns([6, 1.2, 0.5, 0.5])
+    with col_sel:
+        pid = st.selectbox("Projeto", list(by_id), index=None, key="proj_pick",
+                           format_func=lambda i: _HRC.sub('', by_id[i].nome).strip(),
+                           placeholder="Selecionar projeto...", label_visibility="collapsed")
     with col_open:
-        if st.button(f"↗ Ver projeto", key=f"open_{p.id}", use_container_width=False):
-            st.session_state["proj_detail_id"] = p.id
+        if st.button("↗ Ver projeto", key="proj_open", disabled=pid is None, use_container_width=True):
+            st.session_state["proj_detail_id"] = pid
             st.rerun()
     if require_role("admin", "gestor"):
         with col_edit:
-            if st.button("✏️", key=f"edit_{p.id}", help="Editar"):
-                st.session_state["editing_proj_id"] = p.id
+            if st.button("✏️", key="proj_edit", help="Editar", disabled=pid is None):
+                st.session_state["proj_detail_id"] = pid
+                st.session_state["editing_proj_inline"] = pid
+                st.session_state.pop("editing_proj_seen", None)
                 st.rerun()
         with col_del:
-            if st.button("🗑️", key=f"del_{p.id}", help="Excluir"):
-                st.session_state[f"confirm_del_{p.id}"] = True
+            if st.button("🗑️", key="proj_del", help="Excluir", disabled=pid is None):
+                st.session_state["confirm_del_proj"] = pid
 
-    if st.session_state.get(f"confirm_del_{p.id}"):
-        st.warning(f"⚠️ Excluir **{p.nome}** e todas as {n_tasks} tarefas?")
+    if pid is not None and st.session_state.get("confirm_del_proj") == pid:
+        p = by_id[pid]
+        st.warning(f"⚠️ Excluir **{p.nome}** e todas as {p.n_tasks} tarefas?")
         cc1, cc2 = st.columns(2)
         with cc1:
-            if st.button("✅ Confirmar", key=f"cfm_{p.id}", type="primary"):
-                db.delete(p); db.commit()
+            if st.button("✅ Confirmar", key="proj_del_ok", type="primary"):
+                write(commands.delete_project, pid)
+                st.session_state.pop("confirm_del_proj", None)
                 st.success("Excluído!"); st.rerun()
         with cc2:
-            if st.button("❌ Cancelar", key=f"cnc_{p.id}"):
-                del st.session_state[f"confirm_del_{p.id}"]; st.rerun()
+            st.button("❌ Cancelar", key="proj_del_cancel", on_click=st.session_state.pop, args=("confirm_del_proj", None))
+
+    # ── Pagination ───────────────────────────────────────────────────────────
+    cursors = st.session_state["proj_list_cursors"]
+    col_prev, col_size, col_next = st.columns([1, 1, 1])
+    with col_prev:
+        if len(cursors) > 1 and st.button("← Anterior", key="proj_prev", use_container_width=True):
+            cursors.pop(); st.rerun()
+    with col_size:
+        st.selectbox("Por página", PAGE_SIZES, key="proj_page_size", label_visibility="collapsed",
+                     format_func=lambda n: f"{n} por página")
+    with col_next:
+        if next_cursor and st.button("Próxima →", key="proj_next", use_container_width=True):
+            cursors.append(next_cursor); st.rerun()
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 #  PROJECT DETAIL  (estilo Microsoft Planner)
 # ══════════════════════════════════════════════════════════════════════════════
+@timed("detalhe")
 def _show_project_detail(p, db):
     now = datetime.now()
+    note_filters(projeto_id=p.id)
 
     # ── Back button ──────────────────────────────────────────────────────────
     if st.button("← Voltar para Projetos", key="back_btn"):
         st.session_state.pop("proj_detail_id", None)
         st.rerun()
 
+    _project_header(p.id)
+
+    # ── Description / annotations ─────────────────────────────────────────────
+    if p.descricao:
+        desc_lines = [l for l in p.descricao.split('\n') if l.strip() and not l.startswith("Fase:") and not l.startswith("Rótulos:")]
+        rotulos_line = next((l for l in p.descricao.split('\n') if l.startswith("Rótulos:")), "")
+        rotulos = rotulos_line.replace("Rótulos:", "").strip() if rotulos_line else ""
+
+        if desc_lines or rotulos:
+            col_d, col_r = st.columns([3, 1])
+            with col_d:
+                if desc_lines:
+                    st.markdown(f"""
+                    <div style="background:#0f1117;border:1px solid #1e2d45;border-radius:10px;
+                        padding:1rem 1.2rem;margin-bottom:1rem;">
+                        <div style="font-size:0.65rem;color:#2e4a6a;text-transform:uppercase;
+                            letter-spacing:0.1em;font-weight:600;margin-bottom:0.5rem;">
+                            📝 Anotações
+                        </div>
+                        <div style="font-size:0.82rem;color:#8aabcc;line-height:1.6;white-space:pre-line;">
+                            {esc(chr(10).join(desc_lines[:8]))}
+                        </div>
+                    </div>
+                    """, unsafe_allow_html=True)
+
+            with col_r:
+                if rotulos:
+                    tags = [t.strip() for t in rotulos.split(';') if t.strip()]
+                    tags_html = "".join([
+                        f'<span style="background:#1a2a3d;border:1px solid #2a4060;color:#60a5fa;'
+                        f'border-radius:20px;padding:0.2rem 0.7rem;font-size:0.72rem;'
+                        f'font-weight:500;margin:0.15rem;display:inline-block;">{esc(t)}</span>'
+                        for t in tags
+                    ])
+                    st.markdown(f"""
+                    <div style="background:#0f1117;border:1px solid #1e2d45;border-radius:10px;
+                        padding:1rem 1.2rem;margin-bottom:1rem;">
+                        <div style="font-size:0.65rem;color:#2e4a6a;text-transform:uppercase;
+                            letter-spacing:0.1em;font-weight:600;margin-bottom:0.6rem;">
+                            🏷️ Rótulos
+                        </div>
+                        {tags_html}
+                    </div>
+                    """, unsafe_allow_html=True)
+
+    # ── Action buttons ────────────────────────────────────────────────────────
+    col_a1, col_a2, col_a3, _ = st.columns([1, 1, 1, 4])
+    with col_a1:
+        if require_role("admin", "gestor"):
+            if st.button("✏️ Editar Projeto", use_container_width=True):
+                st.session_state["editing_proj_inline"] = p.id
+                st.session_state.pop("editing_proj_seen", None)
+    with col_a2:
+        if st.button("➕ Nova Tarefa", use_container_width=True, type="primary"):
+            st.session_state["creating_task_for"] = p.id
+    with col_a3:
+        if st.session_state.get("creating_task_for") == p.id or st.session_state.get("editing_task_id"):
+            if st.button("✕ Fechar formulário", use_container_width=True):
+                st.session_state.pop("creating_task_for", None)
+                st.session_state.pop("editing_task_id", None)
+                st.rerun()
+
+    # ── Inline edit project form ──────────────────────────────────────────────
+    if st.session_state.get("editing_proj_inline") == p.id:
+        _edit_project_inline(p, db)
+
+    # ── Create task form ──────────────────────────────────────────────────────
+    if st.session_state.get("creating_task_for") == p.id:
+        _create_task_form(p, db)
+
+    # ── Checklist section (tasks as checklist, like Planner) ─────────────────
+    _checklist(p.id)
+
+    # ── Edit task form ────────────────────────────────────────────────────────
+    edit_tid = st.session_state.get("editing_task_id")
+    if edit_tid:
+        t = db.get(Task, edit_tid)
+        if t is not None and t.projeto_id == p.id:
+            _edit_task_inline(t, p, db)
+
+    st.markdown("---")
+
+
+@st.fragment(key="proj_header")
+def _project_header(project_id):
+    now = datetime.now()
+    p = _fresh_project(project_id)
+    if p is None:
+        return
+
     cfg = STATUS_CFG.get(p.status, STATUS_CFG["Ativo"])
     resp_nome = p.responsavel_user.nome if p.responsavel_user else "—"
 
-    import re
     hrc = ""
     m = re.search(r'\[HRC[\d\s]*\d+\]', p.nome)
     if m:
         hrc = m.group(0)
     nome_clean = re.sub(r'\s*\[HRC[\d\s]*\d+\]', '', p.nome).strip()
 
-    overdue_tasks = [t for t in p.tarefas if t.prazo and t.prazo < now and t.status != "Concluído"]
-    max_atraso = max((now - t.prazo).days for t in overdue_tasks) if overdue_tasks else 0
+    has_overdue = _has_overdue_tasks(p, now)
+    max_atraso = (now - p.earliest_open_prazo).days if has_overdue else 0
 
-    n_tasks = len(p.tarefas)
-    n_done = sum(1 for t in p.tarefas if t.status == "Concluído")
+    n_tasks = p.n_tasks
+    n_done = p.n_done
     pct = p.progresso if p.progresso else (int(n_done / n_tasks * 100) if n_tasks > 0 else 0)
 
     # ── Project header (like Planner card header) ────────────────────────────
@@ -287,7 +450,7 @@ def _show_project_detail(p, db):
     prazo_late = p.data_fim and p.data_fim < now and p.status not in ["Concluído", "Cancelado"]
 
     atraso_badge = ""
-    if overdue_tasks:
+    if has_overdue:
         atraso_badge = f"""
         <span style="background:#2d0808;border:1px solid #aa222255;color:#ff6b6b;
             border-radius:8px;padding:0.2rem 0.7rem;font-size:0.75rem;font-weight:700;">
@@ -309,22 +472,22 @@ def _show_project_detail(p, db):
         border-radius:14px;padding:1.5rem 1.8rem;margin-bottom:1.5rem;">
 
         <div style="font-size:0.7rem;color:#4a6a8a;margin-bottom:0.4rem;letter-spacing:0.08em;">
-            PETROBRAS / SENAI EAD &nbsp;·&nbsp; {b_icon} {bucket_txt or "Projeto EaD"}
+            PETROBRAS / SENAI EAD &nbsp;·&nbsp; {b_icon} {esc(bucket_txt or "Projeto EaD")}
         </div>
 
         <div style="display:flex;justify-content:space-between;align-items:flex-start;flex-wrap:wrap;gap:1rem;">
             <div>
                 <h2 style="font-size:1.4rem;font-weight:700;color:#e2f0ff;margin:0 0 0.3rem;
                     max-width:700px;line-height:1.3;">
-                    {nome_clean}
+                    {esc(nome_clean)}
                 </h2>
                 <div style="display:flex;flex-wrap:wrap;gap:0.5rem;align-items:center;">
                     <span style="background:{cfg['bg']};border:1px solid {cfg['border']};
                         color:{cfg['color']};border-radius:6px;padding:0.2rem 0.7rem;
                         font-size:0.75rem;font-weight:600;">
-                        {cfg['icon']} {p.status}
+                        {cfg['icon']} {esc(p.status)}
                     </span>
-                    {f'<span style="background:#0d1a2d;color:#3a6a8a;border-radius:6px;padding:0.2rem 0.6rem;font-size:0.72rem;">{hrc}</span>' if hrc else ''}
+                    {f'<span style="background:#0d1a2d;color:#3a6a8a;border-radius:6px;padding:0.2rem 0.6rem;font-size:0.72rem;">{esc(hrc)}</span>' if hrc else ''}
                     {atraso_badge}
                 </div>
             </div>
@@ -341,7 +504,7 @@ def _show_project_detail(p, db):
         <div style="display:flex;gap:2rem;flex-wrap:wrap;margin-top:1rem;">
             <div>
                 <div style="font-size:0.65rem;color:#2e4a6a;text-transform:uppercase;letter-spacing:0.1em;">Responsável</div>
-                <div style="font-size:0.85rem;color:#c8d6f0;font-weight:500;">👤 {resp_nome}</div>
+                <div style="font-size:0.85rem;color:#c8d6f0;font-weight:500;">👤 {esc(resp_nome)}</div>
             </div>
             <div>
                 <div style="font-size:0.65rem;color:#2e4a6a;text-transform:uppercase;letter-spacing:0.1em;">Prazo</div>
@@ -361,201 +524,184 @@ def _show_project_detail(p, db):
     </div>
     """, unsafe_allow_html=True)
 
-    # ── Description / annotations ─────────────────────────────────────────────
-    if p.descricao:
-        desc_lines = [l for l in p.descricao.split('\n') if l.strip() and not l.startswith("Fase:") and not l.startswith("Rótulos:")]
-        rotulos_line = next((l for l in p.descricao.split('\n') if l.startswith("Rótulos:")), "")
-        rotulos = rotulos_line.replace("Rótulos:", "").strip() if rotulos_line else ""
-
-        if desc_lines or rotulos:
-            col_d, col_r = st.columns([3, 1])
-            with col_d:
-                if desc_lines:
-                    st.markdown(f"""
-                    <div style="background:#0f1117;border:1px solid #1e2d45;border-radius:10px;
-                        padding:1rem 1.2rem;margin-bottom:1rem;">
-                        <div style="font-size:0.65rem;color:#2e4a6a;text-transform:uppercase;
-                            letter-spacing:0.1em;font-weight:600;margin-bottom:0.5rem;">
-                            📝 Anotações
-                        </div>
-                        <div style="font-size:0.82rem;color:#8aabcc;line-height:1.6;white-space:pre-line;">
-                            {chr(10).join(desc_lines[:8])}
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-
-            with col_r:
-                if rotulos:
-                    tags = [t.strip() for t in rotulos.split(';') if t.strip()]
-                    tags_html = "".join([
-                        f'<span style="background:#1a2a3d;border:1px solid #2a4060;color:#60a5fa;'
-                        f'border-radius:20px;padding:0.2rem 0.7rem;font-size:0.72rem;'
-                        f'font-weight:500;margin:0.15rem;display:inline-block;">{t}</span>'
-                        for t in tags
-                    ])
-                    st.markdown(f"""
-                    <div style="background:#0f1117;border:1px solid #1e2d45;border-radius:10px;
-                        padding:1rem 1.2rem;margin-bottom:1rem;">
-                        <div style="font-size:0.65rem;color:#2e4a6a;text-transform:uppercase;
-                            letter-spacing:0.1em;font-weight:600;margin-bottom:0.6rem;">
-                            🏷️ Rótulos
-                        </div>
-                        {tags_html}
-                    </div>
-                    """, unsafe_allow_html=True)
-
-    # ── Action buttons ────────────────────────────────────────────────────────
-    col_a1, col_a2, col_a3, _ = st.columns([1, 1, 1, 4])
-    with col_a1:
-        if require_role("admin", "gestor"):
-            if st.button("✏️ Editar Projeto", use_container_width=True):
-                st.session_state["editing_proj_inline"] = p.id
-    with col_a2:
-        if st.button("➕ Nova Tarefa", use_container_width=True, type="primary"):
-            st.session_state["creating_task_for"] = p.id
-    with col_a3:
-        if st.session_state.get("creating_task_for") == p.id or st.session_state.get("editing_task_id"):
-            if st.button("✕ Fechar formulário", use_container_width=True):
-                st.session_state.pop("creating_task_for", None)
-                st.session_state.pop("editing_task_id", None)
-                st.rerun()
 
-    # ── Inline edit project form ──────────────────────────────────────────────
-    if st.session_state.get("editing_proj_inline") == p.id:
-        _edit_project_inline(p, db)
-
-    # ── Create task form ──────────────────────────────────────────────────────
-    if st.session_state.get("creating_task_for") == p.id:
-        _create_task_form(p, db)
+_CHECKLIST_HEADER = template("""
+<div style="font-size:0.75rem;color:#4a6a8a;font-weight:600;
+    text-transform:uppercase;letter-spacing:0.1em;
+    margin:1.2rem 0 0.7rem;padding-bottom:0.4rem;border-bottom:1px solid #1e2d45;">
+    ✅ Lista de verificação &nbsp;
+    <span style="color:#3b9eff;background:#0d2137;border-radius:4px;
+        padding:0.1rem 0.5rem;font-size:0.7rem;">{n_done} / {n_tasks}</span>
+</div>
+""")
+_CHECKLIST_EMPTY = template("""
+<div style="text-align:center;padding:2rem;color:#2e4a6a;">
+    <div style="font-size:1.5rem">📭</div>
+    <div style="margin-top:0.4rem;font-size:0.85rem">Nenhuma tarefa. Clique em "Nova Tarefa" para começar.</div>
+</div>
+""")
+_TASK_ROW = template("""
+<div style="background:{row_bg};border:1px solid {row_border};
+    border-left:3px solid {left_color};border-radius:8px;
+    padding:0.65rem 1rem;margin-bottom:0.35rem;
+    display:flex;align-items:center;gap:0.8rem;flex-wrap:wrap;">
+    <span style="font-size:1rem;color:{ck_col};flex-shrink:0;">{ck}</span>
+    <div style="flex:1;min-width:150px;">
+        <span style="font-size:0.88rem;color:#c8d6f0;font-weight:500;{titulo_style}">
+            {titulo}
+        </span>
+        {late}
+    </div>
+    <div style="display:flex;gap:0.7rem;align-items:center;flex-wrap:wrap;">
+        <span style="background:{prio_bg};color:{prio_color};
+            border-radius:4px;padding:0.1rem 0.5rem;font-size:0.68rem;font-weight:600;">
+            {prioridade}
+        </span>
+        <span style="color:#4a6a8a;font-size:0.73rem;">👤 {resp_nome}</span>
+        <span style="color:{prazo_col};font-size:0.73rem;">
+            📅 {prazo_str}
+        </span>
+    </div>
+</div>
+""")
+_TASK_LATE = template("""
+<span style="color:{color};font-size:0.7rem;font-weight:700;margin-left:0.4rem;">⚠ {dias}d</span>
+""")
+TASK_STATUSES = ["A Fazer", "Em Andamento", "Concluído"]
+
+
+@st.fragment(key="proj_checklist")
+@timed("checklist")
+def _checklist(project_id):
+    """Counter, every task row as one HTML block, and one action bar for the selected task."""
+    now = datetime.now()
+    db = get_db()
+    try:
+        tarefas = queries.project_tasks(db, project_id)
+    finally:
+        db.close()
 
-    # ── Edit task form ────────────────────────────────────────────────────────
-    edit_tid = st.session_state.get("editing_task_id")
+    n_done = sum(t.status == "Concluído" for t in tarefas)
+    header = _CHECKLIST_HEADER.format(n_done=n_done, n_tasks=len(tarefas))
+    if not tarefas:
+        st.markdown(header + _CHECKLIST_EMPTY, unsafe_allow_html=True)
+        return
 
-    # ── Checklist section (tasks as checklist, like Planner) ─────────────────
-    st.markdown(f"""
-    <div style="font-size:0.75rem;color:#4a6a8a;font-weight:600;
-        text-transform:uppercase;letter-spacing:0.1em;
-        margin:1.2rem 0 0.7rem;padding-bottom:0.4rem;border-bottom:1px solid #1e2d45;">
-        ✅ Lista de verificação &nbsp;
-        <span style="color:#3b9eff;background:#0d2137;border-radius:4px;
-            padding:0.1rem 0.5rem;font-size:0.7rem;">{n_done} / {n_tasks}</span>
-    </div>
-    """, unsafe_allow_html=True)
+    # Sort: overdue first, then by status, then by deadline
+    def sort_key(t):
+        is_over = 1 if (t.prazo and t.prazo < now and t.status != "Concluído") else 0
+        s_order = {"Em Andamento": 0, "A Fazer": 1, "Concluído": 2}.get(t.status, 1)
+        prazo_ts = t.prazo.timestamp() if t.prazo else 9999999999
+        return (-is_over, s_order, prazo_ts)
 
-    if not p.tarefas:
-        st.markdown("""
-        <div style="text-align:center;padding:2rem;color:#2e4a6a;">
-            <div style="font-size:1.5rem">📭</div>
-            <div style="margin-top:0.4rem;font-size:0.85rem">Nenhuma tarefa. Clique em "Nova Tarefa" para começar.</div>
-        </div>
-        """, unsafe_allow_html=True)
-    else:
-        # Sort: overdue first, then by status, then by deadline
-        def sort_key(t):
-            is_over = 1 if (t.prazo and t.prazo < now and t.status != "Concluído") else 0
-            s_order = {"Em Andamento": 0, "A Fazer": 1, "Concluído": 2}.get(t.status, 1)
-            prazo_ts = t.prazo.timestamp() if t.prazo else 9999999999
-            return (-is_over, s_order, prazo_ts)
+    conflict = st.session_state.pop("ck_conflict", None)
+    if conflict:
+        _conflict_warning(*conflict)
 
-        tarefas_sorted = sorted(p.tarefas, key=sort_key)
+    tarefas_sorted = sorted(tarefas, key=sort_key)
+    cache = card_cache()
+    rows = "".join(cache.card("task_row", t.id, _task_version(t), _task_row_html, t, now) for t in tarefas_sorted)
+    st.markdown(header + rows, unsafe_allow_html=True)
+    _task_actions(tarefas_sorted, project_id)
 
-        for t in tarefas_sorted:
-            _task_row(t, p, db, now, edit_tid)
 
-    st.markdown("---")
+def _task_version(t):
+    return (t.atualizado_em, t.responsavel_user.nome if t.responsavel_user else None)
 
 
-def _task_row(t, p, db, now, edit_tid):
-    """Render a single task row in Planner checklist style."""
+def _task_row_html(t, now):
+    """A single task row in Planner checklist style."""
     is_done = t.status == "Concluído"
     is_late = t.prazo and t.prazo < now and not is_done
 
     tcfg = TASK_STATUS_CFG.get(t.status, TASK_STATUS_CFG["A Fazer"])
     pcfg = PRIO_CFG.get(t.prioridade, PRIO_CFG["Média"])
 
-    resp_nome = t.responsavel_user.nome if t.responsavel_user else "—"
-    prazo_str = t.prazo.strftime("%d/%m/%Y") if t.prazo else "Sem prazo"
-    dias_atraso = (now - t.prazo).days if is_late else 0
-
-    titulo_style = "text-decoration:line-through;opacity:0.5;" if is_done else ""
-
-    late_html = ""
+    late = ""
     if is_late:
+        dias_atraso = (now - t.prazo).days
         if dias_atraso > 30:
             lc = "#ff4444"
         elif dias_atraso > 7:
             lc = "#ff8c42"
         else:
             lc = "#fbbf24"
-        late_html = f'<span style="color:{lc};font-size:0.7rem;font-weight:700;margin-left:0.4rem;">⚠ {dias_atraso}d</span>'
+        late = _TASK_LATE.format(color=lc, dias=dias_atraso)
+
+    return _TASK_ROW.format(
+        row_bg="#0d2118" if is_done else ("#1f0d0d" if is_late else "#161b27"),
+        row_border="#1a6040" if is_done else ("#aa222244" if is_late else "#1e2d45"),
+        left_color=tcfg["color"],
+        ck="☑" if is_done else "○",
+        ck_col="#10b981" if is_done else "#3a5a7a",
+        titulo_style="text-decoration:line-through;opacity:0.5;" if is_done else "",
+        titulo=esc(t.titulo),
+        late=late,
+        prio_bg=pcfg["bg"], prio_color=pcfg["color"],
+        prioridade=esc(t.prioridade),
+        resp_nome=esc(t.responsavel_user.nome) if t.responsavel_user else "—",
+        prazo_col="#ff6b6b" if is_late else "#4a6a8a",
+        prazo_str=t.prazo.strftime("%d/%m/%Y") if t.prazo else "Sem prazo",
+    )
+
+
+def _task_actions(tarefas, project_id):
+    by_id = {t.id: t for t in tarefas}
+    col_t, col_st, col_e, col_d = st.columns([6, 2, 0.5, 0.5])
+    with col_t:
+        tid = st.selectbox("Tarefa", list(by_id), index=None, key="ck_pick",
+                           format_func=lambda i: by_id[i].titulo, placeholder="Selecionar tarefa...",
+                           label_visibility="collapsed")
+    if tid is None:
+        return
+    t = by_id[tid]
+    with col_st:
+        st.selectbox("Status", TASK_STATUSES, index=TASK_STATUSES.index(t.status) if t.status in TASK_STATUSES else 0,
+                     key=f"ts_{tid}", label_visibility="collapsed",
+                     on_change=_set_task_status, args=(tid, t.version))
+    with col_e:
+        if st.button("✏", key="ck_edit", help="Editar"):
+            st.session_state["editing_task_id"] = tid
+            st.session_state.pop("editing_task_version", None)
+            st.rerun()
+    with col_d:
+        if st.button("✕", key="ck_del", help="Excluir"):
+            write(commands.delete_task, tid)
+            st.rerun()
 
-    # Checkbox icon
-    ck = "☑" if is_done else "○"
-    ck_col = "#10b981" if is_done else "#3a5a7a"
 
-    row_bg = "#0d2118" if is_done else ("#1f0d0d" if is_late else "#161b27")
-    row_border = "#1a6040" if is_done else ("#aa222244" if is_late else "#1e2d45")
-    left_color = tcfg["color"]
+def _set_task_status(task_id, version):
+    """Status callback: save it and rerun only the checklist and the project header."""
+    status = st.session_state[f"ts_{task_id}"]
+    try:
+        write(commands.set_task_status, task_id, status, version=version)
+    except commands.Conflict:
+        st.session_state["ck_conflict"] = (task_id, status)
+        st.rerun()
+    st.rerun(["proj_header", "proj_checklist"])
 
-    row_html = f"""
-    <div style="background:{row_bg};border:1px solid {row_border};
-        border-left:3px solid {left_color};border-radius:8px;
-        padding:0.65rem 1rem;margin-bottom:0.35rem;
-        display:flex;align-items:center;gap:0.8rem;flex-wrap:wrap;">
 
-        <span style="font-size:1rem;color:{ck_col};flex-shrink:0;">{ck}</span>
+def _conflict_warning(task_id, status):
+    t = _fresh_task(task_id)
+    conflict_warning("O status da tarefa não foi alterado.", TASK_FIELDS,
+                     row_values(t, TASK_FIELDS) if t else None, {"status": status})
 
-        <div style="flex:1;min-width:150px;">
-            <span style="font-size:0.88rem;color:#c8d6f0;font-weight:500;{titulo_style}">
-                {t.titulo}
-            </span>
-            {late_html}
-        </div>
 
-        <div style="display:flex;gap:0.7rem;align-items:center;flex-wrap:wrap;">
-            <span style="background:{pcfg['bg']};color:{pcfg['color']};
-                border-radius:4px;padding:0.1rem 0.5rem;font-size:0.68rem;font-weight:600;">
-                {t.prioridade}
-            </span>
-            <span style="color:#4a6a8a;font-size:0.73rem;">👤 {resp_nome}</span>
-            <span style="color:{'#ff6b6b' if is_late else '#4a6a8a'};font-size:0.73rem;">
-                📅 {prazo_str}
-            </span>
-        </div>
-    </div>
-    """
-    st.markdown(row_html, unsafe_allow_html=True)
+def _fresh_project(project_id):
+    """The project as it is now, for fragments rerunning after the page session closed."""
+    db = get_db()
+    try:
+        return queries.project_detail(db, project_id)
+    finally:
+        db.close()
 
-    # Action buttons (compact)
-    col_st, col_e, col_d, _ = st.columns([2, 0.5, 0.5, 6])
-    with col_st:
-        opts = ["A Fazer", "Em Andamento", "Concluído"]
-        idx = opts.index(t.status) if t.status in opts else 0
-        new_s = st.selectbox("", opts, index=idx, key=f"ts_{t.id}", label_visibility="collapsed")
-        if new_s != t.status:
-            t.status = new_s
-            t.atualizado_em = datetime.now()
-            # Update project progress
-            n_done_new = sum(1 for x in p.tarefas if (x.id == t.id and new_s == "Concluído") or
-                             (x.id != t.id and x.status == "Concluído"))
-            n_total = len(p.tarefas)
-            p.progresso = (n_done_new / n_total * 100) if n_total else 0
-            db.commit(); st.rerun()
-    with col_e:
-        if st.button("✏", key=f"te_{t.id}", help="Editar"):
-            st.session_state["editing_task_id"] = t.id; st.rerun()
-    with col_d:
-        if st.button("✕", key=f"td_{t.id}", help="Excluir"):
-            db.delete(t)
-            # recalc progress
-            remaining = [x for x in p.tarefas if x.id != t.id]
-            done = sum(1 for x in remaining if x.status == "Concluído")
-            p.progresso = (done / len(remaining) * 100) if remaining else 0
-            db.commit(); st.rerun()
 
-    # Inline edit form
-    if st.session_state.get("editing_task_id") == t.id:
-        _edit_task_inline(t, p, db)
+def _fresh_task(task_id):
+    db = get_db()
+    try:
+        return queries.task_detail(db, task_id)
+    finally:
+        db.close()
 
 
 # ── Forms ─────────────────────────────────────────────────────────────────────
@@ -571,8 +717,7 @@ def _create_task_form(p, db):
     </div>
     """, unsafe_allow_html=True)
 
-    users = db.query(User).order_by(User.nome).all()
-    u_map = {u.nome: u.id for u in users}
+    u_map = {nome: uid for uid, nome in read_models.user_options()}
 
     with st.form(f"new_task_{p.id}"):
         titulo = st.text_input("Título *", placeholder="Descreva a tarefa...")
@@ -592,17 +737,13 @@ def _create_task_form(p, db):
             if not titulo:
                 st.error("Título obrigatório")
             else:
-                t = Task(
+                write(
+                    commands.create_task,
                     titulo=titulo, descricao=descricao,
                     projeto_id=p.id, responsavel_id=u_map.get(responsavel),
                     status=status, prioridade=prioridade,
                     prazo=datetime.combine(prazo, datetime.min.time()) if prazo else None,
                 )
-                db.add(t)
-                n_done = sum(1 for x in p.tarefas if x.status == "Concluído") + (1 if status == "Concluído" else 0)
-                n_total = len(p.tarefas) + 1
-                p.progresso = n_done / n_total * 100
-                db.commit()
                 st.session_state.pop("creating_task_for", None)
                 st.success(f"✅ Tarefa '{titulo}' criada!")
                 st.rerun()
@@ -619,27 +760,33 @@ def _edit_task_inline(t, p, db):
     </div>
     """, unsafe_allow_html=True)
 
-    users = db.query(User).order_by(User.nome).all()
-    u_map = {u.nome: u.id for u in users}
-    u_names = [u.nome for u in users]
-    curr_resp = next((u.nome for u in users if u.id == t.responsavel_id), u_names[0])
+    users = read_models.user_options()
+    u_map = {nome: uid for uid, nome in users}
+    u_names = [nome for _, nome in users]
+    curr_resp = next((nome for uid, nome in users if uid == t.responsavel_id), u_names[0])
+    # The version the form was opened on: saving over a newer one is a conflict
+    seen = st.session_state.setdefault("editing_task_version", t.version)
 
     with st.form(f"edit_task_form_{t.id}"):
-        titulo = st.text_input("Título", value=t.titulo)
-        descricao = st.text_area("Descrição", value=t.descricao or "", height=70)
+        # Keyed so a conflicting save keeps what the user typed
+        titulo = st.text_input("Título", value=t.titulo, key=f"et_titulo_{t.id}")
+        descricao = st.text_area("Descrição", value=t.descricao or "", height=70, key=f"et_desc_{t.id}")
         c1, c2, c3, c4 = st.columns(4)
         with c1:
             responsavel = st.selectbox("Responsável", u_names,
-                                       index=u_names.index(curr_resp) if curr_resp in u_names else 0)
+                                       index=u_names.index(curr_resp) if curr_resp in u_names else 0,
+                                       key=f"et_resp_{t.id}")
         with c2:
             opts = ["A Fazer", "Em Andamento", "Concluído"]
-            status = st.selectbox("Status", opts, index=opts.index(t.status) if t.status in opts else 0)
+            status = st.selectbox("Status", opts, index=opts.index(t.status) if t.status in opts else 0,
+                                  key=f"et_status_{t.id}")
         with c3:
             prios = ["Baixa", "Média", "Alta", "Crítica"]
             prioridade = st.selectbox("Prioridade", prios,
-                                      index=prios.index(t.prioridade) if t.prioridade in prios else 1)
+                                      index=prios.index(t.prioridade) if t.prioridade in prios else 1,
+                                      key=f"et_prio_{t.id}")
         with c4:
-            prazo = st.date_input("Prazo", value=t.prazo.date() if t.prazo else None)
+            prazo = st.date_input("Prazo", value=t.prazo.date() if t.prazo else None, key=f"et_prazo_{t.id}")
 
         cs, cc = st.columns(2)
         with cs:
@@ -648,17 +795,26 @@ def _edit_task_inline(t, p, db):
             cancel = st.form_submit_button("Cancelar", use_container_width=True)
 
         if sub:
-            t.titulo = titulo; t.descricao = descricao
-            t.responsavel_id = u_map.get(responsavel)
-            t.status = status; t.prioridade = prioridade
-            t.prazo = datetime.combine(prazo, datetime.min.time()) if prazo else None
-            t.atualizado_em = datetime.now()
-            n_done = sum(1 for x in p.tarefas if (x.id == t.id and status == "Concluído") or
-                         (x.id != t.id and x.status == "Concluído"))
-            p.progresso = (n_done / len(p.tarefas) * 100) if p.tarefas else 0
-            db.commit()
-            st.session_state.pop("editing_task_id", None)
-            st.success("✅ Salvo!"); st.rerun()
+            try:
+                write(
+                    commands.update_task, t.id, version=seen,
+                    titulo=titulo, descricao=descricao,
+                    responsavel_id=u_map.get(responsavel),
+                    status=status, prioridade=prioridade,
+                    prazo=datetime.combine(prazo, datetime.min.time()) if prazo else None,
+                )
+            except commands.Conflict:
+                current = _fresh_task(t.id)
+                if current is not None:
+                    # Saving again now knowingly overwrites the values in the warning
+                    st.session_state["editing_task_version"] = current.version
+                conflict_warning("Sua edição não foi salva.", TASK_FIELDS,
+                                 row_values(current, TASK_FIELDS) if current else None,
+                                 dict(titulo=titulo, descricao=descricao, responsavel=responsavel,
+                                      status=status, prioridade=prioridade, prazo=prazo))
+            else:
+                st.session_state.pop("editing_task_id", None)
+                st.success("✅ Salvo!"); st.rerun()
         if cancel:
             st.session_state.pop("editing_task_id", None); st.rerun()
 
@@ -674,25 +830,35 @@ def _edit_project_inline(p, db):
     </div>
     """, unsafe_allow_html=True)
 
-    users = db.query(User).order_by(User.nome).all()
-    u_map = {u.nome: u.id for u in users}
-    u_names = [u.nome for u in users]
-    curr_resp = next((u.nome for u in users if u.id == p.responsavel_id), u_names[0] if u_names else "")
+    users = read_models.user_options()
+    u_map = {nome: uid for uid, nome in users}
+    u_names = [nome for _, nome in users]
+    curr_resp = next((nome for uid, nome in users if uid == p.responsavel_id), u_names[0] if u_names else "")
+    # The version and progress the form was opened on: saving over a newer
+    # version is a conflict. Task moves recompute progresso without a new
+    # version, so it is only saved when the user moved the slider.
+    seen, shown_prog = st.session_state.setdefault("editing_proj_seen", (p.version, int(p.progresso)))
 
     with st.form(f"edit_proj_{p.id}"):
-        nome = st.text_input("Nome", value=p.nome)
-        descricao = st.text_area("Descrição / Anotações", value=p.descricao or "", height=100)
+        # Keyed so a conflicting save keeps what the user typed
+        nome = st.text_input("Nome", value=p.nome, key=f"ep_nome_{p.id}")
+        descricao = st.text_area("Descrição / Anotações", value=p.descricao or "", height=100,
+                                 key=f"ep_desc_{p.id}")
         c1, c2 = st.columns(2)
         with c1:
             responsavel = st.selectbox("Responsável", u_names,
-                                       index=u_names.index(curr_resp) if curr_resp in u_names else 0)
-            di = st.date_input("Início", value=p.data_inicio.date() if p.data_inicio else None)
+                                       index=u_names.index(curr_resp) if curr_resp in u_names else 0,
+                                       key=f"ep_resp_{p.id}")
+            di = st.date_input("Início", value=p.data_inicio.date() if p.data_inicio else None,
+                               key=f"ep_inicio_{p.id}")
             status_opts = ["Planejamento", "Ativo", "Pausado", "Concluído", "Cancelado"]
             status = st.selectbox("Status", status_opts,
-                                  index=status_opts.index(p.status) if p.status in status_opts else 0)
+                                  index=status_opts.index(p.status) if p.status in status_opts else 0,
+                                  key=f"ep_status_{p.id}")
         with c2:
-            df_ = st.date_input("Conclusão", value=p.data_fim.date() if p.data_fim else None)
-            progresso = st.slider("Progresso (%)", 0, 100, int(p.progresso))
+            df_ = st.date_input("Conclusão", value=p.data_fim.date() if p.data_fim else None,
+                                key=f"ep_fim_{p.id}")
+            progresso = st.slider("Progresso (%)", 0, 100, int(p.progresso), key=f"ep_prog_{p.id}")
 
         cs, cc = st.columns(2)
         with cs:
@@ -701,15 +867,28 @@ def _edit_project_inline(p, db):
             cancel = st.form_submit_button("Cancelar", use_container_width=True)
 
         if sub:
-            p.nome = nome; p.descricao = descricao
-            p.responsavel_id = u_map.get(responsavel)
-            p.data_inicio = datetime.combine(di, datetime.min.time()) if di else None
-            p.data_fim = datetime.combine(df_, datetime.min.time()) if df_ else None
-            p.status = status; p.progresso = float(progresso)
-            p.atualizado_em = datetime.now()
-            db.commit()
-            st.session_state.pop("editing_proj_inline", None)
-            st.success("✅ Projeto atualizado!"); st.rerun()
+            fields = dict(
+                nome=nome, descricao=descricao,
+                responsavel_id=u_map.get(responsavel),
+                data_inicio=datetime.combine(di, datetime.min.time()) if di else None,
+                data_fim=datetime.combine(df_, datetime.min.time()) if df_ else None,
+                status=status,
+            )
+            if progresso != shown_prog:
+                fields["progresso"] = float(progresso)
+            try:
+                write(commands.update_project, p.id, version=seen, **fields)
+            except commands.Conflict:
+                current = _fresh_project(p.id)
+                if current is not None:
+                    st.session_state["editing_proj_seen"] = (current.version, int(current.progresso))
+                conflict_warning("Sua edição do projeto não foi salva.", PROJECT_FIELDS,
+                                 row_values(current, PROJECT_FIELDS) if current else None,
+                                 dict(nome=nome, descricao=descricao, responsavel=responsavel, data_inicio=di,
+                                      data_fim=df_, status=status, progresso=float(progresso)))
+            else:
+                st.session_state.pop("editing_proj_inline", None)
+                st.success("✅ Projeto atualizado!"); st.rerun()
         if cancel:
             st.session_state.pop("editing_proj_inline", None); st.rerun()
 
@@ -725,8 +904,7 @@ def _create_project_form(db):
     </div>
     """, unsafe_allow_html=True)
 
-    users = db.query(User).order_by(User.nome).all()
-    u_map = {u.nome: u.id for u in users}
+    u_map = {nome: uid for uid, nome in read_models.user_options()}
 
     with st.form("create_project_form"):
         nome = st.text_input("Nome do Projeto *", placeholder="Ex: Treinamento XYZ [HRC1234567]")
@@ -750,14 +928,14 @@ def _create_project_form(db):
             if not nome:
                 st.error("Nome obrigatório.")
             else:
-                proj = Project(
+                write(
+                    commands.create_project,
                     nome=nome, descricao=descricao,
                     responsavel_id=u_map.get(responsavel),
                     data_inicio=datetime.combine(di, datetime.min.time()),
                     data_fim=datetime.combine(df_, datetime.min.time()),
-                    status=status, progresso=float(progresso)
+                    status=status, progresso=float(progresso),
                 )
-                db.add(proj); db.commit()
                 st.session_state.pop("creating_project", None)
                 st.success(f"✅ Projeto '{nome}' criado!"); st.rerun()
         if cancel:
@@ -765,4 +943,4 @@ def _create_project_form(db):
 
 
 def _has_overdue_tasks(p, now):
-    return any(t.prazo and t.prazo < now and t.status != "Concluído" for t in p.tarefas)
+    return p.earliest_open_prazo is not None and p.earliest_open_prazo < now
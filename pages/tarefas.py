@@ -2,8 +2,13 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 from database import get_db
-from models import Task, Project, User
+import commands
 from auth import require_role, get_current_user_id
+import queries
+import read_models
+from render import TASK_FIELDS, card_cache, conflict_warning, esc, row_values, template
+from telemetry import note_filters, timed
+from writer import write
 
 
 def show():
@@ -22,146 +27,230 @@ def show():
         db.close()
 
 
+PAGE_SIZES = [20, 50, 100]
+
+
+@timed("lista")
 def _list_tasks(db):
     col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
     with col1:
-        search = st.text_input("🔍 Buscar", placeholder="Título da tarefa...")
+        search = st.text_input("🔍 Buscar", placeholder="Título ou descrição da tarefa...")
     with col2:
-        projects = db.query(Project).all()
-        proj_opts = ["Todos"] + [p.nome for p in projects]
+        projects = read_models.project_options()
+        proj_opts = ["Todos"] + [nome for _, nome, _ in projects]
         proj_filter = st.selectbox("Projeto", proj_opts)
     with col3:
         status_filter = st.selectbox("Status", ["Todos", "A Fazer", "Em Andamento", "Concluído"])
     with col4:
         prior_filter = st.selectbox("Prioridade", ["Todas", "Crítica", "Alta", "Média", "Baixa"])
 
-    query = db.query(Task)
-    if search:
-        query = query.filter(Task.titulo.ilike(f"%{search}%"))
+    pid = None
     if proj_filter != "Todos":
-        proj = db.query(Project).filter(Project.nome == proj_filter).first()
-        if proj:
-            query = query.filter(Task.projeto_id == proj.id)
-    if status_filter != "Todos":
-        query = query.filter(Task.status == status_filter)
-    if prior_filter != "Todas":
-        query = query.filter(Task.prioridade == prior_filter)
-
-    tasks = query.order_by(Task.data_criacao.desc()).all()
+        pid = next((pid for pid, nome, _ in projects if nome == proj_filter), None)
+
+    filtros = dict(
+        search=search, projeto_id=pid,
+        status=status_filter if status_filter != "Todos" else None,
+        prioridade=prior_filter if prior_filter != "Todas" else None,
+    )
+    page_size = st.session_state.get("task_page_size", PAGE_SIZES[0])
+
+    # Keyset pagination: stack of page-start cursors, reset whenever the filters change
+    assinatura = (search, proj_filter, status_filter, prior_filter, page_size)
+    if st.session_state.get("task_list_filtros") != assinatura:
+        st.session_state["task_list_filtros"] = assinatura
+        st.session_state["task_list_cursors"] = [None]
+    cursors = st.session_state["task_list_cursors"]
+    note_filters(busca=search, projeto=proj_filter, status=status_filter, prioridade=prior_filter,
+                 pagina=len(cursors), por_pagina=page_size)
+
+    total = queries.count_tasks(db, **filtros)
+    tasks, next_cursor = queries.task_page(db, cursor=cursors[-1], limit=page_size, **filtros)
 
     if not tasks:
         st.info("Nenhuma tarefa encontrada.")
         return
 
-    st.markdown(f"**{len(tasks)} tarefa(s) encontrada(s)**")
-    st.markdown("")
+    conflict = st.session_state.pop("task_conflict", None)
+    if conflict:
+        task_id, status = conflict
+        _conflict_warning(task_id, "O status da tarefa não foi alterado.", {"status": status})
 
-    for t in tasks:
-        _task_card(t, db)
+    n_pages = max(1, -(-total // page_size))
+    st.markdown(f"**{total} tarefa(s) encontrada(s)** · página {len(cursors)} de {n_pages}")
 
-
-def _task_card(t, db):
     now = datetime.now()
-    is_late = t.prazo and t.prazo < now and t.status != "Concluído"
+    cache = card_cache()
+    rows = "".join(cache.card("task_item", t.id, _task_version(t), _task_row_html, t, now) for t in tasks)
+    st.markdown(rows, unsafe_allow_html=True)
+    _task_actions(tasks, now, db)
+
+    col_prev, col_size, col_next = st.columns([1, 1, 1])
+    with col_prev:
+        if len(cursors) > 1 and st.button("← Anterior", key="task_prev", use_container_width=True):
+            cursors.pop(); st.rerun()
+    with col_size:
+        st.selectbox("Por página", PAGE_SIZES, key="task_page_size", label_visibility="collapsed",
+                     format_func=lambda n: f"{n} por página")
+    with col_next:
+        if next_cursor and st.button("Próxima →", key="task_next", use_container_width=True):
+            cursors.append(next_cursor); st.rerun()
+
+
+PRIOR_ICONS = {"Crítica": "🔴", "Alta": "🟠", "Média": "🟡", "Baixa": "🟢"}
+STATUS_ICONS = {"A Fazer": "📝", "Em Andamento": "⚙️", "Concluído": "✅"}
+STATUS_OPTS = ["A Fazer", "Em Andamento", "Concluído"]
+
+_TASK_ROW = template("""
+<div style="background:{row_bg};border:1px solid #1e2d45;border-left:3px solid {left_color};
+    border-radius:8px;padding:0.6rem 1rem;margin-bottom:0.35rem;">
+    <div style="display:flex;justify-content:space-between;align-items:center;gap:0.8rem;flex-wrap:wrap;">
+        <span style="font-size:0.88rem;color:#c8d6f0;font-weight:500;{titulo_style}">{s_icon} {titulo}</span>
+        <span style="font-size:0.73rem;color:#7a9ab8;">{p_icon} {prioridade} · {status}{late}</span>
+    </div>
+    <div style="font-size:0.72rem;color:#4a6a8a;margin-top:0.25rem;">
+        📁 {projeto} &nbsp;·&nbsp; 👤 {resp_nome} &nbsp;·&nbsp;
+        📅 <span style="color:{prazo_col}">{prazo_str}</span> &nbsp;·&nbsp; #{id}
+    </div>
+</div>
+""")
+_TASK_LATE = template("""
+<span style="color:#ff4444;font-weight:700;"> ⚠️ ATRASADA</span>
+""")
+
+
+def _task_version(t):
+    return (t.atualizado_em, t.responsavel_user.nome if t.responsavel_user else None,
+            t.projeto.nome if t.projeto else None)
+
+
+def _task_row_html(t, now):
     is_done = t.status == "Concluído"
+    is_late = t.prazo and t.prazo < now and not is_done
+    return _TASK_ROW.format(
+        id=t.id,
+        row_bg="#0d2118" if is_done else ("#1f0d0d" if is_late else "#161b27"),
+        left_color="#10b981" if is_done else ("#ff4444" if is_late else "#3b9eff"),
+        titulo_style="text-decoration:line-through;opacity:0.6;" if is_done else "",
+        s_icon=STATUS_ICONS.get(t.status, "📌"),
+        titulo=esc(t.titulo),
+        p_icon=PRIOR_ICONS.get(t.prioridade, "⚪"),
+        prioridade=esc(t.prioridade),
+        status=esc(t.status),
+        late=_TASK_LATE if is_late else "",
+        projeto=esc(t.projeto.nome) if t.projeto else "-",
+        resp_nome=esc(t.responsavel_user.nome) if t.responsavel_user else "-",
+        prazo_col="#ff6b6b" if is_late else "#4a6a8a",
+        prazo_str=t.prazo.strftime("%d/%m/%Y") if t.prazo else "Sem prazo",
+    )
+
+
+def _task_actions(tasks, now, db):
+    """One action bar for the task picked from the page: details, status, edit and delete."""
+    by_id = {t.id: t for t in tasks}
+    tid = st.selectbox("Tarefa", list(by_id), index=None, key="task_pick",
+                       format_func=lambda i: f"#{i} {by_id[i].titulo}", placeholder="Selecionar tarefa...",
+                       label_visibility="collapsed")
+    if tid is None:
+        return
+    t = by_id[tid]
 
-    prior_colors = {"Crítica": "🔴", "Alta": "🟠", "Média": "🟡", "Baixa": "🟢"}
-    status_icons = {"A Fazer": "📝", "Em Andamento": "⚙️", "Concluído": "✅"}
-
-    p_icon = prior_colors.get(t.prioridade, "⚪")
-    s_icon = status_icons.get(t.status, "📌")
-    late_label = " ⚠️ ATRASADA" if is_late else ""
-    done_style = "~~" if is_done else ""
-
-    label = f"{s_icon} {done_style}{t.titulo}{done_style} | {p_icon} {t.prioridade} | {t.status}{late_label}"
-
-    with st.expander(label):
-        col1, col2 = st.columns([3, 1])
-
-        with col1:
-            st.markdown(f"**Descrição:** {t.descricao or 'Sem descrição'}")
-            st.markdown(f"**Projeto:** {t.projeto.nome if t.projeto else '-'}")
-            st.markdown(f"**Responsável:** {t.responsavel_user.nome if t.responsavel_user else '-'}")
-            if t.prazo:
-                prazo_str = t.prazo.strftime("%d/%m/%Y")
-                if is_late:
-                    dias = (now - t.prazo).days
-                    st.markdown(f"**Prazo:** :red[{prazo_str} (atraso de {dias} dia(s))]")
-                else:
-                    st.markdown(f"**Prazo:** {prazo_str}")
-            st.markdown(f"**Criada em:** {t.data_criacao.strftime('%d/%m/%Y %H:%M')}")
-
-        with col2:
-            # Quick status change
-            status_opts = ["A Fazer", "Em Andamento", "Concluído"]
-            curr_idx = status_opts.index(t.status) if t.status in status_opts else 0
-            new_status = st.selectbox("Alterar status", status_opts,
-                                      index=curr_idx, key=f"status_{t.id}")
-            if new_status != t.status:
-                t.status = new_status
-                t.atualizado_em = datetime.now()
-                db.commit()
-                st.success("Status atualizado!")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.markdown(f"**Descrição:** {t.descricao or 'Sem descrição'}")
+        if t.prazo and t.prazo < now and t.status != "Concluído":
+            st.markdown(f"**Prazo:** :red[{t.prazo.strftime('%d/%m/%Y')} (atraso de {(now - t.prazo).days} dia(s))]")
+        st.markdown(f"**Criada em:** {t.data_criacao.strftime('%d/%m/%Y %H:%M')}")
+    with col2:
+        # Quick status change
+        curr_idx = STATUS_OPTS.index(t.status) if t.status in STATUS_OPTS else 0
+        st.selectbox("Alterar status", STATUS_OPTS, index=curr_idx, key=f"status_{t.id}",
+                     on_change=_change_status, args=(t.id, t.version))
+
+    if require_role("admin", "gestor") or t.responsavel_id == get_current_user_id():
+        col_e, col_d, _ = st.columns([1, 1, 3])
+        with col_e:
+            if st.button("✏️ Editar", key=f"tedit_{t.id}"):
+                st.session_state["editing_task"] = t.id
+                st.session_state.pop("editing_task_version", None)
                 st.rerun()
-
-        if require_role("admin", "gestor") or t.responsavel_id == get_current_user_id():
-            col_e, col_d, _ = st.columns([1, 1, 3])
-            with col_e:
-                if st.button("✏️ Editar", key=f"tedit_{t.id}"):
-                    st.session_state["editing_task"] = t.id
+        with col_d:
+            if st.button("🗑️ Excluir", key=f"tdel_{t.id}"):
+                st.session_state[f"confirm_del_task_{t.id}"] = True
+
+        if st.session_state.get(f"confirm_del_task_{t.id}"):
+            st.warning("Tem certeza que deseja excluir esta tarefa?")
+            c1, c2 = st.columns(2)
+            with c1:
+                if st.button("✅ Confirmar", key=f"tconfirm_{t.id}", type="primary"):
+                    write(commands.delete_task, t.id)
+                    del st.session_state[f"confirm_del_task_{t.id}"]
+                    st.success("Tarefa excluída!")
+                    st.rerun()
+            with c2:
+                if st.button("❌ Cancelar", key=f"tcancel_{t.id}"):
+                    del st.session_state[f"confirm_del_task_{t.id}"]
                     st.rerun()
-            with col_d:
-                if st.button("🗑️ Excluir", key=f"tdel_{t.id}"):
-                    st.session_state[f"confirm_del_task_{t.id}"] = True
-
-            if st.session_state.get(f"confirm_del_task_{t.id}"):
-                st.warning("Tem certeza que deseja excluir esta tarefa?")
-                c1, c2 = st.columns(2)
-                with c1:
-                    if st.button("✅ Confirmar", key=f"tconfirm_{t.id}", type="primary"):
-                        db.delete(t)
-                        db.commit()
-                        del st.session_state[f"confirm_del_task_{t.id}"]
-                        st.success("Tarefa excluída!")
-                        st.rerun()
-                with c2:
-                    if st.button("❌ Cancelar", key=f"tcancel_{t.id}"):
-                        del st.session_state[f"confirm_del_task_{t.id}"]
-                        st.rerun()
 
     if st.session_state.get("editing_task") == t.id:
         _edit_task_form(t, db)
 
 
+def _change_status(task_id, version):
+    status = st.session_state[f"status_{task_id}"]
+    try:
+        write(commands.set_task_status, task_id, status, version=version)
+    except commands.Conflict:
+        st.session_state["task_conflict"] = (task_id, status)
+
+
+def _conflict_warning(task_id, message, yours):
+    db = get_db()
+    try:
+        t = queries.task_detail(db, task_id)
+        current = row_values(t, TASK_FIELDS) if t else None
+    finally:
+        db.close()
+    conflict_warning(message, TASK_FIELDS, current, yours)
+    return t
+
+
 def _edit_task_form(t, db):
     st.markdown("---")
     st.markdown(f"### ✏️ Editando: {t.titulo}")
 
-    projects = db.query(Project).all()
-    users = db.query(User).all()
-    proj_map = {p.nome: p.id for p in projects}
-    user_map = {u.nome: u.id for u in users}
-    proj_names = [p.nome for p in projects]
-    user_names = [u.nome for u in users]
+    projects = read_models.project_options()
+    users = read_models.user_options()
+    proj_map = {nome: pid for pid, nome, _ in projects}
+    user_map = {nome: uid for uid, nome in users}
+    proj_names = [nome for _, nome, _ in projects]
+    user_names = [nome for _, nome in users]
 
-    curr_proj = next((p.nome for p in projects if p.id == t.projeto_id), proj_names[0] if proj_names else None)
-    curr_resp = next((u.nome for u in users if u.id == t.responsavel_id), user_names[0] if user_names else None)
+    curr_proj = next((nome for pid, nome, _ in projects if pid == t.projeto_id), proj_names[0] if proj_names else None)
+    curr_resp = next((nome for uid, nome in users if uid == t.responsavel_id), user_names[0] if user_names else None)
+    # The version the form was opened on: saving over a newer one is a conflict
+    seen = st.session_state.setdefault("editing_task_version", t.version)
 
     with st.form(f"edit_task_{t.id}"):
-        titulo = st.text_input("Título", value=t.titulo)
-        descricao = st.text_area("Descrição", value=t.descricao or "")
+        # Keyed so a conflicting save keeps what the user typed
+        titulo = st.text_input("Título", value=t.titulo, key=f"tf_titulo_{t.id}")
+        descricao = st.text_area("Descrição", value=t.descricao or "", key=f"tf_desc_{t.id}")
         col1, col2 = st.columns(2)
         with col1:
             projeto = st.selectbox("Projeto", proj_names,
-                                   index=proj_names.index(curr_proj) if curr_proj in proj_names else 0)
+                                   index=proj_names.index(curr_proj) if curr_proj in proj_names else 0,
+                                   key=f"tf_proj_{t.id}")
             status = st.selectbox("Status", ["A Fazer", "Em Andamento", "Concluído"],
-                                  index=["A Fazer", "Em Andamento", "Concluído"].index(t.status))
-            prazo = st.date_input("Prazo", value=t.prazo.date() if t.prazo else None)
+                                  index=["A Fazer", "Em Andamento", "Concluído"].index(t.status),
+                                  key=f"tf_status_{t.id}")
+            prazo = st.date_input("Prazo", value=t.prazo.date() if t.prazo else None, key=f"tf_prazo_{t.id}")
         with col2:
             responsavel = st.selectbox("Responsável", user_names,
-                                       index=user_names.index(curr_resp) if curr_resp in user_names else 0)
+                                       index=user_names.index(curr_resp) if curr_resp in user_names else 0,
+                                       key=f"tf_resp_{t.id}")
             prioridade = st.selectbox("Prioridade", ["Baixa", "Média", "Alta", "Crítica"],
-                                      index=["Baixa", "Média", "Alta", "Crítica"].index(t.prioridade) if t.prioridade in ["Baixa", "Média", "Alta", "Crítica"] else 1)
+                                      index=["Baixa", "Média", "Alta", "Crítica"].index(t.prioridade) if t.prioridade in ["Baixa", "Média", "Alta", "Crítica"] else 1,
+                                      key=f"tf_prio_{t.id}")
 
         c1, c2 = st.columns(2)
         with c1:
@@ -170,18 +259,28 @@ def _edit_task_form(t, db):
             cancelled = st.form_submit_button("Cancelar", use_container_width=True)
 
         if submitted:
-            t.titulo = titulo
-            t.descricao = descricao
-            t.projeto_id = proj_map.get(projeto)
-            t.responsavel_id = user_map.get(responsavel)
-            t.status = status
-            t.prioridade = prioridade
-            t.prazo = datetime.combine(prazo, datetime.min.time()) if prazo else None
-            t.atualizado_em = datetime.now()
-            db.commit()
-            del st.session_state["editing_task"]
-            st.success("✅ Tarefa atualizada!")
-            st.rerun()
+            try:
+                write(
+                    commands.update_task, t.id, version=seen,
+                    titulo=titulo,
+                    descricao=descricao,
+                    projeto_id=proj_map.get(projeto),
+                    responsavel_id=user_map.get(responsavel),
+                    status=status,
+                    prioridade=prioridade,
+                    prazo=datetime.combine(prazo, datetime.min.time()) if prazo else None,
+                )
+            except commands.Conflict:
+                current = _conflict_warning(t.id, "Sua edição não foi salva.", dict(
+                    titulo=titulo, descricao=descricao, responsavel=responsavel,
+                    status=status, prioridade=prioridade, prazo=prazo))
+                if current is not None:
+                    # Saving again now knowingly overwrites the values in the warning
+                    st.session_state["editing_task_version"] = current.version
+            else:
+                del st.session_state["editing_task"]
+                st.success("✅ Tarefa atualizada!")
+                st.rerun()
 
         if cancelled:
             del st.session_state["editing_task"]
@@ -191,15 +290,15 @@ def _edit_task_form(t, db):
 def _create_task_form(db):
     st.markdown("### ➕ Criar Nova Tarefa")
 
-    projects = db.query(Project).filter(Project.status.in_(["Ativo", "Planejamento"])).all()
-    users = db.query(User).all()
+    projects = [(pid, nome) for pid, nome, status in read_models.project_options()
+                if status in ("Ativo", "Planejamento")]
 
     if not projects:
         st.warning("Nenhum projeto ativo disponível. Crie um projeto primeiro.")
         return
 
-    proj_map = {p.nome: p.id for p in projects}
-    user_map = {u.nome: u.id for u in users}
+    proj_map = {nome: pid for pid, nome in projects}
+    user_map = {nome: uid for uid, nome in read_models.user_options()}
 
     with st.form("create_task_form"):
         titulo = st.text_input("Título da Tarefa *", placeholder="Ex: Criar protótipo da tela inicial")
@@ -220,15 +319,14 @@ def _create_task_form(db):
             if not titulo:
                 st.error("O título é obrigatório.")
             else:
-                task = Task(
+                write(
+                    commands.create_task,
                     titulo=titulo,
                     descricao=descricao,
                     projeto_id=proj_map.get(projeto),
                     responsavel_id=user_map.get(responsavel),
                     status=status,
                     prioridade=prioridade,
-                    prazo=datetime.combine(prazo, datetime.min.time()) if prazo else None
+                    prazo=datetime.combine(prazo, datetime.min.time()) if prazo else None,
                 )
-                db.add(task)
-                db.commit()
                 st.success(f"✅ Tarefa **{titulo}** criada com sucesso!")
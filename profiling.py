@@ -0,0 +1,116 @@
+"""
+Perfil (cProfile) das próximas execuções da página, sob demanda.
+
+Um administrador liga a captura pelo painel da barra lateral ou abrindo a
+aplicação com ``?profile=N``: as próximas N execuções da página roteada em
+``app.py`` rodam sob ``cProfile``. Cada uma gera, em ``PROFILE_DIR``, um
+``.prof`` (abra com ``python -m pstats`` ou snakeviz) e um ``.json`` com a
+página, os filtros em uso, o usuário, o tempo e as funções de maior tempo
+cumulativo, que também aparecem no painel.
+"""
+import cProfile
+import json
+import os
+import pstats
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import streamlit as st
+
+from auth import require_role
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_TOP = int(os.environ.get("PROFILE_TOP", "25"))
+PROFILE_MAX_RUNS = int(os.environ.get("PROFILE_MAX_RUNS", "20"))
+PROFILE_PARAM = "profile"
+
+_ROOT = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_LIBRARY_PREFIX = re.compile(r".*/(?:site-packages|lib/python\d+\.\d+)/")
+_UNSAFE = re.compile(r"[^A-Za-z0-9_-]+")
+
+
+def _requested_runs():
+    """Runs left to profile in this session, taking a ``?profile=N`` request from the URL."""
+    requested = st.query_params.get(PROFILE_PARAM)
+    if requested is not None:
+        del st.query_params[PROFILE_PARAM]
+        try:
+            st.session_state["profile_runs"] = max(0, min(int(requested), PROFILE_MAX_RUNS))
+        except ValueError:
+            pass
+    return st.session_state.get("profile_runs", 0)
+
+
+@contextmanager
+def profile(trace):
+    """Profile the block when an admin asked for it; ``trace`` gives the page and its filters."""
+    if not require_role("admin") or not _requested_runs():
+        yield
+        return
+    st.session_state["profile_runs"] -= 1
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _save(profiler, trace, time.perf_counter() - start)
+
+
+def top_functions(stats, n=PROFILE_TOP):
+    """``[(function, calls, own seconds, cumulative seconds)]`` by cumulative time."""
+    rows = []
+    for (path, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+        where = f"{_LIBRARY_PREFIX.sub('', path.removeprefix(_ROOT))}:{line}" if line else path
+        rows.append((f"{name} ({where})", calls, own, cumulative))
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows[:n]
+
+
+def _save(profiler, trace, seconds):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    base = os.path.join(PROFILE_DIR, f"{stamp}_{_UNSAFE.sub('_', trace.page)}")
+    profiler.dump_stats(base + ".prof")
+    summary = {
+        "page": trace.page,
+        "filters": trace.filters,
+        "user_id": st.session_state.get("user_id"),
+        "criado_em": datetime.now().isoformat(timespec="seconds"),
+        "seconds": round(seconds, 4),
+        "prof": base + ".prof",
+        "top": [{"function": f, "calls": c, "own_s": round(o, 6), "cumulative_s": round(cu, 6)}
+                for f, c, o, cu in top_functions(pstats.Stats(profiler))],
+    }
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2, default=str)
+    # The panel shows the latest profiles of this session
+    st.session_state["profiles"] = [summary, *st.session_state.get("profiles", [])][:5]
+
+
+def _start(runs):
+    st.session_state["profile_runs"] = runs
+
+
+def panel():
+    """Sidebar controls and results; the caller checks the user is an admin."""
+    with st.expander("⏱️ Perfil da página (cProfile)"):
+        remaining = st.session_state.get("profile_runs", 0)
+        runs = st.number_input("Execuções", 1, PROFILE_MAX_RUNS, 3, key="profile_n")
+        st.button(f"Perfilar as próximas {runs}", key="profile_start", use_container_width=True,
+                  on_click=_start, args=(runs,))
+        if remaining:
+            st.caption(f"Faltam {remaining} execução(ões) a perfilar.")
+        for summary in st.session_state.get("profiles", []):
+            filtros = ", ".join(f"{k}={v}" for k, v in summary["filters"].items()) or "sem filtros"
+            st.markdown(f"**{summary['page']}** · {summary['seconds'] * 1000:.0f} ms · {filtros}")
+            st.caption(summary["prof"])
+            st.dataframe(
+                [{"Função": row["function"], "Chamadas": row["calls"],
+                  "Cumulativo (ms)": round(row["cumulative_s"] * 1000, 1), "Próprio (ms)": round(row["own_s"] * 1000, 1)}
+                 for row in summary["top"]],
+                hide_index=True, use_container_width=True,
+            )
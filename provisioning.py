@@ -0,0 +1,55 @@
+"""
+Hash de senhas para o provisionamento de usuários.
+
+O bcrypt é lento de propósito, então cadastrar muitos usuários de uma vez
+(importação do Planner, onboarding em lote) distribui os hashes num pool de
+processos com um worker por CPU. O custo do bcrypt vem de ``BCRYPT_ROUNDS``.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def needs_rehash(hashed: str, rounds: int = BCRYPT_ROUNDS) -> bool:
+    """True for legacy ``sha256$`` hashes and bcrypt hashes cheaper than ``rounds``."""
+    if not hashed.startswith("$2"):
+        return True
+    try:
+        return int(hashed.split("$")[2]) < rounds
+    except (IndexError, ValueError):
+        return True
+
+
+def hash_passwords(passwords, rounds=BCRYPT_ROUNDS, workers=HASH_WORKERS):
+    """Hash every password in ``passwords``, in order, one process per CPU.
+
+    A single password, or a single worker, is hashed inline without starting
+    a pool.
+    """
+    passwords = list(passwords)
+    workers = min(workers, len(passwords))
+    if workers <= 1:
+        return [hash_password(p, rounds) for p in passwords]
+    # spawn: forking a multi-threaded process (the Streamlit server) is unsafe
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(pool.map(hash_password, passwords, [rounds] * len(passwords), chunksize=chunksize))
+
+
+if __name__ == "__main__":
+    import sys, time
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    inicio = time.perf_counter()
+    hash_passwords([f"senha{i}" for i in range(n)])
+    dt = time.perf_counter() - inicio
+    print(f"✅ {n} hashes (custo {BCRYPT_ROUNDS}) em {dt:.1f}s com {min(HASH_WORKERS, n)} processo(s)")
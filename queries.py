@@ -0,0 +1,196 @@
+"""
+Consultas das telas de listagem.
+
+Todas carregam os relacionamentos exibidos pelas páginas de uma só vez
+(``joinedload``), de modo que renderizar N linhas não dispara N consultas
+extras.
+"""
+from sqlalchemy import String, and_, case, func, or_, select, tuple_, type_coerce
+from sqlalchemy.orm import joinedload
+from models import Project, Task
+from search import search_hits
+
+
+# Urgency rank for the Kanban columns: lower sorts first
+PRIORITY_RANK = {"Crítica": 0, "Alta": 1, "Média": 2, "Baixa": 3}
+
+
+def _filter_kanban(query, projeto_id=None, responsavel_ids=None):
+    if projeto_id:
+        query = query.filter(Task.projeto_id == projeto_id)
+    if responsavel_ids is not None:
+        query = query.filter(Task.responsavel_id.in_(responsavel_ids))
+    return query
+
+
+def kanban_counts(db, **filters):
+    """``{status: n}`` for the tasks matching the Kanban filters, in one query."""
+    rows = _filter_kanban(db.query(Task.status, func.count(Task.id)), **filters).group_by(Task.status).all()
+    return {status: n for status, n in rows}
+
+
+def kanban_column(db, status, now, limit, cursor=None, **filters):
+    """The ``limit`` most urgent tasks of one Kanban column, after ``cursor``.
+
+    Urgency is: overdue first, then priority, then the nearest ``prazo``
+    (tasks without a deadline last), with the id as tie-breaker. Keyset
+    pagination like ``project_page``: ``cursor`` is the ``next_cursor`` of
+    the previous page, taken with the same ``now``. Returns ``(tasks, next_cursor)``.
+    """
+    overdue = case((and_(Task.prazo < now, Task.status != "Concluído"), 0), else_=1)
+    prio = case(PRIORITY_RANK, value=Task.prioridade, else_=len(PRIORITY_RANK))
+    # Deadlines as stored text, so the cursor compares exactly like ORDER BY does
+    prazo = func.coalesce(type_coerce(Task.prazo, String), "9999-12-31")
+    query = _filter_kanban(
+        db.query(Task, overdue, prio, prazo).options(
+            joinedload(Task.responsavel_user),
+            joinedload(Task.projeto),
+        ),
+        **filters,
+    ).filter(Task.status == status)
+    if cursor is not None:
+        query = query.filter(tuple_(overdue, prio, prazo, Task.id) > tuple_(*cursor))
+    rows = query.order_by(overdue, prio, prazo, Task.id).limit(limit + 1).all()
+
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last, *key = page[-1]
+        next_cursor = (*key, last.id)
+    return [t for t, *_ in page], next_cursor
+
+
+def _search_hits(db, fts, search):
+    return search_hits(fts, search, db.get_bind().dialect.name)
+
+
+def _filter_projects(query, search=None, status=None, responsavel_id=None, atraso=None, now=None):
+    hits = _search_hits(query.session, "projects_fts", search)
+    if hits is not None:
+        query = query.filter(Project.id.in_(select(hits.c.id)))
+    if status:
+        query = query.filter(Project.status == status)
+    if responsavel_id:
+        query = query.filter(Project.responsavel_id == responsavel_id)
+    if atraso == "Com atraso":
+        query = query.filter(Project.earliest_open_prazo < now)
+    elif atraso == "Em dia":
+        query = query.filter(or_(Project.earliest_open_prazo.is_(None), Project.earliest_open_prazo >= now))
+    return query
+
+
+def count_projects(db, **filters):
+    return _filter_projects(db.query(func.count(Project.id)), **filters).scalar()
+
+
+def project_page(db, cursor=None, limit=20, search=None, **filters):
+    """One page of projects using keyset pagination.
+
+    Without ``search`` the order is newest first on (criado_em, id); with it,
+    best bm25 match first on (rank, id). ``cursor`` is the ``next_cursor`` of
+    the previous page (``None`` for the first page). Returns
+    ``(projects, next_cursor)``; ``next_cursor`` is ``None`` on the last page.
+    Task counts come from the Project counters, so the tasks table is not touched.
+    """
+    hits = _search_hits(db, "projects_fts", search)
+    if hits is None:
+        # The cursor keeps criado_em as stored text so it compares exactly like ORDER BY does.
+        sort_key = type_coerce(Project.criado_em, String)
+        query = db.query(Project, sort_key)
+        order_by = (Project.criado_em.desc(), Project.id.desc())
+        after = lambda c: tuple_(sort_key, Project.id) < tuple_(type_coerce(c[0], String), c[1])
+    else:
+        sort_key = hits.c.rank
+        query = db.query(Project, sort_key).join(hits, hits.c.id == Project.id)
+        order_by = (sort_key, Project.id)
+        after = lambda c: tuple_(sort_key, Project.id) > tuple_(*c)
+
+    query = _filter_projects(query.options(joinedload(Project.responsavel_user)), **filters)
+    if cursor is not None:
+        query = query.filter(after(cursor))
+    rows = query.order_by(*order_by).limit(limit + 1).all()
+
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last, last_key = page[-1]
+        next_cursor = (last_key, last.id)
+    return [p for p, _ in page], next_cursor
+
+
+def project_detail(db, project_id):
+    return (
+        db.query(Project)
+        .options(joinedload(Project.responsavel_user))
+        .filter(Project.id == project_id)
+        .first()
+    )
+
+
+def project_tasks(db, project_id):
+    """Every task of one project, for its checklist."""
+    return (
+        db.query(Task)
+        .options(joinedload(Task.responsavel_user))
+        .filter(Task.projeto_id == project_id)
+        .all()
+    )
+
+
+def task_detail(db, task_id):
+    return (
+        db.query(Task)
+        .options(joinedload(Task.responsavel_user))
+        .filter(Task.id == task_id)
+        .first()
+    )
+
+
+def _filter_tasks(query, projeto_id=None, status=None, prioridade=None):
+    if projeto_id:
+        query = query.filter(Task.projeto_id == projeto_id)
+    if status:
+        query = query.filter(Task.status == status)
+    if prioridade:
+        query = query.filter(Task.prioridade == prioridade)
+    return query
+
+
+def count_tasks(db, search=None, **filters):
+    query = db.query(func.count(Task.id))
+    hits = _search_hits(db, "tasks_fts", search)
+    if hits is not None:
+        query = query.filter(Task.id.in_(select(hits.c.id)))
+    return _filter_tasks(query, **filters).scalar()
+
+
+def task_page(db, cursor=None, limit=20, search=None, **filters):
+    """One page of tasks using keyset pagination, like ``project_page``.
+
+    Without ``search`` the order is newest first on (data_criacao, id); with
+    it, best bm25 match first on (rank, id). Returns ``(tasks, next_cursor)``.
+    """
+    hits = _search_hits(db, "tasks_fts", search)
+    if hits is None:
+        sort_key = type_coerce(Task.data_criacao, String)
+        query = db.query(Task, sort_key)
+        order_by = (Task.data_criacao.desc(), Task.id.desc())
+        after = lambda c: tuple_(sort_key, Task.id) < tuple_(type_coerce(c[0], String), c[1])
+    else:
+        sort_key = hits.c.rank
+        query = db.query(Task, sort_key).join(hits, hits.c.id == Task.id)
+        order_by = (sort_key, Task.id)
+        after = lambda c: tuple_(sort_key, Task.id) > tuple_(*c)
+
+    query = _filter_tasks(
+        query.options(joinedload(Task.responsavel_user), joinedload(Task.projeto)), **filters)
+    if cursor is not None:
+        query = query.filter(after(cursor))
+    rows = query.order_by(*order_by).limit(limit + 1).all()
+
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last, last_key = page[-1]
+        next_cursor = (last_key, last.id)
+    return [t for t, _ in page], next_cursor
@@ -0,0 +1,123 @@
+"""
+Read models compartilhados entre sessões e reruns do Streamlit.
+
+Os valores ficam num cache LRU de processo (``st.cache_resource``) limitado
+por orçamento de memória e são invalidados pela revisão global de dados
+(``database.data_revision``), incrementada a cada commit com escrita deste
+processo e pelo ``PRAGMA data_version`` do SQLite, que muda quando outro
+processo (o importador, outro servidor do app) grava no mesmo arquivo.
+"""
+import functools
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from aggregates import dashboard_stats
+import metrics
+from database import get_db, data_revision
+from models import Project, User
+
+READ_CACHE_MB = float(os.environ.get("READ_CACHE_MB", "64"))
+
+
+class ReadModelCache:
+    """LRU of pickled values bounded by ``max_bytes``."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (revision, payload)
+        self._lock = threading.Lock()
+
+    def get(self, key, revision):
+        """Return ``(hit, value)``; entries from an older revision are misses."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != revision:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            payload = entry[1]
+        return True, pickle.loads(payload)
+
+    def put(self, key, revision, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._entries[key] = (revision, payload)
+            self.size += len(payload)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            }
+
+
+@st.cache_resource
+def read_cache():
+    return metrics.watch_cache("read_models", ReadModelCache(int(READ_CACHE_MB * 1024 * 1024)))
+
+
+def read_model(fn):
+    """Cache ``fn(db, *args)`` by name, arguments and data revision.
+
+    Callers receive a private copy of the value and may mutate it freely.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args):
+        revision = data_revision()
+        key = (fn.__name__, args)
+        cache = read_cache()
+        hit, value = cache.get(key, revision)
+        if hit:
+            return value
+        db = get_db()
+        try:
+            value = fn(db, *args)
+        finally:
+            db.close()
+        cache.put(key, revision, value)
+        return value
+    return wrapper
+
+
+# ── Read models ───────────────────────────────────────────────────────────────
+
+@read_model
+def dashboard(db, now):
+    """Dashboard aggregates; pass ``now`` truncated to the minute."""
+    return dashboard_stats(db, now)
+
+
+@read_model
+def user_options(db):
+    """``[(id, nome)]`` of every user, ordered by name."""
+    return [tuple(r) for r in db.query(User.id, User.nome).order_by(User.nome).all()]
+
+
+@read_model
+def project_options(db):
+    """``[(id, nome, status)]`` of every project, ordered by name."""
+    return [tuple(r) for r in db.query(Project.id, Project.nome, Project.status).order_by(Project.nome).all()]
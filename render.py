@@ -0,0 +1,141 @@
+"""
+Montagem do HTML das listas (colunas do Kanban, cards de projetos, tarefas).
+
+Cada lista é enviada ao navegador como um único ``st.markdown``: os cards são
+gerados a partir de templates compilados na importação do módulo e
+concatenados, em vez de um elemento por card.
+
+O HTML de cada card fica num cache LRU de processo com até
+``CARD_CACHE_SIZE`` entradas, chaveado pela versão da linha e pelo dia de
+hoje; cards sem alteração não são formatados de novo.
+
+``conflict_warning`` mostra os valores atuais de um projeto ou tarefa quando
+uma edição perde para a de outra pessoa (ver ``commands.Conflict``).
+"""
+import html
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import streamlit as st
+
+import metrics
+
+CARD_CACHE_SIZE = int(os.environ.get("CARD_CACHE_SIZE", "20000"))
+
+_SPACES = re.compile(r"\s+")
+
+
+def template(source):
+    """Compile an HTML template for ``str.format``: one line, no indentation.
+
+    Markdown would end the HTML block at a blank line and turn indented lines
+    into code, so the joined cards must not contain either.
+    """
+    return _SPACES.sub(" ", source.strip())
+
+
+def esc(value):
+    """User text escaped for an HTML template."""
+    return html.escape(str(value), quote=True)
+
+
+class CardCache:
+    """LRU of rendered card HTML bounded by ``max_entries``."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # (entity, id, version, day) -> html
+        self._lock = threading.Lock()
+
+    def card(self, entity, row_id, version, render, *args):
+        """HTML of one card, calling ``render(*args)`` only on a miss.
+
+        ``version`` must change whenever anything the card shows changes:
+        ``atualizado_em`` plus whatever comes from joined rows or triggers.
+        The day is part of the key because "overdue" and "N dias" depend on it.
+        """
+        key = (entity, row_id, version, date.today())
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        rendered = render(*args)
+        with self._lock:
+            self._entries[key] = rendered
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return rendered
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            }
+
+
+@st.cache_resource
+def card_cache():
+    return metrics.watch_cache("cards", CardCache(CARD_CACHE_SIZE))
+
+
+PROJECT_FIELDS = {
+    "nome": "Nome", "status": "Status", "responsavel": "Responsável", "data_inicio": "Início",
+    "data_fim": "Conclusão", "progresso": "Progresso (%)", "descricao": "Descrição",
+}
+TASK_FIELDS = {
+    "titulo": "Título", "status": "Status", "prioridade": "Prioridade",
+    "responsavel": "Responsável", "prazo": "Prazo", "descricao": "Descrição",
+}
+
+
+def row_values(row, fields):
+    """``{field: value}`` of an ORM row; ``responsavel`` is the user's name."""
+    user = row.responsavel_user
+    return {f: (user.nome if user else None) if f == "responsavel" else getattr(row, f) for f in fields}
+
+
+def _cell(value):
+    if value is None or value == "":
+        return "—"
+    if isinstance(value, date):
+        return value.strftime("%d/%m/%Y")
+    if isinstance(value, float):
+        return f"{value:.0f}"
+    text = " ".join(str(value).split()).replace("|", "\\|")
+    return (text[:120] + "...") if len(text) > 120 else text
+
+
+def conflict_warning(message, fields, current, yours=None):
+    """Warn that an edit lost to someone else's, listing the current values next to the user's.
+
+    ``current`` and ``yours`` map field names to values (``row_values``);
+    ``current`` is None when the row was deleted meanwhile.
+    """
+    if current is None:
+        st.warning(f"{message} O registro foi excluído por outra pessoa.")
+        return
+    yours = yours or {}
+    lines = ["| Campo | Valor atual | Sua edição |", "|---|---|---|"]
+    for name, label in fields.items():
+        atual = _cell(current.get(name))
+        mine = _cell(yours[name]) if name in yours else ""
+        if mine and mine != atual:
+            mine = f"**{mine}**"
+        lines.append(f"| {label} | {atual} | {mine} |")
+    st.warning(f"{message} Outra pessoa alterou antes; nada foi sobrescrito. Valores atuais:")
+    st.markdown("\n".join(lines))
@@ -0,0 +1,146 @@
+"""
+Busca textual com SQLite FTS5 sobre projetos (nome, descrição) e tarefas
+(título, descrição).
+
+As tabelas ``projects_fts`` e ``tasks_fts`` são de conteúdo externo: guardam
+só o índice, mantido por triggers a cada INSERT, UPDATE e DELETE. O
+tokenizador ignora acentos ("validacao" encontra "Validação") e os
+resultados são ordenados por bm25, com peso maior para o nome/título.
+
+Em outros bancos (``DATABASE_URL`` de servidor) não há FTS5: a busca cai
+para ``ILIKE`` palavra a palavra, sem ranking por bm25 e sem ignorar
+acentos; os resultados que casam no nome/título vêm primeiro.
+
+Para reconstruir os índices:
+    python search.py
+"""
+import re
+from sqlalchemy import and_, case, column, func, literal_column, or_, select, table, text
+
+TOKENIZE = "unicode61 remove_diacritics 2"
+
+# tabela FTS -> (tabela de conteúdo, colunas indexadas, pesos bm25)
+FTS_TABLES = {
+    "projects_fts": ("projects", ("nome", "descricao"), (10.0, 1.0)),
+    "tasks_fts": ("tasks", ("titulo", "descricao"), (10.0, 1.0)),
+}
+
+_WORD = re.compile(r"\w+")
+
+
+def _ddl(fts, content, cols):
+    col_list = ", ".join(cols)
+    new_vals = ", ".join(f"NEW.{c}" for c in cols)
+    old_vals = ", ".join(f"OLD.{c}" for c in cols)
+    delete_old = (f"INSERT INTO {fts}({fts}, rowid, {col_list}) "
+                  f"VALUES ('delete', OLD.id, {old_vals});")
+    insert_new = f"INSERT INTO {fts}(rowid, {col_list}) VALUES (NEW.id, {new_vals});"
+    return {
+        fts: f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {col_list}, content='{content}', content_rowid='id',
+            tokenize='{TOKENIZE}', prefix='2 3'
+        )""",
+        f"{fts}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {content}
+        BEGIN {insert_new} END""",
+        f"{fts}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {content}
+        BEGIN {delete_old} END""",
+        f"{fts}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {col_list} ON {content}
+        BEGIN {delete_old} {insert_new} END""",
+    }
+
+
+def trigger_ddl():
+    """``{name: CREATE TRIGGER ...}`` of every FTS sync trigger."""
+    return {name: ddl for fts, (content, cols, _) in FTS_TABLES.items()
+            for name, ddl in _ddl(fts, content, cols).items() if name != fts}
+
+
+REBUILD_SQL = [f"INSERT INTO {fts}({fts}) VALUES ('rebuild')" for fts in FTS_TABLES]
+
+
+def install_search(conn):
+    """Create the FTS tables and their triggers if missing, indexing existing rows."""
+    if conn.dialect.name != "sqlite":
+        return
+    existing = {r[0] for r in conn.execute(text("SELECT name FROM sqlite_master"))}
+    for fts, (content, cols, _) in FTS_TABLES.items():
+        created = fts not in existing
+        for name, ddl in _ddl(fts, content, cols).items():
+            if name not in existing:
+                conn.execute(text(ddl))
+        if created:
+            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def rebuild_search(conn):
+    """Re-index every FTS table from its content table."""
+    for sql in REBUILD_SQL:
+        conn.execute(text(sql))
+
+
+def match_query(termo):
+    """FTS5 MATCH expression for what the user typed, or ``None`` if it has no words.
+
+    Every word must match as a prefix. A word made only of digits also matches
+    HRC codes, so "1368189" finds "[HRC1368189]".
+    """
+    terms = []
+    for word in _WORD.findall(termo or ""):
+        term = f'"{word}"*'
+        if word.isdigit():
+            term = f'({term} OR "hrc{word}"*)'
+        terms.append(term)
+    return " AND ".join(terms) or None
+
+
+def search_hits(fts, termo, dialect="sqlite"):
+    """Subquery of ``(id, rank)`` matching ``termo`` in ``fts``; lower rank is better.
+
+    Returns ``None`` when there is nothing to search for. ``dialect`` is the
+    database's; other than SQLite it searches with ``like_hits``.
+    """
+    if dialect != "sqlite":
+        return like_hits(fts, termo)
+    expr = match_query(termo)
+    if expr is None:
+        return None
+    weights = FTS_TABLES[fts][2]
+    fts_table = literal_column(fts)
+    return (
+        select(
+            table(fts, column("rowid")).c.rowid.label("id"),
+            func.bm25(fts_table, *weights).label("rank"),
+        )
+        .where(fts_table.op("MATCH")(expr))
+        .subquery(f"{fts}_hits")
+    )
+
+
+def like_hits(fts, termo):
+    """``search_hits`` without FTS5: every word as a case-insensitive substring.
+
+    Rank 0 when the first (heaviest) column has every word, else 1.
+    """
+    words = _WORD.findall(termo or "")
+    if not words:
+        return None
+    content, cols, _ = FTS_TABLES[fts]
+    t = table(content, column("id"), *(column(c) for c in cols))
+    in_first = and_(*(t.c[cols[0]].ilike(f"%{w}%") for w in words))
+    return (
+        select(t.c.id, case((in_first, 0), else_=1).label("rank"))
+        .where(and_(*(or_(*(t.c[c].ilike(f"%{w}%") for c in cols)) for w in words)))
+        .subquery(f"{fts}_hits")
+    )
+
+
+if __name__ == "__main__":
+    from database import engine
+    with engine.begin() as conn:
+        install_search(conn)
+        rebuild_search(conn)
+    print("✅ Índices de busca reconstruídos")
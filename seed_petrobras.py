@@ -2,15 +2,43 @@
 Script para importar todos os projetos da planilha Petrobras_Senai_EaD.xlsx
 para o banco de dados do ProjectFlow.
 
+A importação é incremental: cada linha da aba Tarefas vira um projeto
+identificado por uma chave estável (ID da tarefa no Planner ou, na falta
+dele, nome + bucket). Linhas que não mudaram desde a última execução são
+ignoradas, as alteradas são atualizadas no lugar (mantendo os IDs) e as que
+sumiram da planilha são removidas. A planilha é lida em streaming e tudo é
+gravado numa única transação, então o app nunca vê o banco pela metade; as
+senhas dos usuários novos são calculadas depois do commit e gravadas numa
+segunda transação curta, para o bcrypt não segurar o lock de escrita.
+
 Execute DENTRO da pasta project_manager:
-    python seed_petrobras.py
+    python seed_petrobras.py [planilha.xlsx]
 """
-import sqlite3, os, unicodedata, pandas as pd
+import hashlib, os, sqlite3, sys, time, unicodedata
 from datetime import datetime
+from openpyxl import load_workbook
+# Without DATABASE_URL, import into the project_manager.db next to this script, wherever it is run from
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(os.path.dirname(os.path.abspath(__file__)), "project_manager.db"))
+from database import engine, ensure_schema
+from counters import REPAIR_SQL, TRIGGERS as COUNTER_TRIGGERS
+from search import REBUILD_SQL, trigger_ddl
+from provisioning import hash_passwords
 
-DB_PATH   = os.path.join(os.path.dirname(os.path.abspath(__file__)), "project_manager.db")
+DB_PATH   = engine.url.database
 EXCEL_SRC = '/mnt/user-data/uploads/Petrobras_-_Senai_EaD.xlsx'
 EXCEL_LOCAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Petrobras_-_Senai_EaD.xlsx")
+SHEET = "Tarefas"
+BATCH = 2000
+# Above this many new/changed/removed rows the per-row triggers are suspended and rebuilt once at the end
+BULK_ROWS = 2000
+
+PEOPLE_COLUMNS = ['Criado por','Atribuído a','Concluída por']
+COLUMNS = [
+    'Identificação da tarefa','Nome da tarefa','Nome do Bucket','Progresso','Prioridade',
+    'Atribuído a','Criado por','Concluída por','Descrição','Rótulos',
+    'Itens da lista de verificação','Itens concluídos da lista de verificação',
+    'Criado em','Data de início','Data de conclusão',
+]
 
 BUCKET_STATUS = {
     "PELD":"Ativo","pré-medição":"Ativo",
@@ -45,8 +73,18 @@ CORES = {
 LIDERANCAS = {"Angelo Jorge De Almeida Chafin","Fabiana Cristina Goncalves Ribeiro",
               "Mariana Ribeiro Gonçalves Rodrigues","Fatima Satsuki De Araujo Iino"}
 
+INSERT_PROJECT = """INSERT INTO projects(id,planner_key,import_hash,nome,descricao,responsavel_id,
+    data_inicio,data_fim,status,progresso,criado_em,atualizado_em) VALUES(?,?,?,?,?,?,?,?,?,?,?,?)"""
+UPDATE_PROJECT = """UPDATE projects SET planner_key=?,import_hash=?,nome=?,descricao=?,responsavel_id=?,
+    data_inicio=?,data_fim=?,status=?,progresso=?,atualizado_em=?,version=version+1 WHERE id=?"""
+INSERT_TASK = """INSERT INTO tasks(id,planner_key,titulo,descricao,projeto_id,responsavel_id,
+    status,prioridade,prazo,data_criacao,atualizado_em) VALUES(?,?,?,?,?,?,?,?,?,?,?)"""
+UPDATE_TASK = """UPDATE tasks SET planner_key=?,titulo=?,descricao=?,projeto_id=?,responsavel_id=?,
+    status=?,prioridade=?,prazo=?,atualizado_em=?,version=version+1 WHERE id=?"""
+
 def parse_date(v):
     if v is None: return None
+    if isinstance(v, datetime): return v.strftime("%Y-%m-%d %H:%M:%S")
     s = str(v).strip()
     if s in ("","NaN","nan","None","<NA>"): return None
     for fmt in ("%d/%m/%Y","%Y-%m-%d","%d-%m-%Y"):
@@ -54,181 +92,277 @@ def parse_date(v):
         except: pass
     return None
 
+def txt(v):
+    s = "" if v is None else str(v).strip()
+    return "" if s in ("nan","NaN","None") else s
+
 def slug(name):
     nfkd = unicodedata.normalize('NFKD', name.lower())
     return ''.join(c for c in nfkd if not unicodedata.combining(c)).replace(' ','.')
 
-def hash_pw(pw):
+def read_rows(path, columns):
+    """Stream the Tarefas sheet as dicts holding only ``columns`` (absent ones read as None)."""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb[SHEET].iter_rows(values_only=True)
+        header = [txt(h) for h in next(rows, ())]
+        idx = [(c, header.index(c)) for c in columns if c in header]
+        for values in rows:
+            yield {c: values[i] if i < len(values) else None for c, i in idx}
+    finally:
+        wb.close()
+
+class UserDirectory:
+    """Users by name. New ones are inserted as they appear; ``save_passwords`` hashes them.
+
+    New users are saved with an empty hash (no login possible) and get their
+    password after the import commits, so bcrypt never runs under the write lock.
+    """
+
+    def __init__(self, conn, now):
+        self.conn, self.now = conn, now
+        self.ids = {}
+        for uid, nome in conn.execute("SELECT id, nome FROM users ORDER BY id"):
+            self.ids.setdefault(nome, uid)
+        self.emails = {r[0] for r in conn.execute("SELECT email FROM users")}
+        self.pending = []  # (user id, senha)
+
+    def create(self, nome, email, senha, role, cor):
+        cur = self.conn.execute("INSERT INTO users(nome,email,senha_hash,role,avatar_color,criado_em) VALUES(?,?,'',?,?,?)",
+                                (nome,email,role,cor,self.now))
+        self.ids.setdefault(nome, cur.lastrowid); self.emails.add(email)
+        self.pending.append((cur.lastrowid, senha))
+
+    def ensure_demo(self):
+        for nome,email,senha,role,cor in [
+            ("Admin Sistema","admin@demo.com","admin123","admin","#6366f1"),
+            ("Maria Gestora","gestor@demo.com","gestor123","gestor","#10b981"),
+            ("João Colaborador","colab@demo.com","colab123","colaborador","#f59e0b"),
+        ]:
+            if email not in self.emails:
+                self.create(nome,email,senha,role,cor)
+
+    def ensure(self, nome):
+        if nome in self.ids: return
+        email = f"{slug(nome)[:45]}@petrobras.senai.br"; n=1
+        while email in self.emails:
+            email = f"{slug(nome)[:40]}{n}@petrobras.senai.br"; n+=1
+        role = "gestor" if nome in LIDERANCAS else "colaborador"
+        self.create(nome,email,"senai@2025",role,CORES.get(nome,"#6366f1"))
+
+    def save_passwords(self):
+        """Hash the new users' passwords outside any transaction, then store them in a short one."""
+        if not self.pending: return 0
+        hashes = hash_passwords(senha for _, senha in self.pending)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany("UPDATE users SET senha_hash=? WHERE id=? AND senha_hash=''",
+                                  [(h, uid) for (uid, _), h in zip(self.pending, hashes)])
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return len(self.pending)
+
+def suspend_triggers(conn):
+    """Drop the counter and search triggers for a bulk load (inside the import transaction)."""
+    for name in [*COUNTER_TRIGGERS, *trigger_ddl()]:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+def restore_triggers(conn):
+    """Recreate the triggers and redo in one pass what they would have done row by row."""
+    for ddl in [*COUNTER_TRIGGERS.values(), *trigger_ddl().values()]:
+        conn.execute(ddl)
+    conn.execute(REPAIR_SQL)
+    for sql in REBUILD_SQL:
+        conn.execute(sql)
+
+def row_hash(row):
+    raw = "\x1f".join(txt(row.get(c)) for c in COLUMNS)
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+def build_project(row, uid_map, now):
+    """Turn one sheet row into ``(project_values, tasks)``.
+
+    ``tasks`` is a list of ``(suffix, values)``; the suffix makes the task key.
+    """
+    nome_proj = txt(row.get('Nome da tarefa'))
+    bucket  = txt(row.get('Nome do Bucket'))
+    prog_s  = txt(row.get('Progresso')) or 'Não iniciado'
+    prio_r  = txt(row.get('Prioridade')) or 'Média'
+    atr     = txt(row.get('Atribuído a'))
+    criador = txt(row.get('Criado por'))
+    desc_r  = txt(row.get('Descrição'))
+    rotulos = txt(row.get('Rótulos'))
+    check   = txt(row.get('Itens da lista de verificação'))
+    ic      = txt(row.get('Itens concluídos da lista de verificação'))
+
+    dc = parse_date(row.get('Criado em'))
+    di = parse_date(row.get('Data de início'))
+    df_= parse_date(row.get('Data de conclusão'))
+
+    st_proj = BUCKET_STATUS.get(bucket,"Ativo")
+    pct     = PROG_PCT.get(prog_s,0.0)
+    t_st    = PROG_TASK.get(prog_s,"A Fazer")
+    if prog_s=="Concluída": st_proj="Concluído"; pct=100.0
+    prio = PRIO_MAP.get(prio_r,"Média")
+
+    # Responsável
+    pessoas=[p.strip() for p in atr.split(';') if p.strip() and p.strip()!='nan']
+    resp_id = uid_map.get(pessoas[0]) if pessoas else uid_map.get(criador)
+
+    # Descrição
+    partes=[]
+    if desc_r: partes.append(desc_r.replace('\\n','\n'))
+    if rotulos: partes.append(f"Rótulos: {rotulos}")
+    if bucket: partes.append(f"Fase: {bucket}")
+    desc = "\n\n".join(partes)[:2000]
+
+    project = (nome_proj,desc,resp_id,di or dc,df_,st_proj,pct,dc or now)
+
+    # Itens concluídos
+    n_conc=0
+    if '/' in ic:
+        try: n_conc=int(ic.split('/')[0].strip())
+        except: pass
+
+    tasks=[]
+    etapas=[e.strip() for e in check.split(';') if e.strip() and e.strip()!='nan']
+    for i,etapa in enumerate(etapas):
+        prazo_e=None; titulo_e=etapa
+        if ' - ' in etapa:
+            p2=etapa.split(' - ',1)
+            dp=p2[0].strip()
+            if len(dp)<=6 and '/' in dp:
+                try:
+                    d,m=dp.split('/')
+                    ano="2026" if int(m)<=6 else "2025"
+                    prazo_e=f"{ano}-{int(m):02d}-{int(d):02d} 00:00:00"
+                    titulo_e=p2[1].strip()
+                except: pass
+        s_e="Concluído" if (i<n_conc or t_st=="Concluído") else ("Em Andamento" if (t_st=="Em Andamento" and i==n_conc) else "A Fazer")
+        rid_e=uid_map.get(pessoas[i%len(pessoas)]) if pessoas else resp_id
+        tasks.append((f"etapa{i}", (titulo_e[:200],f"Etapa: {nome_proj[:100]}",rid_e,s_e,prio,prazo_e or df_,dc or now)))
+    if not etapas:
+        tasks.append(("execucao", (f"Execução: {nome_proj[:180]}",desc[:500],resp_id,t_st,prio,df_,dc or now)))
+    return project, tasks
+
+def import_sheet(conn, path, now):
+    """Upsert every sheet row in a single transaction; return the counts per outcome."""
+    ct = {"novos":0,"alterados":0,"iguais":0,"removidos":0,"usuarios":0}
+    conn.execute("PRAGMA foreign_keys=ON")  # removed projects take their tasks along; no-op inside a transaction
+    conn.execute("BEGIN IMMEDIATE")
     try:
-        import bcrypt
-        return bcrypt.hashpw(pw.encode(), bcrypt.gensalt()).decode()
-    except:
-        import hashlib, secrets
-        salt = secrets.token_hex(16)
-        h = hashlib.sha256((salt+pw).encode()).hexdigest()
-        return f"sha256${salt}${h}"
+        users = UserDirectory(conn, now)
+        users.ensure_demo()
+        projects = {k:(pid,h) for pid,k,h in conn.execute(
+            "SELECT id, planner_key, import_hash FROM projects WHERE planner_key IS NOT NULL")}
+        task_keys = {}  # projeto_id -> {planner_key: task id}
+        for tid,k,pid in conn.execute("SELECT id, planner_key, projeto_id FROM tasks WHERE planner_key IS NOT NULL"):
+            task_keys.setdefault(pid,{})[k]=tid
+        # Projects from imports made before the stable keys, adopted by name on the first run
+        legacy = {}
+        for pid,nome in conn.execute("SELECT id, nome FROM projects WHERE planner_key IS NULL ORDER BY id"):
+            legacy.setdefault(nome,[]).append(pid)
+        next_pid = conn.execute("SELECT COALESCE(MAX(id),0)+1 FROM projects").fetchone()[0]
+        next_tid = conn.execute("SELECT COALESCE(MAX(id),0)+1 FROM tasks").fetchone()[0]
+
+        pending = {INSERT_PROJECT:[],UPDATE_PROJECT:[],INSERT_TASK:[],UPDATE_TASK:[],"DELETE FROM tasks WHERE id=?":[]}
+        def flush():
+            for sql, params in pending.items():  # projects before the tasks that reference them
+                if params: conn.executemany(sql, params); params.clear()
+
+        seen=set(); occurrences={}; n_rows=0; bulk=False
+        for row in read_rows(path, COLUMNS):
+            for col in PEOPLE_COLUMNS:
+                for p in txt(row.get(col)).split(';'):
+                    p = p.strip()
+                    if p and p != 'nan': users.ensure(p)
+            nome_proj = txt(row.get('Nome da tarefa'))
+            if not nome_proj: continue
+            n_rows+=1
+
+            key = txt(row.get('Identificação da tarefa')) or f"{nome_proj}|{txt(row.get('Nome do Bucket'))}"
+            occurrences[key] = occurrences.get(key,0)+1
+            if occurrences[key] > 1: key = f"{key}#{occurrences[key]}"
+            seen.add(key)
+
+            h = row_hash(row)
+            current = projects.get(key)
+            if current is not None and current[1] == h:
+                ct["iguais"]+=1; continue
+
+            project, tasks = build_project(row, users.ids, now)
+            existing = {}
+            if current is not None:
+                pid = current[0]; existing = task_keys.get(pid,{}); ct["alterados"]+=1
+                pending[UPDATE_PROJECT].append((key,h,*project[:-1],now,pid))
+            elif legacy.get(nome_proj):
+                pid = legacy[nome_proj].pop(0); ct["alterados"]+=1
+                pending[UPDATE_PROJECT].append((key,h,*project[:-1],now,pid))
+                # Claim the old import's tasks by title so their IDs survive
+                titulos = {}
+                for suffix,(titulo,*_) in tasks: titulos.setdefault(titulo,[]).append(f"{key}#{suffix}")
+                for tid,titulo in conn.execute("SELECT id, titulo FROM tasks WHERE projeto_id=? AND planner_key IS NULL ORDER BY id",(pid,)):
+                    if titulos.get(titulo): existing[titulos[titulo].pop(0)]=tid
+            else:
+                pid = next_pid; next_pid+=1; ct["novos"]+=1
+                pending[INSERT_PROJECT].append((pid,key,h,*project,now))
+
+            for suffix,(titulo,descricao,rid,status,prio,prazo,criado) in tasks:
+                tkey = f"{key}#{suffix}"
+                tid = existing.pop(tkey, None)
+                if tid is None:
+                    pending[INSERT_TASK].append((next_tid,tkey,titulo,descricao,pid,rid,status,prio,prazo,criado,now)); next_tid+=1
+                else:
+                    pending[UPDATE_TASK].append((tkey,titulo,descricao,pid,rid,status,prio,prazo,now,tid))
+            pending["DELETE FROM tasks WHERE id=?"].extend((tid,) for tid in existing.values())
+
+            if not bulk and ct["novos"]+ct["alterados"] > BULK_ROWS:
+                flush(); suspend_triggers(conn); bulk=True
+            if sum(map(len, pending.values())) >= BATCH: flush()
+            if n_rows % 5000 == 0: print(f"   ✅ {n_rows} linhas...")
+        flush()
+
+        if not seen:
+            raise RuntimeError("nenhuma linha válida na planilha; nada foi alterado")
+        removidos = [(pid,) for k,(pid,_) in projects.items() if k not in seen]
+        if not bulk and len(removidos) > BULK_ROWS:
+            suspend_triggers(conn); bulk=True
+        conn.executemany("DELETE FROM projects WHERE id=?", removidos)  # tasks go by ON DELETE CASCADE
+        if bulk: restore_triggers(conn)
+        ct["removidos"] = len(removidos)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    ct["usuarios"] = users.save_passwords()
+    return ct
 
 def main():
-    excel = EXCEL_SRC if os.path.exists(EXCEL_SRC) else EXCEL_LOCAL
+    excel = sys.argv[1] if len(sys.argv) > 1 else (EXCEL_SRC if os.path.exists(EXCEL_SRC) else EXCEL_LOCAL)
     if not os.path.exists(excel):
         print(f"❌ Arquivo Excel não encontrado: {excel}"); return
 
-    print("📊 Lendo planilha...")
-    df = pd.read_excel(excel, sheet_name='Tarefas', header=0)
-    print(f"   {len(df)} registros")
-
-    conn = sqlite3.connect(DB_PATH)
+    inicio = time.perf_counter()
+    ensure_schema()
+    conn = sqlite3.connect(DB_PATH, isolation_level=None, timeout=60)
     conn.execute("PRAGMA journal_mode=WAL")
-    cur = conn.cursor()
-
-    # Criar tabelas
-    cur.executescript("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL,
-        email TEXT UNIQUE NOT NULL, senha_hash TEXT NOT NULL,
-        role TEXT DEFAULT 'colaborador', avatar_color TEXT DEFAULT '#6366f1',
-        criado_em TEXT);
-    CREATE TABLE IF NOT EXISTS projects (
-        id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL,
-        descricao TEXT, responsavel_id INTEGER, data_inicio TEXT,
-        data_fim TEXT, status TEXT DEFAULT 'Planejamento',
-        progresso REAL DEFAULT 0.0, criado_em TEXT, atualizado_em TEXT);
-    CREATE TABLE IF NOT EXISTS tasks (
-        id INTEGER PRIMARY KEY AUTOINCREMENT, titulo TEXT NOT NULL,
-        descricao TEXT, projeto_id INTEGER, responsavel_id INTEGER,
-        status TEXT DEFAULT 'A Fazer', prioridade TEXT DEFAULT 'Média',
-        prazo TEXT, data_criacao TEXT, atualizado_em TEXT);
-    """)
-
-    # Usuários demo
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    for nome,email,senha,role,cor in [
-        ("Admin Sistema","admin@demo.com","admin123","admin","#6366f1"),
-        ("Maria Gestora","gestor@demo.com","gestor123","gestor","#10b981"),
-        ("João Colaborador","colab@demo.com","colab123","colaborador","#f59e0b"),
-    ]:
-        if not cur.execute("SELECT id FROM users WHERE email=?",(email,)).fetchone():
-            cur.execute("INSERT INTO users(nome,email,senha_hash,role,avatar_color,criado_em) VALUES(?,?,?,?,?,?)",
-                        (nome,email,hash_pw(senha),role,cor,now))
-
-    # Limpar projetos/tarefas
-    cur.execute("DELETE FROM tasks"); cur.execute("DELETE FROM projects")
-    conn.commit()
-
-    # Coletar todos os nomes
-    nomes = set()
-    for col in ['Criado por','Atribuído a','Concluída por']:
-        for v in df[col].dropna():
-            for p in str(v).split(';'):
-                p=p.strip()
-                if p and p!='nan': nomes.add(p)
-
-    uid_map = {}
-    emails_usados = set(r[0] for r in cur.execute("SELECT email FROM users").fetchall())
-    for nome in sorted(nomes):
-        row = cur.execute("SELECT id FROM users WHERE nome=?",(nome,)).fetchone()
-        if row:
-            uid_map[nome]=row[0]; continue
-        email_base = f"{slug(nome)[:45]}@petrobras.senai.br"
-        email = email_base; n=1
-        while email in emails_usados:
-            email = f"{slug(nome)[:40]}{n}@petrobras.senai.br"; n+=1
-        emails_usados.add(email)
-        role = "gestor" if nome in LIDERANCAS else "colaborador"
-        cur.execute("INSERT INTO users(nome,email,senha_hash,role,avatar_color,criado_em) VALUES(?,?,?,?,?,?)",
-                    (nome,email,hash_pw("senai@2025"),role,CORES.get(nome,"#6366f1"),now))
-        uid_map[nome]=cur.lastrowid
-    conn.commit()
-    print(f"👥 {len(uid_map)} colaboradores criados")
-
-    # Inserir projetos
-    proj_ct=0; task_ct=0
-    for _,row in df.iterrows():
-        nome_proj = str(row.get('Nome da tarefa','')).strip()
-        if not nome_proj or nome_proj=='nan': continue
-
-        bucket  = str(row.get('Nome do Bucket','')).strip()
-        prog_s  = str(row.get('Progresso','Não iniciado')).strip()
-        prio_r  = str(row.get('Prioridade','Média')).strip()
-        atr     = str(row.get('Atribuído a','')).strip()
-        criador = str(row.get('Criado por','')).strip()
-        desc_r  = str(row.get('Descrição','')).strip()
-        rotulos = str(row.get('Rótulos','')).strip()
-        check   = str(row.get('Itens da lista de verificação','')).strip()
-        ic      = str(row.get('Itens concluídos da lista de verificação','')).strip()
-
-        dc = parse_date(row.get('Criado em'))
-        di = parse_date(row.get('Data de início'))
-        df_= parse_date(row.get('Data de conclusão'))
-
-        st_proj = BUCKET_STATUS.get(bucket,"Ativo")
-        pct     = PROG_PCT.get(prog_s,0.0)
-        t_st    = PROG_TASK.get(prog_s,"A Fazer")
-        if prog_s=="Concluída": st_proj="Concluído"; pct=100.0
-        prio = PRIO_MAP.get(prio_r,"Média")
-
-        # Responsável
-        pessoas=[]
-        if atr and atr!='nan':
-            pessoas=[p.strip() for p in atr.split(';') if p.strip() and p.strip()!='nan']
-        resp_id = uid_map.get(pessoas[0]) if pessoas else uid_map.get(criador)
-
-        # Descrição
-        partes=[]
-        if desc_r and desc_r!='nan': partes.append(desc_r.replace('\\n','\n'))
-        if rotulos and rotulos!='nan': partes.append(f"Rótulos: {rotulos}")
-        if bucket: partes.append(f"Fase: {bucket}")
-        desc = "\n\n".join(partes)[:2000]
-
-        cur.execute("""INSERT INTO projects(nome,descricao,responsavel_id,data_inicio,data_fim,
-                       status,progresso,criado_em,atualizado_em) VALUES(?,?,?,?,?,?,?,?,?)""",
-                    (nome_proj,desc,resp_id,di or dc,df_,st_proj,pct,dc or now,now))
-        pid=cur.lastrowid; proj_ct+=1
-
-        # Itens concluídos
-        n_conc=0
-        if ic and ic!='nan' and '/' in ic:
-            try: n_conc=int(ic.split('/')[0].strip())
-            except: pass
-
-        if check and check not in ('nan','NaN',''):
-            etapas=[e.strip() for e in check.split(';') if e.strip() and e.strip()!='nan']
-            for i,etapa in enumerate(etapas):
-                prazo_e=None; titulo_e=etapa
-                if ' - ' in etapa:
-                    p2=etapa.split(' - ',1)
-                    dp=p2[0].strip()
-                    if len(dp)<=6 and '/' in dp:
-                        try:
-                            d,m=dp.split('/')
-                            ano="2026" if int(m)<=6 else "2025"
-                            prazo_e=f"{ano}-{int(m):02d}-{int(d):02d} 00:00:00"
-                            titulo_e=p2[1].strip()
-                        except: pass
-                s_e="Concluído" if (i<n_conc or t_st=="Concluído") else ("Em Andamento" if (t_st=="Em Andamento" and i==n_conc) else "A Fazer")
-                rid_e=uid_map.get(pessoas[i%len(pessoas)]) if pessoas else resp_id
-                cur.execute("""INSERT INTO tasks(titulo,descricao,projeto_id,responsavel_id,
-                               status,prioridade,prazo,data_criacao,atualizado_em) VALUES(?,?,?,?,?,?,?,?,?)""",
-                            (titulo_e[:200],f"Etapa: {nome_proj[:100]}",pid,rid_e,s_e,prio,prazo_e or df_,dc or now,now))
-                task_ct+=1
-        else:
-            cur.execute("""INSERT INTO tasks(titulo,descricao,projeto_id,responsavel_id,
-                           status,prioridade,prazo,data_criacao,atualizado_em) VALUES(?,?,?,?,?,?,?,?,?)""",
-                        (f"Execução: {nome_proj[:180]}",desc[:500],pid,resp_id,t_st,prio,df_,dc or now,now))
-            task_ct+=1
-
-        if proj_ct%50==0: conn.commit(); print(f"   ✅ {proj_ct} projetos...")
-
-    conn.commit()
-    tp=cur.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
-    tt=cur.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
-    tu=cur.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    print("📊 Lendo planilha...")
+    ct = import_sheet(conn, excel, now)
+    tp=conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+    tt=conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+    tu=conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
     conn.close()
 
     print(f"\n{'='*50}")
-    print("✅ IMPORTAÇÃO CONCLUÍDA!")
+    print(f"✅ IMPORTAÇÃO CONCLUÍDA em {time.perf_counter()-inicio:.1f}s")
     print(f"{'='*50}")
-    print(f"👥 Usuários:  {tu}")
+    print(f"🆕 Novos: {ct['novos']}  ✏️ Alterados: {ct['alterados']}  "
+          f"⏭️ Sem mudança: {ct['iguais']}  🗑️ Removidos: {ct['removidos']}")
+    print(f"👥 Usuários:  {tu} ({ct['usuarios']} novos)")
     print(f"📁 Projetos:  {tp}")
     print(f"✅ Tarefas:   {tt}")
     print(f"{'='*50}")
@@ -0,0 +1,163 @@
+"""
+Log de consultas lentas.
+
+Ao fim de cada execução da página (ver ``telemetry.rerun``), todo comando
+SQL que levou mais de ``SLOW_QUERY_MS`` é agrupado pela página, pelo texto
+normalizado (listas ``IN (?, ?, ...)`` de qualquer tamanho viram uma só) e
+pela forma dos parâmetros (tipos, com destaque para textos que começam com
+``%``, que impedem o uso de índice num LIKE). Na primeira vez que uma forma
+aparece, o plano do SQLite (``EXPLAIN QUERY PLAN``) é capturado com os
+mesmos parâmetros.
+
+Cada forma é gravada no log ``SLOW_QUERY_LOG`` (uma linha JSON) quando
+aparece pela primeira vez e de novo quando a contagem chega a 2, 4, 8, ...;
+assim formas repetidas não inundam o log, mas a contagem continua visível.
+O painel de diagnóstico mostra as formas mais caras do processo.
+"""
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import streamlit as st
+
+from database import engine
+from migrations import query_plan
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG = os.environ.get("SLOW_QUERY_LOG", "slow_queries.jsonl")
+SLOW_QUERY_MAX_SHAPES = int(os.environ.get("SLOW_QUERY_MAX_SHAPES", "500"))
+
+log = logging.getLogger("projectflow.slow_queries")
+
+_SPACES = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def normalize_statement(statement):
+    """One-line statement text with every run of ``?, ?, ...`` collapsed to ``?…``."""
+    return _PLACEHOLDER_LIST.sub("?…", _SPACES.sub(" ", statement).strip())
+
+
+def parameter_shape(parameters):
+    """The parameters' types, e.g. ``(str '%…', int…, NoneType)``, without their values.
+
+    A run of the same type collapses like the placeholders do, so an ``IN``
+    list has the same shape whatever its length.
+    """
+    values = parameters.values() if isinstance(parameters, dict) else parameters or ()
+    runs = []
+    for kind in map(_kind, values):
+        if runs and runs[-1][0] == kind:
+            runs[-1][1] += 1
+        else:
+            runs.append([kind, 1])
+    return "(" + ", ".join(kind if n == 1 else f"{kind}…" for kind, n in runs) + ")"
+
+
+def _kind(value):
+    if isinstance(value, str) and value.startswith("%"):
+        return "str '%…'"
+    return type(value).__name__
+
+
+class SlowQueryLog:
+    """Slow statement shapes per page, with counts, bounded to ``max_shapes`` (LRU)."""
+
+    def __init__(self, threshold_ms=SLOW_QUERY_MS, max_shapes=SLOW_QUERY_MAX_SHAPES):
+        self.threshold_s = threshold_ms / 1000
+        self.max_shapes = max_shapes
+        self._shapes = OrderedDict()  # (page, statement, params) -> entry
+        self._lock = threading.Lock()
+
+    def record_run(self, page, statements):
+        """Account for the slow ones among a run's ``(statement, parameters, seconds)``."""
+        for statement, parameters, seconds in statements:
+            if seconds >= self.threshold_s:
+                self._record(page, statement, parameters, seconds)
+
+    def _record(self, page, statement, parameters, seconds):
+        key = (page, normalize_statement(statement), parameter_shape(parameters))
+        with self._lock:
+            known = key in self._shapes
+        # The plan is taken once per shape, outside the lock
+        plan, full_scan = (None, None) if known else _plan(statement, parameters)
+        with self._lock:
+            entry = self._shapes.get(key)
+            if entry is None:
+                entry = self._shapes[key] = {
+                    "page": page, "statement": key[1], "params": key[2], "plan": plan, "full_scan": full_scan,
+                    "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "first_seen": datetime.now().isoformat(timespec="seconds"),
+                }
+                while len(self._shapes) > self.max_shapes:
+                    self._shapes.popitem(last=False)
+            else:
+                self._shapes.move_to_end(key)
+            self._update(entry, seconds)
+            snapshot = dict(entry) if _is_power_of_two(entry["count"]) else None
+        if snapshot is not None:
+            _log_entry(snapshot)
+
+    @staticmethod
+    def _update(entry, seconds):
+        ms = seconds * 1000
+        entry["count"] += 1
+        entry["total_ms"] = round(entry["total_ms"] + ms, 1)
+        entry["max_ms"] = round(max(entry["max_ms"], ms), 1)
+        entry["last_seen"] = datetime.now().isoformat(timespec="seconds")
+
+    def top(self, n=5):
+        """The ``n`` shapes with the most total time."""
+        with self._lock:
+            entries = [dict(e) for e in self._shapes.values()]
+        return sorted(entries, key=lambda e: e["total_ms"], reverse=True)[:n]
+
+
+def _is_power_of_two(n):
+    return n & (n - 1) == 0
+
+
+def _plan(statement, parameters):
+    """EXPLAIN QUERY PLAN of a SELECT on SQLite, else ``(None, None)``."""
+    if engine.dialect.name != "sqlite" or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None, None
+    raw = engine.raw_connection()
+    try:
+        return query_plan(raw.cursor(), statement, parameters)
+    except Exception as e:
+        log.warning("EXPLAIN QUERY PLAN falhou: %s", e)
+        return None, None
+    finally:
+        raw.close()
+
+
+@st.cache_resource
+def _file_log():
+    """Logger writing to SLOW_QUERY_LOG, or None when it is disabled."""
+    if not SLOW_QUERY_LOG:
+        return None
+    logger = logging.getLogger("projectflow.slow_queries.file")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    for old in list(logger.handlers):
+        logger.removeHandler(old)
+        old.close()
+    handler = logging.FileHandler(SLOW_QUERY_LOG, encoding="utf-8", delay=True)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    return logger
+
+
+def _log_entry(entry):
+    logger = _file_log()
+    if logger is not None:
+        logger.info(json.dumps({"ts": datetime.now().isoformat(timespec="seconds"), **entry}, ensure_ascii=False))
+
+
+@st.cache_resource
+def slow_query_log():
+    return SlowQueryLog()
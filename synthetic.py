@@ -0,0 +1,204 @@
+"""
+Gerador determinístico de bancos sintéticos para medir as páginas.
+
+Reproduz a forma dos dados importados do Planner no banco de demonstração
+(356 projetos, 1.913 tarefas, 18 usuários), multiplicada por uma escala:
+~42% dos projetos com uma única tarefa e o resto com checklists de 2 a 20
+etapas, mais uma fração pequena de checklists longos (30 a 120 etapas);
+responsáveis concentrados em poucas pessoas (distribuição de Zipf); e
+prazos distribuídos em torno da data de referência, com atrasos de poucos
+dias a vários meses.
+
+A mesma escala, semente e data de referência geram sempre o mesmo banco
+(só o sal dos hashes de senha muda).
+
+Uso:
+    python synthetic.py ESCALA [arquivo.db] [semente] [AAAA-MM-DD]
+    python synthetic.py 10            # grava bench_10x.db
+"""
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+from database import make_engine
+from migrations import run_migrations
+from models import Base
+from provisioning import hash_password
+from seed_petrobras import restore_triggers, suspend_triggers
+
+BASE_PROJECTS = 356
+BASE_USERS = 18
+
+# Tasks per project in the demo database: {checklist size: projects}
+CHECKLIST_SIZES = {
+    1: 150, 2: 25, 3: 13, 4: 23, 5: 13, 6: 13, 7: 17, 8: 16, 9: 13, 10: 12,
+    11: 1, 12: 8, 13: 4, 14: 7, 15: 8, 16: 8, 17: 13, 18: 4, 19: 3, 20: 5,
+}
+LONG_CHECKLIST_SHARE = 0.02
+LONG_CHECKLIST_SIZES = (30, 120)
+
+PROJECT_STATUS = {"Ativo": 301, "Planejamento": 34, "Concluído": 16, "Pausado": 4, "Cancelado": 5}
+PRIORITIES = {"Média": 1637, "Crítica": 161, "Alta": 103, "Baixa": 12}
+STALLED_SHARE = 0.3
+ASSIGNEE_SKEW = 1.1  # Zipf exponent: a handful of people own most of the tasks
+
+FIRST_NAMES = [
+    "Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Henrique", "Isabela", "João",
+    "Karina", "Lucas", "Mariana", "Nelson", "Olívia", "Paulo", "Renata", "Sérgio", "Tatiana", "Vinícius",
+]
+LAST_NAMES = [
+    "Almeida", "Barbosa", "Cardoso", "Dias", "Esteves", "Ferreira", "Gomes", "Lima", "Macedo", "Nogueira",
+    "Oliveira", "Pereira", "Queiroz", "Rocha", "Santos", "Teixeira", "Vieira",
+]
+COLORS = ["#6366f1", "#3b9eff", "#10b981", "#f59e0b", "#ef4444", "#8b5cf6", "#ec4899", "#14b8a6"]
+
+PROJECT_KINDS = ["Treinamento", "Curso", "Reciclagem", "Trilha", "Workshop", "Programa", "Módulo"]
+PROJECT_TOPICS = [
+    "Segurança de Processo", "Gestão de Estoques", "Sistema de Efluentes", "Liderança", "Integridade de Dutos",
+    "Manutenção Preditiva", "Gestão de Contratos", "Qualidade de Dados", "Recursos Críticos", "Ergonomia",
+    "Compliance", "Análise de Riscos", "Operação de Plataformas", "Gestão de Mudanças", "Eficiência Energética",
+]
+PROJECT_AUDIENCES = ["para o E&P", "- EAD", "- CENPES", "- Prestadores de Serviço", "para Gestores", ""]
+PHASES = ["PELD", "Desenho", "Produção", "Validação", "Publicação"]
+LABELS = ["Apostila / E-book", "Vídeo", "Trilha", "Storyline", "Podcast", "Infográfico"]
+
+STEPS = [
+    "Envio do material base (ACAD)", "Elaboração do Plano instrucional", "Validação PI",
+    "Roteirização", "Validação do roteiro (cliente)", "Produção de mídias", "Gravação de vídeos",
+    "Diagramação", "Revisão técnica", "Solicitação de ajustes (ACAD)", "Aplicação de ajustes",
+    "Validação dos ajustes (cliente)", "Entrega versão final (SENAI)", "Publicação no AVA",
+]
+
+FMT = "%Y-%m-%d %H:%M:%S"
+PASSWORD = "senai@2025"
+
+
+def _weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _users(rng, n, now):
+    rows = [(1, "Admin Sistema", "admin@demo.com", "admin", COLORS[0])]
+    for i in range(2, n + 1):
+        nome = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+        email = f"{nome.split()[0].lower()}.{i}@sintetico.local"
+        role = "gestor" if rng.random() < 0.28 else "colaborador"
+        rows.append((i, nome, email, role, rng.choice(COLORS)))
+    # One bcrypt hash each for the admin and for everyone else: hashing every user would dominate the run
+    admin_hash, user_hash = hash_password("admin123"), hash_password(PASSWORD)
+    return [(uid, nome, email, admin_hash if uid == 1 else user_hash, role, color, now.strftime(FMT))
+            for uid, nome, email, role, color in rows]
+
+
+def _checklist_size(rng):
+    if rng.random() < LONG_CHECKLIST_SHARE:
+        return rng.randint(*LONG_CHECKLIST_SIZES)
+    return _weighted(rng, CHECKLIST_SIZES)
+
+
+def _task_status(project_status, step, n_steps, done_share):
+    if project_status == "Concluído":
+        return "Concluído"
+    n_done = int(n_steps * done_share)
+    if step < n_done:
+        return "Concluído"
+    if step == n_done and project_status == "Ativo":
+        return "Em Andamento"
+    return "A Fazer"
+
+
+def generate(path, scale, seed=1, today=None):
+    """Write a new database at ``path`` with ``scale`` times the demo data; return the row counts."""
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} já existe; escolha outro arquivo ou apague-o antes")
+    rng = random.Random(seed)
+    now = datetime.combine(today or date.today(), datetime.min.time())
+
+    eng = make_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=eng)
+    run_migrations(eng)
+    eng.dispose()
+
+    n_users = max(BASE_USERS, round(BASE_USERS * scale ** 0.5))
+    n_projects = round(BASE_PROJECTS * scale)
+    users = _users(rng, n_users, now)
+    # Assignees are drawn from a Zipf-like ranking over a shuffled user list
+    ranking = [u[0] for u in users]
+    rng.shuffle(ranking)
+    rank_weights = list(accumulate(1 / (i + 1) ** ASSIGNEE_SKEW for i in range(len(ranking))))
+
+    def assignee():
+        return rng.choices(ranking, cum_weights=rank_weights)[0]
+
+    projects, tasks = [], []
+    hrc = rng.sample(range(1_000_000, 1_999_999), n_projects)
+    for pid in range(1, n_projects + 1):
+        status = _weighted(rng, PROJECT_STATUS)
+        criado = now - timedelta(days=rng.randint(0, 300))
+        inicio = criado + timedelta(days=rng.randint(0, 20))
+        fim = inicio + timedelta(days=rng.randint(60, 300))
+        resp = assignee()
+        nome = (f"{rng.choice(PROJECT_KINDS)} {rng.choice(PROJECT_TOPICS)} "
+                f"{rng.choice(PROJECT_AUDIENCES)}".strip() + f" [HRC{hrc[pid - 1]}]")
+        descricao = (f"ACAD: {rng.choice(['PPRG', 'ARTD', 'COA/T&D'])}\nRP: {users[resp - 1][1]}\n\n"
+                     f"Rótulos: {rng.choice(LABELS)}\n\nFase: {rng.choice(PHASES)}")
+        projects.append((pid, nome, descricao, resp, inicio.strftime(FMT), fim.strftime(FMT), status,
+                         criado.strftime(FMT), criado.strftime(FMT)))
+
+        n_steps = _checklist_size(rng)
+        # How far along the project is, from its timeline; stalled ones fall behind and run late
+        done_share = (now - inicio) / (fim - inicio) + rng.uniform(-0.15, 0.2)
+        if rng.random() < STALLED_SHARE:
+            done_share *= rng.uniform(0.2, 0.7)
+        done_share = min(1.0, max(0.0, done_share))
+        for step in range(n_steps):
+            titulo = STEPS[step % len(STEPS)] if n_steps > 1 else f"Execução: {nome[:180]}"
+            if n_steps > len(STEPS):
+                titulo = f"{titulo} ({step // len(STEPS) + 1})"
+            prazo = inicio + (fim - inicio) * (step + 1) / n_steps
+            tasks.append((titulo, f"Etapa: {nome[:100]}", pid, assignee(),
+                          _task_status(status, step, n_steps, done_share), _weighted(rng, PRIORITIES),
+                          prazo.strftime(FMT), criado.strftime(FMT), criado.strftime(FMT)))
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        suspend_triggers(conn)
+        conn.executemany("INSERT INTO users(id,nome,email,senha_hash,role,avatar_color,criado_em) "
+                         "VALUES(?,?,?,?,?,?,?)", users)
+        conn.executemany("INSERT INTO projects(id,nome,descricao,responsavel_id,data_inicio,data_fim,status,"
+                         "criado_em,atualizado_em) VALUES(?,?,?,?,?,?,?,?,?)", projects)
+        conn.executemany("INSERT INTO tasks(titulo,descricao,projeto_id,responsavel_id,status,prioridade,"
+                         "prazo,data_criacao,atualizado_em) VALUES(?,?,?,?,?,?,?,?,?)", tasks)
+        restore_triggers(conn)
+        conn.execute("UPDATE projects SET progresso = "
+                     "CASE WHEN n_tasks > 0 THEN n_done * 100.0 / n_tasks ELSE 0 END")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("ANALYZE")
+    overdue = conn.execute("SELECT COUNT(*) FROM tasks WHERE status != 'Concluído' AND prazo < ?",
+                           (now.strftime(FMT),)).fetchone()[0]
+    conn.close()
+    return {"users": len(users), "projects": len(projects), "tasks": len(tasks), "overdue_open_tasks": overdue}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    escala = float(sys.argv[1])
+    destino = sys.argv[2] if len(sys.argv) > 2 else f"bench_{sys.argv[1]}x.db"
+    semente = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    hoje = date.fromisoformat(sys.argv[4]) if len(sys.argv) > 4 else None
+    inicio = time.perf_counter()
+    try:
+        ct = generate(destino, escala, semente, hoje)
+    except FileExistsError as e:
+        sys.exit(f"❌ {e}")
+    print(f"✅ {destino}: {ct['users']} usuários, {ct['projects']} projetos, {ct['tasks']} tarefas "
+          f"({ct['overdue_open_tasks']} em atraso) em {time.perf_counter() - inicio:.1f}s")
@@ -0,0 +1,203 @@
+"""
+Instrumentação de cada execução (rerun) da página roteada em ``app.py``.
+
+``rerun(página)`` envolve o ``show()`` e coleta:
+- cada comando SQL executado na thread da página, com o seu tempo (ganchos
+  ``before/after_cursor_execute`` do engine, ver ``database.sql_trace``);
+- o tempo das etapas de renderização marcadas com ``timed``, separando o
+  tempo gasto em SQL dentro de cada uma.
+
+O resultado aparece no painel de diagnóstico da barra lateral (só para
+administradores), alimenta o log de consultas lentas (``slow_queries.py``)
+e vai, uma linha JSON por execução, para o log rotativo ``TELEMETRY_LOG``
+(vazio desativa; ``TELEMETRY_LOG_MAX_MB`` por arquivo,
+``TELEMETRY_LOG_BACKUPS`` arquivos antigos). O tempo de inicialização do
+servidor (``app.bootstrap``) também vai para o log e para o painel.
+
+Execuções de um fragmento sozinho (ex.: mover um card no Kanban) não são
+registradas; ``timed`` não faz nada fora de ``rerun``.
+"""
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+import streamlit as st
+
+import metrics
+from database import sql_trace
+from slow_queries import slow_query_log
+
+TELEMETRY_LOG = os.environ.get("TELEMETRY_LOG", "telemetry.jsonl")
+TELEMETRY_LOG_MAX_MB = float(os.environ.get("TELEMETRY_LOG_MAX_MB", "10"))
+TELEMETRY_LOG_BACKUPS = int(os.environ.get("TELEMETRY_LOG_BACKUPS", "5"))
+TELEMETRY_SLOWEST = int(os.environ.get("TELEMETRY_SLOWEST", "5"))
+
+
+class RerunTrace:
+    """SQL statements and render timings of one page run."""
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.perf_counter()
+        self.total_s = None
+        self.statements = []  # (statement, parameters, seconds)
+        self.sql_s = 0.0
+        self.steps = {}  # name -> [calls, seconds, sql seconds]
+        self.filters = {}
+
+    def add_statement(self, statement, parameters, seconds):
+        self.statements.append((statement, parameters, seconds))
+        self.sql_s += seconds
+
+    def finish(self):
+        self.total_s = time.perf_counter() - self.started
+
+    def slowest(self, n=TELEMETRY_SLOWEST):
+        """``[(statement, count, total seconds, max seconds)]`` for the ``n`` costliest statement texts."""
+        by_text = {}
+        for statement, _, seconds in self.statements:
+            entry = by_text.setdefault(statement, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+        ranked = sorted(by_text.items(), key=lambda item: item[1][1], reverse=True)
+        return [(statement, count, total, worst) for statement, (count, total, worst) in ranked[:n]]
+
+    def as_record(self):
+        return {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "page": self.page,
+            "user_id": st.session_state.get("user_id"),
+            "filters": self.filters,
+            "total_ms": _ms(self.total_s),
+            "sql_count": len(self.statements),
+            "sql_ms": _ms(self.sql_s),
+            "render_ms": _ms(self.total_s - self.sql_s),
+            "steps": {name: {"calls": calls, "ms": _ms(seconds), "sql_ms": _ms(sql_s)}
+                      for name, (calls, seconds, sql_s) in self.steps.items()},
+            "slowest": [{"sql": statement[:500], "count": count, "total_ms": _ms(total), "max_ms": _ms(worst)}
+                        for statement, count, total, worst in self.slowest()],
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+_current = ContextVar("rerun_trace", default=None)
+
+
+@contextmanager
+def rerun(page):
+    """Trace the block as one run of ``page``; yields the RerunTrace."""
+    trace = RerunTrace(page)
+    token = _current.set(trace)
+    try:
+        with sql_trace(trace.add_statement):
+            yield trace
+    finally:
+        _current.reset(token)
+        trace.finish()
+        _write_log(trace)
+        slow_query_log().record_run(trace.page, trace.statements)
+        metrics.RERUN_SECONDS.observe(trace.total_s, trace.page)
+        metrics.RERUN_SQL_STATEMENTS.observe(len(trace.statements), trace.page)
+
+
+@contextmanager
+def timed(name):
+    """Add the block's time (and the SQL time inside it) to step ``name`` of the current run.
+
+    Also works as a decorator.
+    """
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start, sql_start = time.perf_counter(), trace.sql_s
+    try:
+        yield
+    finally:
+        step = trace.steps.setdefault(name, [0, 0.0, 0.0])
+        step[0] += 1
+        step[1] += time.perf_counter() - start
+        step[2] += trace.sql_s - sql_start
+
+
+def note_filters(**filters):
+    """Record the page's filter values on the current run (for the logs and profiles)."""
+    trace = _current.get()
+    if trace is not None:
+        trace.filters.update(filters)
+
+
+# ── JSON-lines log ────────────────────────────────────────────────────────────
+
+@st.cache_resource
+def _trace_log():
+    """Logger writing to the rotating TELEMETRY_LOG file, or None when it is disabled."""
+    if not TELEMETRY_LOG:
+        return None
+    logger = logging.getLogger("projectflow.telemetry")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    for old in list(logger.handlers):
+        logger.removeHandler(old)
+        old.close()
+    handler = RotatingFileHandler(TELEMETRY_LOG, maxBytes=int(TELEMETRY_LOG_MAX_MB * 2**20),
+                                  backupCount=TELEMETRY_LOG_BACKUPS, encoding="utf-8", delay=True)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    return logger
+
+
+def _write_log(trace):
+    logger = _trace_log()
+    if logger is not None:
+        logger.info(json.dumps(trace.as_record(), ensure_ascii=False, default=str))
+
+
+def log_startup(boot):
+    """Write the server bootstrap time (see ``app.bootstrap``) as one line of the log."""
+    logger = _trace_log()
+    if logger is not None:
+        logger.info(json.dumps({"ts": boot["iniciado_em"].isoformat(timespec="milliseconds"),
+                                "event": "startup", "startup_ms": _ms(boot["startup_s"])}))
+
+
+# ── Debug panel ───────────────────────────────────────────────────────────────
+
+def debug_panel(trace, boot=None):
+    """Sidebar summary of ``trace`` (and of the server ``boot``); the caller checks the user is an admin."""
+    with st.expander("🔧 Diagnóstico da página"):
+        st.markdown(
+            f"**{_ms(trace.total_s):.0f} ms** no total · "
+            f"**{len(trace.statements)}** comandos SQL em **{_ms(trace.sql_s):.0f} ms** · "
+            f"renderização **{_ms(trace.total_s - trace.sql_s):.0f} ms**"
+        )
+        if boot is not None:
+            st.caption(f"Servidor iniciado em {boot['iniciado_em']:%d/%m/%Y %H:%M:%S} · "
+                       f"bootstrap em {_ms(boot['startup_s']):.0f} ms")
+        if trace.steps:
+            rows = "\n".join(f"| {name} | {calls} | {_ms(seconds):.1f} | {_ms(sql_s):.1f} |"
+                             for name, (calls, seconds, sql_s) in
+                             sorted(trace.steps.items(), key=lambda item: item[1][1], reverse=True))
+            st.markdown("| Etapa | Chamadas | ms | SQL ms |\n|---|---:|---:|---:|\n" + rows)
+        for statement, count, total, worst in trace.slowest():
+            st.caption(f"{count}× · {_ms(total):.1f} ms (máx. {_ms(worst):.1f} ms)")
+            st.code(" ".join(statement.split())[:400], language="sql")
+
+        slow = slow_query_log().top()
+        if slow:
+            st.markdown("**🐢 Consultas lentas (desde o início do servidor)**")
+        for e in slow:
+            scan = " · ⚠️ varredura completa" if e["full_scan"] else ""
+            st.caption(f"{e['page']} · {e['count']}× · {e['total_ms']:.0f} ms (máx. {e['max_ms']:.0f} ms)"
+                       f" · parâmetros {e['params']}{scan}")
+            st.code(e["statement"][:400] + ("\n-- " + "\n-- ".join(e["plan"]) if e["plan"] else ""),
+                    language="sql")
@@ -0,0 +1,155 @@
+"""
+Fila única de escrita no banco.
+
+O SQLite aceita um escritor por vez: com várias sessões do Streamlit
+gravando ao mesmo tempo, os commits disputam o lock e falham com
+"database is locked". Por isso todas as escritas das páginas passam por uma
+thread de processo, dona da sua própria conexão. Cada comando entra numa
+fila e recebe um ``Future``; a thread junta os comandos pendentes (até
+``WRITE_BATCH_MAX``, esperando no máximo ``WRITE_BATCH_WAIT_MS`` por mais)
+numa única transação, cada um no seu SAVEPOINT, e faz um só COMMIT por lote.
+
+Uso:
+    from writer import write
+    write(commands.set_task_status, task_id, "Concluído")
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import streamlit as st
+from sqlalchemy import event
+
+import metrics
+from database import DATABASE_URL, SessionLocal, engine, make_engine
+
+WRITE_BATCH_MAX = int(os.environ.get("WRITE_BATCH_MAX", "64"))
+WRITE_BATCH_WAIT_MS = float(os.environ.get("WRITE_BATCH_WAIT_MS", "2"))
+WRITE_TIMEOUT_S = float(os.environ.get("WRITE_TIMEOUT_S", "30"))
+
+
+class WriteTimeout(TimeoutError):
+    """The command was still queued after ``WRITE_TIMEOUT_S``; it was withdrawn and never ran."""
+
+
+class WriteOutcomeUnknown(TimeoutError):
+    """The command was already running after ``WRITE_TIMEOUT_S``; it may still commit."""
+
+
+class WriteQueue:
+    """A writer thread that group-commits the commands queued by ``submit``."""
+
+    def __init__(self, bind, batch_max=WRITE_BATCH_MAX, batch_wait_ms=WRITE_BATCH_WAIT_MS):
+        self.bind = bind
+        self.batch_max = batch_max
+        self.batch_wait = batch_wait_ms / 1000
+        self.batches = 0
+        self.commands = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(db, *args, **kwargs)``; the Future gets its return value once committed.
+
+        ``fn`` must not commit. If it raises, only its SAVEPOINT is rolled back
+        and the exception goes to its Future; the rest of the batch commits.
+        """
+        future = Future()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def stats(self):
+        return {"batches": self.batches, "commands": self.commands, "queued": self._queue.qsize()}
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_max:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._commit(batch)
+            except BaseException as exc:  # keep the thread alive for the next batch
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def _commit(self, batch):
+        outcomes = []
+        db = SessionLocal(bind=self.bind)
+        try:
+            for fn, args, kwargs, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with db.begin_nested():
+                        outcomes.append((future, fn(db, *args, **kwargs), None))
+                except Exception as exc:
+                    outcomes.append((future, None, exc))
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            for future, _, _ in outcomes:
+                future.set_exception(exc)
+            return
+        finally:
+            db.close()
+
+        self.batches += 1
+        self.commands += len(outcomes)
+        for future, result, exc in outcomes:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+
+def _writer_engine():
+    """A dedicated engine for file-based SQLite; other databases share ``engine``."""
+    url = engine.url
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:") or "mode=memory" in DATABASE_URL:
+        return engine
+    eng = make_engine(DATABASE_URL)
+
+    # pysqlite's implicit BEGIN breaks SAVEPOINT; take the write lock up front instead
+    @event.listens_for(eng, "connect")
+    def _no_implicit_begin(dbapi_conn, connection_record):
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(eng, "begin")
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return eng
+
+
+@st.cache_resource
+def write_queue():
+    return WriteQueue(_writer_engine())
+
+
+def write(fn, *args, **kwargs):
+    """Run a command from ``commands.py`` on the writer thread and wait for its commit.
+
+    After ``WRITE_TIMEOUT_S`` a command still in the queue is cancelled and
+    ``WriteTimeout`` raised: nothing was written. One the writer already
+    started can't be stopped, so ``WriteOutcomeUnknown`` says it may yet commit.
+    """
+    start = time.perf_counter()
+    future = write_queue().submit(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=WRITE_TIMEOUT_S)
+    except TimeoutError:
+        if future.cancel():
+            raise WriteTimeout(f"{fn.__name__}: not applied, still queued after {WRITE_TIMEOUT_S:g}s") from None
+        if future.done():  # finished between the timeout and the cancel
+            return future.result()
+        raise WriteOutcomeUnknown(f"{fn.__name__}: still running after {WRITE_TIMEOUT_S:g}s, may yet commit") from None
+    finally:
+        metrics.WRITE_COMMIT_SECONDS.observe(time.perf_counter() - start)